@@ -1,6 +1,8 @@
 import json
 import csv
 import os
+from itertools import islice
+from .sink import ResultSink
 
 
 class WikiBase:
@@ -8,6 +10,9 @@ class WikiBase:
     API_ENDPOINT = "https://www.wikidata.org/w/api.php"
     TEST = "test.json"
 
+    # entities flattened per batch by entityRows
+    FLATTEN_BATCH = 10000
+
     @staticmethod
     def clear():
         """
@@ -57,41 +62,136 @@ class WikiBase:
             print("Error while writing")
 
     @staticmethod
-    def convertToCSVForm(data: dict, lang=["en"], gloss=False):
+    def dumpRows(outputFile, head: list[str], data):
         """
-            gloss boolean controls wether gloss field included or not
+        Writes rows (dicts) to any ResultSink file, used for Parquet / Arrow outputs\n
+        rows are streamed in row groups, data can be a generator
+
+        :param outputFile: file name or ColumnarOutput (columns / compression / row group size)
+        :param head: column names
         """
         try:
-            dt = []
-            hdr = ['id']  # then glosses label description in langs
-
-            for l in lang:
-                h1 = [f'label-{l}', f'description-{l}']
-                if gloss:
-                    h1.append(f'gloss-{l}')
-                hdr.extend(h1)
-
-            for queryRes in data:
-                ent = data[queryRes]
-                rec = {}
-                rec['id'] = ent['id']
-                # for keys in ['labels','descriptions','glosses']
-                for l in lang:
-                    rec[f'label-{l}'] = rec[f'description-{l}'] = ''
-                    if gloss:
-                        rec[f'gloss-{l}'] = ''
-
-                    if "labels" in ent and l in ent['labels']:
-                        rec[f'label-{l}'] = ent['labels'][l]['value']
-
-                    if "descriptions" in ent and l in ent['descriptions']:
-                        rec[f'description-{l}'] = ent['descriptions'][l]['value']
-
-                    if gloss and "glosses" in ent and l in ent['glosses']:
-                        rec[f'gloss-{l}'] = ent['glosses'][l]['value']
-
-                # x[queryRes].keys()
-                dt.append(rec)
-            return {"success": 1, "head": hdr, "data": dt}
-        except Exception as e:
+            with ResultSink(outputFile, head) as sink:
+                for row in data:
+                    sink.write(row)
+        except ImportError as e:
+            print(e)
+
+    @staticmethod
+    def bindingRows(res: dict):
+        """
+            (head, rows) of raw SPARQL JSON result, one column per variable holding binding values
+        """
+        head = res.get("head", {}).get("vars", [])
+        rows = ({k: v.get("value") for k, v in b.items()}
+                for b in res.get("results", {}).get("bindings", []))
+        return head, rows
+
+    @staticmethod
+    def entityHead(lang=["en"], gloss=False):
+        """
+            CSV header of flattened entities: id, then label / description (/ gloss) per language
+        """
+        hdr = ['id']
+        for l in lang:
+            hdr.extend([f'label-{l}', f'description-{l}'] +
+                       ([f'gloss-{l}'] if gloss else []))
+        return hdr
+
+    @staticmethod
+    def flattenBatch(batch: list, lang: list[str], kinds: list[str]):
+        """
+            columns (id, then kind per language) of batch of entities, one list per column
+        """
+        ids = [e['id'] for e in batch]
+        # per kind the sub dicts are looked up once, then read per language
+        subs = {k: [e.get(k) or {} for e in batch] for k in kinds}
+
+        cols = [ids]
+        for l in lang:
+            for k in kinds:
+                cols.append([x[l]['value'] if l in x else '' for x in subs[k]])
+        return cols
+
+    @staticmethod
+    def entityBatches(data, lang=["en"], gloss=False, errors: list = None):
+        """
+        Flattens entities to lists of rows in entityHead order, FLATTEN_BATCH entities at a time\n
+        each batch is extracted column by column into lists, then zipped to rows, so
+        rows can be streamed to a writer without building dicts
+
+        a malformed entity only drops its own row: the batch it is in is redone
+        entity by entity and the bad ones are skipped
+
+        :param data: entities dict (id -> entity) or iterable of entities
+        :param errors: if a list is passed, skipped entities are appended as {"id": ..., "error": ...}
+        """
+        kinds = ['labels', 'descriptions'] + (['glosses'] if gloss else [])
+        items = iter(data.values() if type(data) == dict else data)
+
+        while True:
+            batch = list(islice(items, WikiBase.FLATTEN_BATCH))
+            if not batch:
+                return
+
+            try:
+                yield list(zip(*WikiBase.flattenBatch(batch, lang, kinds)))
+                continue
+            except (KeyError, TypeError, AttributeError):
+                pass
+
+            rows = []
+            for ent in batch:
+                try:
+                    rows.extend(zip(*WikiBase.flattenBatch([ent], lang, kinds)))
+                except (KeyError, TypeError, AttributeError) as e:
+                    if errors is not None:
+                        errors.append({"id": ent.get('id') if type(ent) == dict else None,
+                                       "error": f"{type(e).__name__}: {e}"})
+            yield rows
+
+    @staticmethod
+    def entityRows(data, lang=["en"], gloss=False, errors: list = None):
+        """
+            flattened entities one row at a time (see entityBatches)
+        """
+        for rows in WikiBase.entityBatches(data, lang, gloss, errors):
+            yield from rows
+
+    @staticmethod
+    def dumpEntityCSV(fname: str, data, lang=["en"], gloss=False, errors: list = None):
+        """
+        Streams flattened entities straight into CSV file (no intermediate list of dicts)
+
+        :param errors: if a list is passed, skipped entities are appended to it
+
+        returns number of rows written
+        """
+        n = 0
+        try:
+            with open(fname, mode="w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(WikiBase.entityHead(lang, gloss))
+                for rows in WikiBase.entityBatches(data, lang, gloss, errors):
+                    writer.writerows(rows)
+                    n += len(rows)
+        except OSError as e:
+            print("Error while writing", e)
+        return n
+
+    @staticmethod
+    def convertToCSVForm(data: dict, lang=["en"], gloss=False):
+        """
+            gloss boolean controls wether gloss field included or not\n
+            malformed entities are skipped and listed under "errors" (success is 0 only if data is not entities)
+        """
+        if type(data) != dict or "results" in data:
             return {"success": 0, "data": data}
+
+        hdr = WikiBase.entityHead(lang, gloss)
+        errors = []
+        dt = [dict(zip(hdr, row))
+              for row in WikiBase.entityRows(data, lang, gloss, errors)]
+        if errors and not dt:
+            return {"success": 0, "data": data, "errors": errors}
+        return {"success": 1, "head": hdr, "data": dt, "errors": errors}
@@ -1,6 +1,35 @@
-from .BASE import WikiBase
-from .reader import WikiReader
-from .writer import WikiWriter
-from .bulkWriter import BulkWriter
-from .grapher import WikiGraph
-from .sparql import WikiSparql
+import importlib
+
+# public names are imported on first access, so `from WikiDataPy import WikiReader`
+# does not pay for networkx / matplotlib (only WikiGraph needs them)
+LAZY = {
+    "WikiBase": ".BASE",
+    "WikiReader": ".reader",
+    "WikiWriter": ".writer",
+    "BulkWriter": ".bulkWriter",
+    "WikiGraph": ".grapher",
+    "WikiSparql": ".sparql",
+    "WikiClient": ".client",
+    "AsyncWikiReader": ".asyncReader",
+    "AsyncWikiSparql": ".asyncReader",
+    "EntityCache": ".cache",
+    "GraphStore": ".graphStore",
+    "DumpReader": ".dumpReader",
+    "DumpIndex": ".dumpIndex",
+    "Metrics": ".metrics",
+    "MetricsCollector": ".metrics",
+}
+
+__all__ = list(LAZY)
+
+
+def __getattr__(name):
+    if name in LAZY:
+        value = getattr(importlib.import_module(LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import time
+import weakref
+from .BASE import WikiBase
+from .client import WikiClient
+from .metrics import Metrics
+from .reader import WikiReader
+from .sparql import WikiSparql
+
+try:
+    import aiohttp
+except ImportError:  # optional, pip install WikiDataPy[async]
+    aiohttp = None
+
+
+class AsyncWikiReader(WikiBase):
+
+    # max requests in flight across all coroutines
+    CONCURRENCY = 32
+    POOL_SIZE = 100
+    TIMEOUT = 60
+
+    # running loop -> (session, semaphore, sparql semaphore), aiohttp sessions are bound to one loop
+    STATE = weakref.WeakKeyDictionary()
+
+    # helper
+    @staticmethod
+    async def loopState():
+        """
+            (session, semaphore, sparql semaphore) of the running event loop, created on first use\n
+            every loop (e.g. asyncio.run in several threads) gets its own, sessions of loops that
+            have been closed are closed here, a session of a running loop is never touched
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncWikiReader requires aiohttp, install it with pip install WikiDataPy[async]")
+
+        loop = asyncio.get_running_loop()
+        state = AsyncWikiReader.STATE.get(loop)
+        if state is None or state[0].closed:
+            connector = aiohttp.TCPConnector(limit=AsyncWikiReader.POOL_SIZE)
+            session = aiohttp.ClientSession(
+                connector=connector, headers={"User-Agent": WikiClient.USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=AsyncWikiReader.TIMEOUT))
+            state = AsyncWikiReader.STATE[loop] = (
+                session, asyncio.Semaphore(AsyncWikiReader.CONCURRENCY),
+                asyncio.Semaphore(WikiSparql.LIMITER.concurrency or AsyncWikiReader.CONCURRENCY))
+            # state is in place before awaiting, so concurrent callers share it
+            await AsyncWikiReader.closeFinished()
+        return state
+
+    @staticmethod
+    async def closeFinished():
+        """
+            Closes sessions left behind by event loops that are closed
+        """
+        for loop, state in list(AsyncWikiReader.STATE.items()):
+            if not loop.is_closed():
+                continue
+            AsyncWikiReader.STATE.pop(loop, None)
+            try:
+                await state[0].close()
+            except Exception as e:  # loop already gone, its sockets are dropped with it
+                print("Error closing previous session", e)
+
+    @staticmethod
+    async def getSession():
+        """
+            Returns aiohttp session of the running event loop (created on first use)
+        """
+        return (await AsyncWikiReader.loopState())[0]
+
+    @staticmethod
+    async def close():
+        """
+            Closes session of the running event loop and its pooled connections
+        """
+        state = AsyncWikiReader.STATE.pop(asyncio.get_running_loop(), None)
+        if state is not None and not state[0].closed:
+            await state[0].close()
+
+    @staticmethod
+    async def getJSON(url: str, params: dict = None, headers: dict = None):
+        """
+            GET request through the loop's pool, bounded by its semaphore
+        """
+        session, semaphore, _ = await AsyncWikiReader.loopState()
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(url, params=params, headers=headers) as r:
+                body = await r.read()
+            Metrics.request(Metrics.actionOf(url, params), "GET", url, r.status, time.perf_counter() - start,
+                            len(body), len(str(r.url)), error=None if r.status < 400 else f"http-{r.status}")
+        return json.loads(body)
+
+    # functionalities
+
+    @staticmethod
+    async def searchEntities(query, fields: list[str] = ["id", "description"], n: int = None, lang: str = "en", reslang: str = "en", outputFile: str = None, propertyFind=False, isTest=False):
+        """
+        coroutine version of WikiReader.searchEntities (same params and result shape)
+
+        if no results are found for lang, search is retried once in English (en)\n
+        *outputFile is not written unless given*
+        """
+
+        api = WikiReader.API_ENDPOINT_PROD
+        if isTest:
+            api = WikiReader.API_ENDPOINT
+
+        params = {
+            "action": "wbsearchentities",
+            "format": "json",
+            "language": lang,
+            "search": query,
+            "uselang": reslang
+        }
+
+        if propertyFind:
+            params["type"] = "property"
+
+        if n:
+            params["limit"] = n
+
+        res = await AsyncWikiReader.getJSON(api, params=params)
+        res = [] if "search" not in res else res["search"]
+
+        ans = WikiReader.pickFields(res, fields)
+
+        # fallback to english language if no result
+        if not ans and lang != "en":
+            return await AsyncWikiReader.searchEntities(query, fields, n=n, lang="en", reslang="en", outputFile=outputFile, propertyFind=propertyFind, isTest=isTest)
+
+        WikiReader.dumpSearchResults(ans, outputFile)
+        return ans
+
+    @staticmethod
+    async def getEntitiesByIds(id_: list[str] = ["Q42"], options: dict = {"languages": ["en"], "sitelinks": ["enwiki"], "props": ["descriptions"]}, outputFile: str = None, isTest: bool = False, errors: list = None):
+        """
+        coroutine version of WikiReader.getEntitiesByIds
+
+        chunks of WikiReader.MAX_IDS are fetched concurrently and merged into one entities dict
+
+        :param errors: if a list is passed, failed chunks are appended to it as {"ids": [...], "error": {...}}
+        """
+
+        api = WikiReader.API_ENDPOINT_PROD
+        if isTest:
+            api = WikiReader.API_ENDPOINT
+
+        params = WikiReader.entityParams(options)
+        cached, id_ = WikiReader.cachedEntities(api, id_, params)
+        chunks = WikiReader.chunkIds(id_)
+
+        async def fetch(chunk):
+            p = dict(params)
+            p["ids"] = "|".join(chunk)
+            try:
+                return chunk, await AsyncWikiReader.getJSON(api, params=p)
+            except Exception as e:
+                return chunk, {"error": {"code": "request-failed", "info": str(e)}}
+
+        results = await asyncio.gather(*[fetch(c) for c in chunks])
+
+        res = cached
+        failed = []
+        for chunk, x in results:
+            if "error" in x:
+                failed.append({"ids": chunk, "error": x["error"]})
+            elif "entities" in x:
+                res.update(x["entities"])
+                WikiReader.cacheEntities(api, x["entities"], params)
+
+        if failed:
+            print(f"Error in getEntitiesByIDs ({len(failed)} of {len(chunks)} chunks failed)")
+            if errors is not None:
+                errors.extend(failed)
+            if not res:
+                return failed[0]["error"]
+
+        WikiReader.dumpEntities(
+            res, outputFile, params.get("languages", "en").split("|"))
+        return res
+
+    @staticmethod
+    async def getClaims(id_: str = "Q42", options: dict = {"rank": "normal"}, outputFile: str = "", isTest: bool = False):
+        """
+        coroutine version of WikiReader.getClaims
+        """
+
+        api = WikiReader.API_ENDPOINT_PROD
+        if isTest:
+            api = WikiReader.API_ENDPOINT
+
+        params = dict(options)
+        params.update(
+            {"format": "json", "action": "wbgetclaims", "entity": id_})
+
+        res = await AsyncWikiReader.getJSON(api, params=params)
+
+        if "error" in res:
+            print("Error in get claims")
+            return
+
+        if "claims" in res:
+            res = res["claims"]
+            WikiReader.dumpClaims(res, outputFile)
+
+        return res
+
+    @staticmethod
+    async def getRelatedEntitiesProps(id_: str,  limit=None, isTest=False):
+        """
+        coroutine version of WikiReader.getRelatedEntitiesProps
+        """
+        claims = await AsyncWikiReader.getClaims(id_, outputFile=None, isTest=isTest)
+        return WikiReader.relatedPairs(claims, limit)
+
+    @staticmethod
+    async def reverseLookup(label, lang='en', limit=None, propertyFind=False, isTest=False):
+        """
+        coroutine version of WikiReader.reverseLookup
+        """
+        x = await AsyncWikiReader.searchEntities(
+            label, ['id', 'label', 'aliases', 'description'], lang=lang, outputFile=None, propertyFind=propertyFind, isTest=isTest)
+        if limit:
+            return x[:limit]
+        return x
+
+
+class AsyncWikiSparql(WikiBase):
+
+    @staticmethod
+    async def execute(query: str):
+        """
+        coroutine version of WikiSparql.execute, shares AsyncWikiReader's pool\n
+        queries in flight per loop are capped like WikiSparql.LIMITER (not AsyncWikiReader.CONCURRENCY)
+
+        :param query: str, SPARQL Query to be executed
+        """
+
+        headers = {
+            'User-Agent': 'Python/SPARQL',
+            'Accept': 'application/sparql-results+json'
+        }
+
+        session, _, semaphore = await AsyncWikiReader.loopState()
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(WikiSparql.API_ENDPOINT, headers=headers, params={'query': query}) as response:
+                body = await response.read()
+            Metrics.request("sparql", "GET", WikiSparql.API_ENDPOINT, response.status, time.perf_counter() - start,
+                            len(body), len(str(response.url)), error=None if response.status == 200 else f"http-{response.status}")
+
+        if response.status != 200:
+            print(f"Failed to retrieve data: {response.status}")
+            return None
+        res = json.loads(body)
+
+        batch_IDS = WikiSparql.parseResultToIds(res)
+        if not batch_IDS:
+            return res
+
+        ids = [id_ for batch in batch_IDS for id_ in batch]
+        return await AsyncWikiReader.getEntitiesByIds(
+            ids, options={"props": ["descriptions", "labels"]}, isTest=False)
+
+
+async def test_async_reader():
+    ids = [f"Q{i}" for i in range(1, 120)]
+    res = await asyncio.gather(
+        AsyncWikiReader.getEntitiesByIds(ids),
+        AsyncWikiReader.getClaims("Q42", outputFile=None),
+        AsyncWikiReader.reverseLookup("chocolate", limit=3)
+    )
+    print(len(res[0]), len(res[1]), res[2])
+    await AsyncWikiReader.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_async_reader())
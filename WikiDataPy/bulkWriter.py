@@ -1,26 +1,208 @@
-
-import os
 from .writer import WikiWriter
 import csv
+import queue
+import threading
+import time
+import warnings
+import zlib
+from requests.adapters import HTTPAdapter
 from .reader import WikiReader
-from time import sleep
-from .BASE import WikiBase
+from .journal import JobJournal
+from .sink import ResultSink
+from .cache import EntityCache
+from .ratelimit import AdaptiveRateLimiter
 
 
 class BulkWriter(WikiWriter):
 
-    DELTA = 2
-    TMP_FILE = "RANDOM_SECRET_29303920.csv"
+    # deprecated: edits are paced by the writer's limiter, when set each job runs at most one edit per DELTA seconds
+    DELTA = None
+
+    # resolved names kept in memory / on disk by addClaimsFromNamesCSV
+    NAME_CACHE_SIZE = 100000
+    NAME_TTL = 7 * 24 * 3600
+
+    # pending rows buffered per lane and seconds between throughput reports (inflight > 1)
+    LANE_SIZE = 100
+    REPORT_EVERY = 10
+
+    # helper
+    def applyDelta(self):
+        """
+            honours deprecated BulkWriter.DELTA: the job runs on a private limiter capped at one edit per DELTA seconds,
+            returns the writer's own limiter to put back (restoreDelta) so a shared limiter is never slowed down
+        """
+        shared = self.limiter
+        if not BulkWriter.DELTA:
+            return shared
+        warnings.warn("BulkWriter.DELTA is deprecated, set the writer's limiter.maxRate instead",
+                      DeprecationWarning, stacklevel=3)
+        cap = 1 / BulkWriter.DELTA
+        with shared.lock:
+            self.limiter = AdaptiveRateLimiter(rate=min(shared.rate or cap, cap), minRate=min(getattr(shared, "minRate", cap), cap),
+                                               maxRate=min(getattr(shared, "maxRate", cap), cap), burst=1, concurrency=shared.concurrency)
+        return shared
+
+    def restoreDelta(self, limiter):
+        self.limiter = limiter
+
+    @staticmethod
+    def openJournal(journal: str, job: str):
+        """
+            opens journal file (None if not given) and reports rows already applied
+        """
+        if not journal:
+            return None
+        journal = JobJournal(journal)
+        done = journal.summary(job).get("ok", 0)
+        if done:
+            print(f"Resuming {job}: skipping {done} rows already applied")
+        return journal
+
+    @staticmethod
+    def readRows(f, header: bool, delimiter: str):
+        """
+            lazily reads CSV rows of open file f (header skipped), returns (header, rows)
+        """
+        reader = csv.reader(f, delimiter=delimiter)
+        hdr = next(reader, None) if header else None
+        return hdr, reader
+
+    def addClaimsFromRows(self, rows, outputFile=None, isTest: bool = False, journal: str = None, job: str = "addClaims", keepResults: bool = True, inflight: int = 1, rowKey=None):
+        """
+        Adds claims from any iterable of *entity_id, property_id, value_id* rows\n
+        each outcome is appended to outputFile as soon as it arrives
+
+        :param rows: iterable of (entity_id, property_id, value_id), consumed lazily
+        :param outputFile: CSV / JSON / JSONL file to stream results to
+        :param journal: SQLite file recording each row's outcome
+        :param job: name of job in journal
+        :param keepResults: when False responses are not kept in memory and a summary dict is returned instead
+        :param inflight: number of claims sent concurrently over the session (default 1)
+        :param rowKey: callable(rowNo, row) -> journal key of row (default rowNo), for row streams whose positions change between runs\n
+        *rows of the same entity always go to the same lane and are sent in file order (no edit conflicts),
+        with inflight > 1 outputFile is written in completion order*
+        """
+        fields = ["id", "entity_id", "property_id", "value_id"]
+        limiter = self.applyDelta()
+        journal = BulkWriter.openJournal(journal, job)
+        sink = ResultSink(outputFile, fields)
+        lock = threading.Lock()
+        resp = []
+        stats = {"rows": 0, "failed": 0}
+        start = report = time.perf_counter()
+
+        def outcome(rowNo, i):
+            if len(i) < 3:
+                return {"error": {"code": "bad-row", "info": f"expected entity_id, property_id, value_id, got {list(i)}"}}
+            key = rowKey(rowNo, i) if rowKey else rowNo
+            x = journal.get(job, key) if journal else None
+            if x is None:
+                try:
+                    x = self.addClaim(i[0], i[1], i[2], isTest=isTest)
+                except Exception as e:
+                    x = {"error": {"code": "exception", "info": str(e)}}
+                if journal:
+                    journal.record(job, key, x, ok="claim" in x)
+            return x
+
+        def submit(rowNo, i):
+            nonlocal report
+            # a bad row becomes an error result, it never stops the job (or a lane)
+            try:
+                x = outcome(rowNo, i)
+            except Exception as e:
+                x = {"error": {"code": "exception", "info": str(e)}}
+
+            cells = list(i)[:3]
+            cells += [""] * (3 - len(cells))
+            dt = {"id": "", "entity_id": cells[0],
+                  "property_id": cells[1], "value_id": cells[2]}
+            if "claim" in x and "id" in x["claim"]:
+                dt["id"] = x["claim"]["id"]
+
+            with lock:
+                stats["rows"] += 1
+                stats["failed"] += 0 if dt["id"] else 1
+                sink.write(dt, x)
+                if keepResults:
+                    resp.append((rowNo, x))
+
+                now = time.perf_counter()
+                if now - report >= BulkWriter.REPORT_EVERY:
+                    report = now
+                    print(f"{stats['rows']} claims, {stats['rows'] / (now - start):.1f}/s")
+
+        try:
+            if inflight <= 1:
+                for rowNo, i in enumerate(rows, 1):
+                    submit(rowNo, i)
+            else:
+                # larger pool for the lanes, keeping the session's retry policy, restored afterwards
+                adapters = {p: self.session.get_adapter(p + "x") for p in ["https://", "http://"]}
+                for p, a in adapters.items():
+                    self.session.mount(p, HTTPAdapter(
+                        pool_maxsize=inflight, max_retries=a.max_retries))
+
+                # one ordered lane per worker, entity picks the lane
+                lanes = [queue.Queue(maxsize=BulkWriter.LANE_SIZE)
+                         for _ in range(inflight)]
+
+                def worker(q):
+                    while True:
+                        item = q.get()
+                        if item is None:
+                            return
+                        try:
+                            submit(*item)
+                        except Exception as e:
+                            # keep draining the lane, a dead lane would block the reader forever
+                            print(f"Error on row {item[0]}", e)
+
+                threads = [threading.Thread(target=worker, args=(q,), daemon=True)
+                           for q in lanes]
+                for t in threads:
+                    t.start()
+                try:
+                    for rowNo, i in enumerate(rows, 1):
+                        lane = zlib.crc32(str(i[0] if len(i) else "").encode()) % inflight
+                        lanes[lane].put((rowNo, i))
+                finally:
+                    for q in lanes:
+                        q.put(None)
+                    for t in threads:
+                        t.join()
+                    for p, a in adapters.items():
+                        self.session.get_adapter(p + "x").close()
+                        self.session.mount(p, a)
+
+            took = time.perf_counter() - start
+            print(f"Claims added ({stats['rows']} in {took:.1f}s, {stats['rows'] / took if took else 0:.1f}/s)")
+            if keepResults:
+                resp.sort(key=lambda x: x[0])
+                return [x for _, x in resp]
+            return {"rows": stats["rows"], "failed": stats["failed"], "seconds": took,
+                    "perSecond": stats["rows"] / took if took else 0, "outputFile": outputFile}
+        finally:
+            sink.close()
+            if journal:
+                journal.close()
+            self.restoreDelta(limiter)
 
-    def addClaimsFromCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile=None, isTest: bool = False):
+    def addClaimsFromCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile=None, isTest: bool = False, journal: str = None, keepResults: bool = True, inflight: int = 1):
         """
         Create a new claim on a Wikidata entity.\n
         *Claims of type entity_id, property_id, value_id*
 
+        rows are read lazily and each result is appended to outputFile as it arrives
+
         :param fileSource: str, the path  of the CSV file having data as *entity_id, property_id,value_id*
         :param header:  boolean specifying if csv file has header or not
         :param delimiter:  source csv file separator
-        :param outputFile:  CSV file to store result
+        :param outputFile:  CSV / JSON / JSONL file to store result
+        :param journal: SQLite file recording each row's outcome, re-running with same journal skips rows already added
+        :param keepResults: when False (large files) responses are not kept in memory and a summary dict is returned
+        :param inflight: number of claims sent concurrently (claims of one entity stay in file order)
         """
 
         if not self.csrf_token:
@@ -29,52 +211,33 @@ class BulkWriter(WikiWriter):
 
         try:
             with open(fileSource, "r") as f:
-                reader = csv.reader(f, delimiter=delimiter)
-
-                if header:  # header set
-                    next(reader)
-
-                resp = []
-                fields = ["id", "entity_id", "property_id", "value_id"]
-                csvData = []
-                for i in reader:
-                    dt = {"entity_id": i[0],
-                          "property_id": i[1], "value_id": i[2]}
-                    x = self.addClaim(i[0], i[1], i[2], isTest=isTest)
-
-                    dt["id"] = ""
-                    if "claim" in x and "id" in x["claim"]:
-                        dt["id"] = x["claim"]["id"]
-
-                    resp.append(x)
-                    csvData.append(dt)
-
-                print("Claims added")
-                if outputFile:
-                    if outputFile.endswith(".json"):
-                        WikiWriter.dumpResult(resp, outputFile)
-
-                    elif outputFile.endswith(".csv"):
-                        WikiWriter.dumpCSV(outputFile, fields, csvData)
-                    else:
-                        print("Invalid output file specified. Specify JSON/CSV")
-                return resp
+                _, rows = BulkWriter.readRows(f, header, delimiter)
+                return self.addClaimsFromRows(rows, outputFile, isTest=isTest, journal=journal,
+                                              job=JobJournal.jobKey("addClaimsFromCSV", fileSource), keepResults=keepResults, inflight=inflight)
 
         except Exception as e:
             print("Error", e)
             return e
 
     # from names
-    def addClaimsFromNamesCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile=None, isTest: bool = False):
+    def addClaimsFromNamesCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile=None, isTest: bool = False, journal: str = None, keepResults: bool = True, workers: int = None, nameCache: str = None, inflight: int = 1):
         """
         Create a new claim on a Wikidata entity.\n
         *Claims of type entity_name, property_id, value_name*
 
+        distinct names of the file are resolved first (concurrently, each name once),
+        then rows are expanded from the resolved names
+
         :param fileSource: str, the path  of the CSV file having data as entity_name, property_id, value_name
         :param header:  boolean specifying if csv file has header or not
         :param delimiter:  source csv file separator
-        :param outputFile:  CSV file to store result
+        :param outputFile:  CSV / JSON / JSONL file to store result
         :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param journal: SQLite file recording each claim's outcome, re-running with same journal skips claims already added
+        :param keepResults: when False (large files) responses are not kept in memory and a summary dict is returned
+        :param workers: max name lookups in parallel
+        :param nameCache: SQLite file to persist resolved names across runs (in memory only if not given)
+        :param inflight: number of claims sent concurrently (claims of one entity stay in file order)
 
 
         "this is a labelef2no225N88EW3noe"
@@ -84,56 +247,57 @@ class BulkWriter(WikiWriter):
             print("You have no CSRF token, kindly login and then call getCSRFToken()")
             return
 
+        cache = EntityCache(maxsize=BulkWriter.NAME_CACHE_SIZE,
+                            ttl=BulkWriter.NAME_TTL, path=nameCache)
         try:
-
-            # change to suitable format file with
+            # resolve distinct names once
             with open(fileSource, "r") as f:
-                reader = csv.reader(f, delimiter=delimiter)
+                _, rows = BulkWriter.readRows(f, header, delimiter)
+                names = dict.fromkeys(x for i in rows for x in (i[0], i[2]))
 
-                if header:  # header set
-                    next(reader)
+            ids = WikiReader.reverseLookupMany(
+                names, limit=3, isTest=isTest, workers=workers, cache=cache)
+            print(f"Resolved {len(ids)} distinct names ({cache.stats()['hits']} from cache)")
+            del names
 
-                resp = []
-                fields = ["entity_id", "property_id", "value_id"]
-                csvData = []
-                for i in reader:
-                    eids = WikiReader.reverseLookup(
-                        i[0], isTest=True, limit=3)
-
-                    vids = WikiReader.reverseLookup(i[2], isTest=True, limit=3)
+            def claimRows(rows):
+                for rowNo, i in enumerate(rows, 1):
                     curr = []
-                    for e in eids:
-                        for v in vids:
-                            dt = {"entity_id": e["id"],
-                                  "property_id": i[1], "value_id": v["id"]}
-                            # avoid duplicate combos at row level (omit curr and use CSV DATA for global)
+                    for e in ids[i[0]]:
+                        for v in ids[i[2]]:
+                            dt = (e["id"], i[1], v["id"], rowNo)
+                            # avoid duplicate combos at row level
                             if dt not in curr:
                                 curr.append(dt)
-                    csvData.extend(curr)
-
-                # create temp file to hold data
-                WikiBase.dumpCSV(BulkWriter.TMP_FILE, fields, csvData)
+                    yield from curr
 
-                res = self.addClaimsFromCSV(
-                    BulkWriter.TMP_FILE, outputFile=outputFile, isTest=isTest)
+            # claims a row expands to depend on live search results, so they are journaled
+            # by source row and claim instead of their position in the expanded stream
+            def rowKey(_, claim):
+                return f"{claim[3]}:{claim[0]}|{claim[1]}|{claim[2]}"
 
-                # remove temp data
-                os.remove(BulkWriter.TMP_FILE)
-                return res
+            with open(fileSource, "r") as f:
+                _, rows = BulkWriter.readRows(f, header, delimiter)
+                return self.addClaimsFromRows(claimRows(rows), outputFile, isTest=isTest, journal=journal,
+                                              job=JobJournal.jobKey("addClaimsFromNamesCSV", fileSource), keepResults=keepResults, inflight=inflight, rowKey=rowKey)
 
         except Exception as e:
             print("Error in addClaimsFromNamesCSV()", e)
             return e
+        finally:
+            cache.close()
 
-    def createEntitiesFromCSV(self, fileSource: str, header: bool = True, delimiter: str = ",", outputFile: str = "created.csv", isTest: bool = False):
+    def createEntitiesFromCSV(self, fileSource: str, header: bool = True, delimiter: str = ",", outputFile: str = "created.csv", isTest: bool = False, journal: str = None, keepResults: bool = True):
         """
         Create a new  Wikidata entity per row in CSV file
 
         :param fileSource: str, the path  of the CSV file having
         :param header:  boolean specifying if csv file has header or not
         :param delimiter:  source csv file separator
-        :param outputFile:  store results here
+        :param outputFile:  store results here (CSV / JSON / JSONL, written row by row)
         :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param journal: SQLite file recording each row's outcome, re-running with same journal skips rows already created (no duplicates)
+        :param keepResults: when False (large files) responses are not kept in memory and a summary dict is returned
 
 
 
@@ -155,18 +319,23 @@ class BulkWriter(WikiWriter):
             print("You have no CSRF token, kindly login and then call getCSRFToken()")
             return
 
+        job = JobJournal.jobKey("createEntitiesFromCSV", fileSource)
+        limiter = self.applyDelta()
+        journal = BulkWriter.openJournal(journal, job)
+        sink = None
         try:
-            writeRes = []
             with open(fileSource, "r") as f:
-                reader = csv.reader(f, delimiter=delimiter)
+                hdr, reader = BulkWriter.readRows(f, header, delimiter)
+                if hdr:
+                    hdr = ["id"] + list(hdr)
 
-                if header:  # header set
-                    hdr = list(next(reader))
-                    hdr.insert(0, "id")
-                    writeRes.append(hdr)
+                if not outputFile or type(outputFile) != str:
+                    print("Invalid output file format specify JSON/CSV")
+                sink = ResultSink(outputFile, hdr)
 
                 resp = []
-                for i in reader:
+                cnt = failed = 0
+                for rowNo, i in enumerate(reader, 1):
 
                     # create labels descriptions using triplets
                     lbl = {}
@@ -180,52 +349,59 @@ class BulkWriter(WikiWriter):
 
                     if not aliases:
                         aliases = None
-                    x = self.createOrEditEntity(
-                        lbl, desc, aliases, isTest=isTest)
-                    curr = list(i)
-                    if not x or "error" in x:
-                        curr.insert(0, -1)
 
-                    elif "entity" in x and "id" in x["entity"]:
-                        curr.insert(0, x["entity"]["id"])
+                    x = journal.get(job, rowNo) if journal else None
+                    if x is None:
+                        x = self.createOrEditEntity(
+                            lbl, desc, aliases, isTest=isTest)
+                        if journal:
+                            journal.record(job, rowNo, x, ok=bool(
+                                x) and "entity" in x and "error" not in x)
 
+                    curr = list(i)
+                    if x and "error" not in x and "entity" in x and "id" in x["entity"]:
+                        curr.insert(0, x["entity"]["id"])
                     else:
                         curr.insert(0, -1)
+                        failed += 1
 
-                    resp.append(x)
-                    writeRes.append(curr)
-                    sleep(BulkWriter.DELTA)
+                    cnt += 1
+                    sink.write(curr, x)
+                    if keepResults:
+                        resp.append(x)
 
-                # write results to other CSV
                 print("Entities Created")
-                if not outputFile or type(outputFile) != str:
-                    print("Invalid output file format specify JSON/CSV")
-
-                elif outputFile.endswith('.csv'):
-
-                    with open(outputFile, mode="w", newline="") as f2:
-                        writer = csv.writer(f2)
-                        writer.writerows(writeRes)
-                elif outputFile.endswith('.json'):
-                    WikiWriter.dumpResult(resp, outputFile)
-                return resp
+                if keepResults:
+                    return resp
+                return {"rows": cnt, "failed": failed, "outputFile": outputFile}
 
         except Exception as e:
             print("Error", e)
             return e
         finally:
+            if sink:
+                sink.close()
+            if journal:
+                journal.close()
+            self.restoreDelta(limiter)
             print(
-                "If facing limit issues try after few time or increase BulkWriter.DELTA")
+                "If facing limit issues try after few time or lower the writer's limiter.maxRate")
 
-    def editEntitiesFromCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile: str = "", isTest: bool = False):
+    def editEntitiesFromCSV(self, fileSource: str, header: bool = True, delimiter=",", outputFile: str = "", isTest: bool = False, journal: str = None, keepResults: bool = True):
         """
         Performs a edit on Wikidata entity per row in CSV file specified by entity_id
 
+        rows of same entity_id are merged into a single edit (one wbeditentity call per entity)\n
+        status of each edit is appended to outputFile as soon as it completes\n
+        returns one response per input row in row order, rows of the same entity share that entity's response
+
         :param fileSource: str, the path  of the CSV file having
         :param header:  boolean specifying if csv file has header or not (default True)
         :param delimiter:  source csv file separator
-        :param outputFile:  CSV file to store status of edits
+        :param outputFile:  CSV (one line per input row) / JSON / JSONL file to store status of edits
         :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param journal: SQLite file recording each edit's outcome, re-running with same journal skips entities already edited
+        :param keepResults: when False (large files) responses are not kept in memory and a summary dict is returned
 
 
         CSV file format of rows (with optional header but specify if header present) 
@@ -238,35 +414,72 @@ class BulkWriter(WikiWriter):
             print("You have no CSRF token, kindly login and then call getCSRFToken()")
             return
 
+        job = JobJournal.jobKey("editEntitiesFromCSV", fileSource)
+        limiter = self.applyDelta()
+        journal = BulkWriter.openJournal(journal, job)
+        sink = None
         try:
             with open(fileSource, "r") as f:
-                reader = csv.reader(f, delimiter=delimiter)
-
-                if header:  # header set
-                    next(reader)
-
-                resp = []
-                hdr = ["id", "success"]
-                csvDt = []
-                for i in reader:
+                _, reader = BulkWriter.readRows(f, header, delimiter)
+
+                # entity_id -> merged labels, descriptions, aliases of its rows
+                edits = {}
+                for rowNo, i in enumerate(reader, 1):
+                    e = edits.setdefault(
+                        i[0], {"labels": {}, "descriptions": {}, "aliases": {}, "rows": []})
+                    e["labels"][i[1]] = i[2]
+                    e["descriptions"][i[1]] = i[3]
+                    if len(i) > 4 and i[4]:
+                        e["aliases"].setdefault(i[1], []).extend(
+                            i[4].split("|"))
+                    e["rows"].append((rowNo, i[1]))
+
+            resp = []
+            hdr = ["row", "id", "language_code", "success", "error"]
+            sink = ResultSink(outputFile, hdr)
+            cnt = failed = 0
+            for entity_id in list(edits):
+                # merged edit is dropped once sent
+                e = edits.pop(entity_id)
+
+                # edit journaled under first row of entity
+                first = e["rows"][0][0]
+                x = journal.get(job, first) if journal else None
+                if x is None:
                     x = self.createOrEditEntity(
-                        {i[1]: i[2]}, {i[1]: i[3]}, {i[1]: i[4].split("|")}, i[0], isTest=isTest)
-                    if "entity" in x and "success" in x:
-                        csvDt.append(
-                            {"id": x["entity"]["id"],  "success": x["success"]})
-                    resp.append(x)
-
-                    # sleep(BulkWriter.DELTA)
-                if outputFile and type(outputFile) == str and outputFile.endswith(".csv"):
-                    WikiWriter.dumpCSV(outputFile, hdr, csvDt)
-                return resp
+                        e["labels"], e["descriptions"], e["aliases"] or None, entity_id, isTest=isTest)
+                    if journal:
+                        journal.record(job, first, x, ok=bool(
+                            x) and "entity" in x and "success" in x)
+
+                ok = bool(x) and "entity" in x and "success" in x
+                err = "" if ok else (x["error"].get("info", "") if x and "error" in x else "failed")
+                for rowNo, lang in e["rows"]:
+                    sink.write({"row": rowNo, "id": entity_id, "language_code": lang,
+                                "success": x["success"] if ok else 0, "error": err})
+                    cnt += 1
+                    failed += 0 if ok else 1
+                    if keepResults:
+                        resp.append((rowNo, x))
+
+            print(f"{cnt} rows edited")
+            if keepResults:
+                # one response per input row, in row order (rows of an entity share its edit)
+                resp.sort(key=lambda r: r[0])
+                return [x for _, x in resp]
+            return {"rows": cnt, "failed": failed, "outputFile": outputFile}
 
         except Exception as e:
             print("Error", e)
             return e
         finally:
+            if sink:
+                sink.close()
+            if journal:
+                journal.close()
+            self.restoreDelta(limiter)
             print(
-                "If facing limit issues try after few time or increase BulkWriter.DELTA")
+                "If facing limit issues try after few time or lower the writer's limiter.maxRate")
 
 
 def bulk_add_claim_test(w: BulkWriter):
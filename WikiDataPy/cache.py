@@ -0,0 +1,186 @@
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class EntityCache:
+
+    # check disk size bound every DISK_CHECK writes
+    DISK_CHECK = 500
+    # seconds disk writes may stay uncommitted
+    COMMIT_EVERY = 1.0
+
+    def __init__(self, maxsize: int = 10000, ttl: float = None, path: str = None, maxDisk: int = None):
+        """
+        Two tier cache for reader lookups\n
+        in-memory LRU tier backed by an optional SQLite file that survives across runs\n
+        values must be JSON serializable, both tiers keep them as JSON text so every get
+        returns a fresh copy the caller may modify without touching the cached entry
+
+        :param maxsize: max entries kept in memory (least recently used evicted first)
+        :param ttl: default seconds an entry stays valid (None = never expires)
+        :param path: SQLite file for on-disk tier (None = memory only)
+        :param maxDisk: max entries kept on disk (least recently used evicted first, None = unbounded)\n
+        disk writes are committed at least every COMMIT_EVERY seconds and when the process exits
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.maxDisk = maxDisk
+        self.memory = OrderedDict()
+        self.lock = threading.RLock()
+
+        self.hits = self.misses = self.diskHits = self.evictions = 0
+        self.writes = 0
+
+        self.db = None
+        self.committed = time.monotonic()
+        self.finalizer = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self.db.commit()
+            # commits pending writes at exit (or once the cache is garbage collected) if never closed
+            self.finalizer = weakref.finalize(self, EntityCache.commitDb, self.db)
+
+    @staticmethod
+    def commitDb(db):
+        try:
+            db.commit()
+        except sqlite3.ProgrammingError:  # already closed
+            pass
+
+    @staticmethod
+    def makeKey(*parts):
+        """
+            builds cache key from parts e.g. (api, id, props, languages)
+        """
+        return "|".join("" if p is None else str(p) for p in parts)
+
+    def get(self, key: str, default=None):
+        """
+            Returns (a copy of) cached value of key or default on miss / expiry
+        """
+        now = time.time()
+        with self.lock:
+            if key in self.memory:
+                expires, value = self.memory[key]
+                if expires is None or expires > now:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+                if row and (row[1] is None or row[1] > now):
+                    self.db.execute(
+                        "UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                    self.setMemory(key, row[0], row[1])
+                    self.hits += 1
+                    self.diskHits += 1
+                    return json.loads(row[0])
+                if row:
+                    self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value, ttl: float = None):
+        """
+        Stores value under key
+
+        :param ttl: seconds this entry stays valid (default cache ttl)
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires = time.time() + ttl if ttl is not None else None
+        # stored as text, later changes to value do not leak into the cache
+        value = json.dumps(value)
+
+        with self.lock:
+            self.setMemory(key, value, expires)
+
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                                (key, value, expires, time.time()))
+                self.writes += 1
+                if self.writes % EntityCache.DISK_CHECK == 0:
+                    self.evictDisk()
+                    self.commit()
+                elif time.monotonic() - self.committed >= EntityCache.COMMIT_EVERY:
+                    self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.committed = time.monotonic()
+
+    def setMemory(self, key, value, expires):
+        self.memory[key] = (expires, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def evictDisk(self):
+        """
+            Removes expired entries and least recently used ones above maxDisk from disk
+        """
+        if self.db is None:
+            return
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+            if self.maxDisk:
+                cnt = self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                if cnt > self.maxDisk:
+                    self.db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                                    (cnt - self.maxDisk,))
+                    self.evictions += cnt - self.maxDisk
+
+    def delete(self, key: str):
+        with self.lock:
+            self.memory.pop(key, None)
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        """
+            Empties both tiers
+        """
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache")
+                self.db.commit()
+
+    def stats(self):
+        """
+            hit / miss counters
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "diskHits": self.diskHits,
+                "evictions": self.evictions, "size": len(self.memory),
+                "hitRate": self.hits / total if total else 0.0}
+
+    def flush(self):
+        """
+            Commits pending disk writes
+        """
+        if self.db is not None:
+            with self.lock:
+                self.evictDisk()
+                self.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.finalizer.detach()
+            self.db.close()
+            self.db = None
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .metrics import Metrics
+
+
+class WikiClient:
+
+    USER_AGENT = "WikiDataPy/0.0.2 (https://github.com/Aryan-ki-codepanti/wikiDataPy)"
+    DEFAULT = None
+    _LOCK = threading.Lock()
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, timeout=(5, 60), retries: int = 3, backoff: float = 0.5, headers: dict = None, session: requests.Session = None, queryTimeout=(5, 75)):
+        """
+        Initialises HTTP client owning a keep-alive connection pool\n
+        one client is shared by WikiReader, WikiSparql and WikiGraph so TCP/TLS
+        connections are reused across calls instead of opened per request
+
+        :param pool_connections: number of hosts to keep connection pools for
+        :param pool_maxsize: max connections kept alive per host (set >= number of worker threads)
+        :param timeout: seconds or (connect, read) tuple applied to every request
+        :param retries: retries for connection errors and 429/5xx responses on GET
+        :param backoff: backoff factor between retries (seconds)
+        :param headers: extra headers sent with every request
+        :param session: existing requests.Session to use (e.g. one pointed at a stub server)
+        :param queryTimeout: (connect, read) timeout of getQuery, read above the query service's 60 s limit
+        """
+        self.timeout = timeout
+        self.queryTimeout = queryTimeout
+        self.pool_maxsize = pool_maxsize
+        self.session = session if session is not None else requests.Session()
+
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 502, 503, 504), allowed_methods=("GET",),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=retry, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # query service: a read timeout means the query ran out its server side time, sending it again
+        # would only run it again, so only connection errors and 429/5xx are retried
+        self.queryAdapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                        max_retries=Retry(total=retries, read=0, backoff_factor=backoff,
+                                                          status_forcelist=(429, 502, 503, 504), allowed_methods=("GET",),
+                                                          respect_retry_after_header=True, raise_on_status=False),
+                                        pool_block=True)
+        self.mountLock = threading.Lock()
+
+        self.session.headers.update(
+            {"User-Agent": WikiClient.USER_AGENT, "Connection": "keep-alive"})
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url: str, params: dict = None, headers: dict = None, **kwargs):
+        """
+        Sends GET request over pooled connection and returns the response
+
+        :param url: endpoint to call
+        :param params: query parameters
+        :param headers: per request headers (merged with client headers)
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if not Metrics.HOOKS:
+            return self.session.get(url, params=params, headers=headers, **kwargs)
+
+        action = Metrics.actionOf(url, params)
+        start = time.perf_counter()
+        try:
+            r = self.session.get(url, params=params, headers=headers, **kwargs)
+        except Exception as e:
+            Metrics.request(action, "GET", url, latency=time.perf_counter() - start, error=str(e))
+            raise
+        Metrics.response(action, r, time.perf_counter() - start, stream=kwargs.get("stream", False))
+        return r
+
+    def getQuery(self, url: str, params: dict = None, headers: dict = None, **kwargs):
+        """
+        GET to a query service endpoint (SPARQL): read timeouts are not retried and
+        the read timeout is queryTimeout, otherwise as get
+        """
+        if self.session.adapters.get(url) is not self.queryAdapter:
+            self.mountQuery(url)
+        kwargs.setdefault("timeout", self.queryTimeout)
+        return self.get(url, params=params, headers=headers, **kwargs)
+
+    def mountQuery(self, url: str):
+        """
+            mounts query adapter for url, adapters dict is swapped whole as other threads may be reading it
+        """
+        with self.mountLock:
+            if self.session.adapters.get(url) is self.queryAdapter:
+                return
+            adapters = OrderedDict(self.session.adapters)
+            adapters[url] = self.queryAdapter
+            # requests picks the first matching prefix, longest first
+            self.session.adapters = OrderedDict(
+                sorted(adapters.items(), key=lambda x: -len(x[0])))
+
+    def getJSON(self, url: str, params: dict = None, headers: dict = None, **kwargs):
+        """
+        Sends GET request and returns decoded JSON body
+        """
+        return self.get(url, params=params, headers=headers, **kwargs).json()
+
+    def close(self):
+        """
+            Closes all pooled connections
+        """
+        self.session.close()
+        self.queryAdapter.close()
+
+    @staticmethod
+    def getDefault():
+        """
+            Returns shared client used by all reader calls (created on first use)
+        """
+        if WikiClient.DEFAULT is None:
+            with WikiClient._LOCK:
+                if WikiClient.DEFAULT is None:
+                    WikiClient.DEFAULT = WikiClient()
+        return WikiClient.DEFAULT
+
+    @staticmethod
+    def setDefault(client: "WikiClient"):
+        """
+        Replaces shared client, e.g. to tune pool size / timeouts
+        or to inject a client for tests\n
+        the previous client is returned, not closed: calls already running may still use it,
+        the caller closes it once they are done
+
+        :param client: WikiClient instance or None to reset to default
+        """
+        with WikiClient._LOCK:
+            old = WikiClient.DEFAULT
+            WikiClient.DEFAULT = client
+        return old
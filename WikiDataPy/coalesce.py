@@ -0,0 +1,176 @@
+import copy
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+
+    def __init__(self):
+        """
+        Thread safe request coalescing\n
+        concurrent calls with the same key share one execution of fn and its result,
+        a key is only in flight while its call runs (nothing is cached afterwards)
+
+        results are shared between callers, treat them as read only
+
+        usage:
+            flight = SingleFlight()
+            res = flight.do(key, fn, *args)
+        """
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.calls = self.shared = 0
+
+    def do(self, key, fn, *args):
+        """
+            result of fn(*args), or of the call already in flight for key
+        """
+        with self.lock:
+            f = self.inflight.get(key)
+            leader = f is None
+            if leader:
+                f = self.inflight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return f.result()
+
+        try:
+            x = fn(*args)
+            f.set_result(x)
+            return x
+        except BaseException as e:
+            f.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def stats(self):
+        """
+            calls executed and calls served by a call already in flight
+        """
+        with self.lock:
+            return {"calls": self.calls, "shared": self.shared}
+
+
+class Batch:
+
+    def __init__(self):
+        self.ids = {}
+        self.callers = 0
+        self.full = threading.Event()
+        self.result = Future()
+
+
+class EntityBatcher:
+
+    def __init__(self, window: float = 0.002, maxIds: int = 50):
+        """
+        Micro batching of wbgetentities calls\n
+        while a request for a key (api + params) is in flight, ids asked for with the same
+        key within window seconds are merged into one request of up to maxIds ids and
+        each caller gets the entities it asked for, a call with nothing in flight is sent at once\n
+        callers of a merged batch each get their own copy of the response
+
+        :param window: seconds the first caller of a batch waits for others to join
+        :param maxIds: max ids per request (a full batch is sent at once)
+        """
+        self.window = window
+        self.maxIds = maxIds
+        self.lock = threading.Lock()
+        self.open = {}
+        self.active = {}
+        self.requests = self.calls = 0
+
+    @staticmethod
+    def pick(res: dict, ids: list[str]):
+        """
+            response restricted to entities of ids, ids redirected / normalised by the server are followed
+        """
+        ents = res.get("entities")
+        if ents is None:
+            return res
+
+        alias = {}
+        for k, e in ents.items():
+            r = e.get("redirects") if type(e) == dict else None
+            if type(r) == dict and "from" in r:
+                alias[r["from"]] = k
+        norm = res.get("normalized", {})
+        for n in (norm.values() if type(norm) == dict else norm):
+            if type(n) == dict and "from" in n:
+                alias[n["from"]] = n.get("to")
+
+        x = {}
+        for i in ids:
+            k = i if i in ents else alias.get(i, i.upper())
+            if k in ents:
+                x[k] = ents[k]
+        return {"entities": x, "success": res.get("success", 1)}
+
+    def get(self, key, ids: list[str], fetch):
+        """
+        wbgetentities response for ids, sent together with ids of concurrent callers
+
+        :param key: batches are only shared by calls with the same key (e.g. api and params without ids)
+        :param ids: ids this caller needs
+        :param fetch: callable(ids) -> decoded wbgetentities response
+        """
+        ids = list(dict.fromkeys(ids))
+        with self.lock:
+            self.calls += 1
+            b = self.open.get(key)
+            if b is not None and len(b.ids.keys() | set(ids)) > self.maxIds:
+                # does not fit, send the open batch now and start a new one
+                del self.open[key]
+                b.full.set()
+                b = None
+
+            leader = b is None
+            if leader:
+                b = self.open[key] = Batch()
+                # nothing in flight for key, no one to batch with (sequential callers never wait)
+                if not self.active.get(key):
+                    b.full.set()
+            b.ids.update(dict.fromkeys(ids))
+            b.callers += 1
+            if len(b.ids) >= self.maxIds and self.open.get(key) is b:
+                del self.open[key]
+                b.full.set()
+
+        if leader:
+            b.full.wait(self.window)
+            with self.lock:
+                if self.open.get(key) is b:
+                    del self.open[key]
+                batch = list(b.ids)
+                self.requests += 1
+                self.active[key] = self.active.get(key, 0) + 1
+            try:
+                b.result.set_result(fetch(batch))
+            except BaseException as e:
+                b.result.set_exception(e)
+            finally:
+                with self.lock:
+                    self.active[key] -= 1
+                    if not self.active[key]:
+                        del self.active[key]
+
+        res = b.result.result()
+        if len(b.ids) != len(ids):
+            if "error" in res:
+                # one bad id fails the whole request, ask again for own ids only
+                return fetch(ids)
+            res = EntityBatcher.pick(res, ids)
+        # the batch is closed once sent, so callers is final here
+        return copy.deepcopy(res) if b.callers > 1 else res
+
+    def stats(self):
+        """
+            calls received and requests sent
+        """
+        with self.lock:
+            return {"calls": self.calls, "requests": self.requests}
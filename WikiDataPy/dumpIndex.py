@@ -0,0 +1,296 @@
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+from .dumpReader import DumpReader, entityId
+from .reader import WikiReader
+
+
+class DumpIndex:
+
+    # id prefix -> code, key of an id is code << 40 | number (Q42 -> 1 << 40 | 42)
+    PREFIX = {"Q": 1, "P": 2, "L": 3, "M": 4, "E": 5}
+    ENTRY = np.dtype([("key", "<i8"), ("offset", "<i8"), ("length", "<i4"), ("block", "<i4")])
+    BLOCK = np.dtype([("offset", "<i8"), ("length", "<i8")])
+
+    # uncompressed bytes per block written by compress, a lookup decompresses one block
+    # (64 KiB takes ~0.1-0.3 ms to inflate, larger blocks compress better but read slower)
+    BLOCK_SIZE = 1 << 16
+    # decompressed blocks kept in memory (block compressed dumps)
+    BLOCK_CACHE = 64
+
+    def __init__(self, path: str, cache: int = None):
+        """
+        Random access to entities of a local dump through a byte offset index\n
+        the index is a sorted array of (key, offset, length, block) memory mapped from
+        <path>.idx.npy, a lookup is a binary search plus one slice of the memory mapped dump
+
+        dumps are either plain .json (offsets point into the file) or block compressed
+        .json.gz written by DumpIndex.compress (offsets point into a decompressed block)
+
+        cost per lookup
+            - plain .json : ~10 µs to locate the bytes (raw), plus JSON decoding of the entity (get)
+            - block .json.gz : inflating its block when not cached (~0.1-0.3 ms for 64 KiB blocks,
+              grows with blockSize given to compress), then as above
+
+        :param path: dump file, indexed beforehand with DumpIndex.build or DumpIndex.compress
+        :param cache: decompressed blocks kept in memory (default DumpIndex.BLOCK_CACHE)
+
+        usage:
+            DumpIndex.build("latest-all.json")   # once
+            idx = DumpIndex("latest-all.json")
+            idx.get("Q42")
+            WikiReader.setBackend(idx)   # WikiReader / WikiGraph served offline
+        """
+        self.path = path
+        self.entries = np.load(DumpIndex.indexPath(path), mmap_mode="r")
+        self.keys = self.entries["key"]
+
+        blocks = DumpIndex.blockPath(path)
+        self.blocks = np.load(blocks, mmap_mode="r") if os.path.exists(blocks) else None
+        self.cache = OrderedDict()
+        self.cacheSize = cache if cache else DumpIndex.BLOCK_CACHE
+        self.lock = threading.Lock()
+
+        self.f = open(path, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    # helper
+    @staticmethod
+    def indexPath(path: str):
+        return path + ".idx.npy"
+
+    @staticmethod
+    def blockPath(path: str):
+        return path + ".blocks.npy"
+
+    @staticmethod
+    def key(id_: str):
+        """
+            int64 key of entity id (-1 if not a Q/P/L/M/E id)
+        """
+        code = DumpIndex.PREFIX.get(id_[:1])
+        if code is None or not id_[1:].isdigit():
+            return -1
+        return code << 40 | int(id_[1:])
+
+    @staticmethod
+    def save(path: str, keys: list, offsets: list, lengths: list, blocks: list = None, blockTable: list = None):
+        entries = np.empty(len(keys), dtype=DumpIndex.ENTRY)
+        entries["key"] = keys
+        entries["offset"] = offsets
+        entries["length"] = lengths
+        entries["block"] = blocks if blocks is not None else -1
+        entries.sort(order="key", kind="stable")
+        np.save(DumpIndex.indexPath(path), entries)
+
+        if blockTable is not None:
+            np.save(DumpIndex.blockPath(path), np.array(blockTable, dtype=DumpIndex.BLOCK))
+        elif os.path.exists(DumpIndex.blockPath(path)):
+            os.remove(DumpIndex.blockPath(path))
+        return len(entries)
+
+    @staticmethod
+    def lineId(line: bytes):
+        id_ = entityId(line)
+        return id_ if id_ is not None else json.loads(line.rstrip(b",\r\n")).get("id", "")
+
+    # building
+
+    @staticmethod
+    def build(path: str):
+        """
+        Indexes a plain .json dump in one sequential pass (for compressed dumps use compress)
+
+        returns number of entities indexed
+        """
+        keys, offsets, lengths = [], [], []
+        pos = 0
+        with open(path, "rb") as f:
+            for line in f:
+                n = len(line)
+                body = line.rstrip(b"\r\n")
+                if body.endswith(b","):
+                    body = body[:-1]
+                if body.strip() and body.strip() not in [b"[", b"]"]:
+                    k = DumpIndex.key(DumpIndex.lineId(body))
+                    if k >= 0:
+                        keys.append(k)
+                        offsets.append(pos)
+                        lengths.append(len(body))
+                pos += n
+        return DumpIndex.save(path, keys, offsets, lengths)
+
+    @staticmethod
+    def compress(src: str, dst: str, blockSize: int = None, level: int = 6):
+        """
+        Rewrites any dump DumpReader can read as a block compressed .json.gz and indexes it\n
+        entities are packed in gzip members of about blockSize uncompressed bytes, so an entity
+        is read by decompressing only its block, and dst stays a valid gzip file / dump
+
+        :param src: source dump (.json, .json.gz, .json.bz2)
+        :param dst: block compressed dump to write (.json.gz)
+        :param blockSize: uncompressed bytes per block (default DumpIndex.BLOCK_SIZE, smaller = faster lookups, larger = better ratio)
+
+        returns number of entities indexed
+        """
+        keys, offsets, lengths, blocks, table = [], [], [], [], []
+
+        with open(dst, "wb") as out:
+            def flush(lines):
+                data = b"".join(lines)
+                c = zlib.compressobj(level, zlib.DEFLATED, 31)
+                member = c.compress(data) + c.flush()
+                table.append((out.tell(), len(member)))
+                out.write(member)
+
+            blockSize = blockSize if blockSize else DumpIndex.BLOCK_SIZE
+            buf, pos, count, written = [b"[\n"], 2, 0, 0
+            for line in DumpReader(src, workers=1).lines():
+                # an entity larger than blockSize gets a block of its own
+                if count and pos + len(line) > blockSize:
+                    flush(buf)
+                    buf, pos, count = [], 0, 0
+                # separator goes before every entity but the first
+                if written:
+                    buf.append(b",\n")
+                    pos += 2
+                k = DumpIndex.key(DumpIndex.lineId(line))
+                if k >= 0:
+                    keys.append(k)
+                    offsets.append(pos)
+                    lengths.append(len(line))
+                    blocks.append(len(table))
+                buf.append(line)
+                pos += len(line)
+                count += 1
+                written += 1
+            buf.append(b"\n]\n")
+            flush(buf)
+
+        return DumpIndex.save(dst, keys, offsets, lengths, blocks, table)
+
+    # lookups
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, id_: str):
+        return self.find(id_) >= 0
+
+    def find(self, id_: str):
+        """
+            position of id_ in index (-1 if not indexed)
+        """
+        k = DumpIndex.key(id_)
+        i = int(np.searchsorted(self.keys, k))
+        return i if i < len(self.keys) and self.keys[i] == k else -1
+
+    def block(self, b: int):
+        """
+            decompressed block b (LRU cached)
+        """
+        with self.lock:
+            data = self.cache.get(b)
+            if data is not None:
+                self.cache.move_to_end(b)
+                return data
+
+        off, n = self.blocks[b]
+        data = zlib.decompress(self.mm[int(off):int(off) + int(n)], 31)
+        with self.lock:
+            self.cache[b] = data
+            if len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+        return data
+
+    def raw(self, id_: str):
+        """
+            JSON bytes of entity (zero copy memoryview of the mapped file for plain dumps), None if not indexed
+        """
+        i = self.find(id_)
+        if i < 0:
+            return None
+        e = self.entries[i]
+        off, n, b = int(e["offset"]), int(e["length"]), int(e["block"])
+        if b < 0:
+            return memoryview(self.mm)[off:off + n]
+        return memoryview(self.block(b))[off:off + n]
+
+    def get(self, id_: str):
+        """
+            decoded entity of id_ (None if not in dump)
+        """
+        x = self.raw(id_)
+        return json.loads(bytes(x)) if x is not None else None
+
+    def getMany(self, ids: list[str], errors: list = None):
+        """
+        decoded entities of ids (id -> entity, ids not in dump left out)\n
+        entities are read in file order (block, offset) so each block is inflated once
+        and pages of plain dumps are read sequentially
+
+        :param errors: if a list is passed, entities that could not be read are appended to it as {"ids": [...], "error": {...}}
+        """
+        pos = {}
+        for i in dict.fromkeys(ids):
+            p = self.find(i)
+            if p >= 0:
+                pos[i] = p
+
+        e = self.entries
+        order = sorted(pos, key=lambda i: (int(e[pos[i]]["block"]), int(e[pos[i]]["offset"])))
+        res = {}
+        for i in order:
+            try:
+                res[i] = self.get(i)
+            except (ValueError, zlib.error) as ex:
+                if errors is None:
+                    raise
+                errors.append({"ids": [i], "error": {"code": "dump-read-failed", "info": str(ex)}})
+        return res
+
+    def getEntitiesByIds(self, id_: list[str] = ["Q42"], options: dict = {"languages": ["en"], "sitelinks": ["enwiki"], "props": ["descriptions"]}, outputFile: str = None, errors: list = None):
+        """
+        WikiReader.getEntitiesByIds served from the index (same options and result shape)\n
+        ids not in the dump are returned as {"id": ..., "missing": ""}
+
+        :param errors: if a list is passed, entities that could not be read are appended to it as {"ids": [...], "error": {...}}
+        """
+        params = WikiReader.entityParams(options)
+        ids = list(dict.fromkeys(id_.split("|") if type(id_) == str else id_))
+
+        found = self.getMany(ids, errors=errors)
+        res = {i: DumpReader.shapeEntity(found[i], params) if i in found else {"id": i, "missing": ""}
+               for i in ids}
+
+        WikiReader.dumpEntities(
+            res, outputFile, params.get("languages", "en").split("|"))
+        return res
+
+    def getClaims(self, id_: str = "Q42", options: dict = {"rank": "normal"}, outputFile: str = ""):
+        """
+            WikiReader.getClaims served from the index (same result shape)
+        """
+        ent = self.get(id_)
+        if ent is None:
+            print("Error in get claims")
+            return
+        res = DumpReader.filterClaims(ent.get("claims", {}), options)
+        WikiReader.dumpClaims(res, outputFile)
+        return res
+
+    def close(self):
+        if type(self.mm) == mmap.mmap:
+            self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,279 @@
+import bz2
+import gzip
+import json
+import os
+import shutil
+import subprocess
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from .reader import WikiReader
+
+
+def entityId(line: bytes):
+    """
+        id of entity line without decoding it (dump lines start with {"type":"item","id":"Q..."), None if not found
+    """
+    i = line.find(b'"id":"', 0, 200)
+    if i < 0:
+        return None
+    j = line.find(b'"', i + 6)
+    return line[i + 6:j].decode() if j > 0 else None
+
+
+def keepEntity(ent: dict, types, props, languages):
+    """
+        True if ent passes filters, prunes label / description / alias languages in place
+    """
+    if types and ent.get("type") not in types:
+        return False
+    if props:
+        claims = ent.get("claims") or {}
+        if not all(p in claims for p in props):
+            return False
+    if languages:
+        for k in ["labels", "descriptions", "aliases"]:
+            if k in ent:
+                ent[k] = {l: v for l, v in ent[k].items() if l in languages}
+    return True
+
+
+def decodeLines(lines: list[bytes], types=None, props=None, languages=None, ids=None):
+    """
+        decodes and filters a chunk of dump lines (runs in worker processes)
+    """
+    out = []
+    for line in lines:
+        if ids is not None:
+            id_ = entityId(line)
+            if id_ is not None and id_ not in ids:
+                continue
+        ent = json.loads(line)
+        if ids is not None and ent.get("id") not in ids:
+            continue
+        if keepEntity(ent, types, props, languages):
+            out.append(ent)
+    return out
+
+
+class DumpReader:
+
+    # dump lines per task sent to a worker process
+    CHUNK = 2000
+    WORKERS = os.cpu_count() or 1
+
+    # parallel decompressors run as a separate process when installed
+    DECOMPRESSORS = {".gz": [["pigz", "-dc"]],
+                     ".bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"]]}
+
+    def __init__(self, path: str, workers: int = None, chunk: int = None):
+        """
+        Reads a local Wikidata JSON dump (.json, .json.gz, .json.bz2) entity by entity\n
+        the dump is never loaded whole: lines are streamed from the (decompressed) file and
+        JSON decoding plus filtering runs in a pool of worker processes, chunk by chunk
+
+        :param path: dump file (one entity per line inside a JSON array, as on dumps.wikimedia.org)
+        :param workers: decoding processes (default DumpReader.WORKERS, 1 decodes in this process)
+        :param chunk: lines per task (default DumpReader.CHUNK)
+
+        usage:
+            d = DumpReader("latest-all.json.gz")
+            for ent in d.entities(types=["item"], props=["P31"], languages=["en"]):
+                ...
+        """
+        self.path = path
+        self.workers = workers if workers else DumpReader.WORKERS
+        self.chunk = chunk if chunk else DumpReader.CHUNK
+
+    # helper
+
+    @contextmanager
+    def open(self):
+        """
+            binary file object over decompressed dump, decompressed by a pigz / lbzip2 process if installed
+        """
+        for ext, cmds in DumpReader.DECOMPRESSORS.items():
+            if not self.path.endswith(ext):
+                continue
+            for cmd in cmds:
+                if shutil.which(cmd[0]):
+                    proc = subprocess.Popen(cmd + [self.path], stdout=subprocess.PIPE,
+                                            bufsize=1 << 20)
+                    try:
+                        yield proc.stdout
+                    finally:
+                        proc.stdout.close()
+                        proc.terminate()
+                        proc.wait()
+                    return
+
+        if self.path.endswith(".gz"):
+            f = gzip.open(self.path, "rb")
+        elif self.path.endswith(".bz2"):
+            f = bz2.open(self.path, "rb")
+        else:
+            f = open(self.path, "rb")
+        with f:
+            yield f
+
+    def lines(self):
+        """
+            generator over raw JSON lines of entities (array brackets and trailing commas stripped)
+        """
+        with self.open() as f:
+            for line in f:
+                line = line.strip()
+                if line.endswith(b","):
+                    line = line[:-1]
+                if not line or line in [b"[", b"]"]:
+                    continue
+                yield line
+
+    def chunks(self):
+        it = self.lines()
+        while True:
+            c = list(islice(it, self.chunk))
+            if not c:
+                return
+            yield c
+
+    # functionalities
+
+    def entities(self, types: list[str] = None, props: list[str] = None, languages: list[str] = None, ids: list[str] = None):
+        """
+        Generator over entities of dump (in dump order) passing all given filters
+
+        :param types: entity types to keep e.g. ["item"] or ["property"]
+        :param props: keep only entities having claims for all these properties e.g. ["P31", "P279"]
+        :param languages: labels / descriptions / aliases are pruned to these languages
+        :param ids: keep only these ids (lines of other entities are skipped without decoding)
+        """
+        args = (set(types) if types else None, set(props) if props else None,
+                set(languages) if languages else None, set(ids) if ids is not None else None)
+
+        if self.workers <= 1:
+            for c in self.chunks():
+                yield from decodeLines(c, *args)
+            return
+
+        # bounded window of chunks in flight so memory stays flat on any dump size
+        with ProcessPoolExecutor(max_workers=self.workers) as ex:
+            pending = deque()
+            for c in self.chunks():
+                pending.append(ex.submit(decodeLines, c, *args))
+                if len(pending) >= 2 * self.workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def __iter__(self):
+        return self.entities()
+
+    @staticmethod
+    def shapeEntity(ent: dict, params: dict):
+        """
+            entity trimmed like a wbgetentities response for params (props / languages / sitelinks)
+        """
+        props = params.get("props")
+        props = props.split("|") if props else [
+            "info", "sitelinks", "aliases", "labels", "descriptions", "claims", "datatype"]
+        langs = params.get("languages")
+        langs = set(langs.split("|")) if langs else None
+        sites = params.get("sitefilter") or params.get("sitelinks")
+        sites = set(sites.split("|")) if sites else None
+
+        x = {"type": ent.get("type"), "id": ent.get("id")}
+        if "info" in props:
+            for k in ["pageid", "ns", "title", "lastrevid", "modified"]:
+                if k in ent:
+                    x[k] = ent[k]
+        for k in props:
+            if k not in ent or k == "info":
+                continue
+            v = ent[k]
+            if langs and k in ["labels", "descriptions", "aliases"]:
+                v = {l: y for l, y in v.items() if l in langs}
+            if sites and k == "sitelinks":
+                v = {s: y for s, y in v.items() if s in sites}
+            x[k] = v
+        return x
+
+    filterClaims = staticmethod(WikiReader.filterClaims)
+
+    def getEntitiesByIds(self, id_: list[str] = ["Q42"], options: dict = {"languages": ["en"], "sitelinks": ["enwiki"], "props": ["descriptions"]}, outputFile: str = None, errors: list = None):
+        """
+        WikiReader.getEntitiesByIds served from the dump (same options and result shape)\n
+        one pass over the dump that stops as soon as every id is found,
+        ids not in the dump are returned as {"id": ..., "missing": ""}
+
+        *every call scans the dump, for repeated lookups index it with DumpIndex*
+
+        :param id_: list of ids of entities to fetch (any size)
+        :param options: languages / props / sitelinks, as for WikiReader.getEntitiesByIds
+        :param outputFile: store output at this file (CSV/JSON/Parquet/Arrow)
+        :param errors: if a list is passed, a failed scan is appended to it as {"ids": [ids not found], "error": {...}}
+        """
+        params = WikiReader.entityParams(options)
+        ids = list(dict.fromkeys(id_.split("|") if type(id_) == str else id_))
+        todo = set(ids)
+
+        found = {}
+        try:
+            for ent in self.entities(ids=todo):
+                found[ent["id"]] = DumpReader.shapeEntity(ent, params)
+                if len(found) == len(todo):
+                    break
+        except (OSError, ValueError, EOFError) as e:
+            if errors is None:
+                raise
+            errors.append({"ids": [i for i in ids if i not in found],
+                           "error": {"code": "dump-read-failed", "info": str(e)}})
+
+        res = {i: found.get(i, {"id": i, "missing": ""}) for i in ids}
+        WikiReader.dumpEntities(
+            res, outputFile, params.get("languages", "en").split("|"))
+        return res
+
+    def getClaims(self, id_: str = "Q42", options: dict = {"rank": "normal"}, outputFile: str = ""):
+        """
+        WikiReader.getClaims served from the dump (same result shape)\n
+        *every call scans the dump up to the entity, for repeated lookups index it with DumpIndex*
+
+        :param options:
+            - rank: keep only claims of this rank (deprecated, normal, preferred)
+            - property: keep only claims of this property
+        """
+        ent = next(iter(self.entities(ids=[id_])), None)
+        if ent is None:
+            print("Error in get claims")
+            return
+
+        res = DumpReader.filterClaims(ent.get("claims", {}), options)
+        WikiReader.dumpClaims(res, outputFile)
+        return res
+
+    def getRelatedEntitiesProps(self, id_: str, limit=None):
+        """
+            WikiReader.getRelatedEntitiesProps served from the dump
+        """
+        return WikiReader.relatedPairs(self.getClaims(id_, outputFile=None), limit)
+
+    @staticmethod
+    def writeDump(entities, path: str):
+        """
+        Writes entities in Wikidata dump format (gzip / bz2 by extension), e.g. to build fixture dumps
+
+        :param entities: entities dict (id -> entity) or iterable of entities
+        """
+        opener = gzip.open if path.endswith(".gz") else bz2.open if path.endswith(".bz2") else open
+        items = entities.values() if type(entities) == dict else entities
+        with opener(path, "wt") as f:
+            f.write("[\n")
+            first = True
+            for ent in items:
+                if not first:
+                    f.write(",\n")
+                f.write(json.dumps(ent, ensure_ascii=False, separators=(",", ":")))
+                first = False
+            f.write("\n]\n")
@@ -0,0 +1,194 @@
+import numpy as np
+
+
+class GraphStore:
+
+    # membership / neighbour queries scan up to this many pending edges before a rebuild
+    BATCH = 4096
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Compact edge store for WikiGraph\n
+        node and property IDs are interned to integers and edges are kept as
+        three contiguous int32 arrays (COO), with a CSR index built on demand
+
+        behaves like the set of (QID, PID, QID) tuples it replaces: supports
+        add, len, iteration and membership tests\n
+        add only appends, duplicates are dropped and the CSR index rebuilt lazily
+        when the graph is next read, so a run of adds costs one rebuild
+
+        :param capacity: initial number of edges to allocate room for
+        """
+        self.nodeIds = {}
+        self.nodeNames = []
+        self.propIds = {}
+        self.propNames = []
+
+        self.src = np.empty(capacity, dtype=np.int32)
+        self.prop = np.empty(capacity, dtype=np.int32)
+        self.dst = np.empty(capacity, dtype=np.int32)
+        self.size = 0
+
+        # (indptr, order) over the first `built` (deduped) edges sorted by src
+        self.csr = None
+        self.built = 0
+
+    # helper
+    @staticmethod
+    def intern(table: dict, names: list, x: str):
+        i = table.get(x)
+        if i is None:
+            i = table[x] = len(names)
+            names.append(x)
+        return i
+
+    def grow(self):
+        cap = max(2 * len(self.src), 1024)
+        for k in ["src", "prop", "dst"]:
+            arr = np.empty(cap, dtype=np.int32)
+            arr[:self.size] = getattr(self, k)[:self.size]
+            setattr(self, k, arr)
+
+    def buildCSR(self):
+        """
+            dedupes edges added since last build and indexes them by source node (CSR)
+        """
+        if self.csr is None or self.built < self.size:
+            self.dedupe()
+            src = self.src[:self.size]
+            order = np.argsort(src, kind="stable")
+            indptr = np.zeros(len(self.nodeNames) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=len(
+                self.nodeNames)), out=indptr[1:])
+            self.csr = (indptr, order)
+            self.built = self.size
+        return self.csr
+
+    def pendingIndexes(self):
+        """
+            indexes of edges added since last build, rebuilds first when there are more than BATCH
+        """
+        if self.size - self.built > GraphStore.BATCH:
+            self.buildCSR()
+        return np.arange(self.built, self.size)
+
+    # set like interface
+
+    def add(self, edge: tuple):
+        """
+            adds (QID, PID, QID) edge
+        """
+        s, p, o = edge
+        if self.size == len(self.src):
+            self.grow()
+
+        self.src[self.size] = GraphStore.intern(
+            self.nodeIds, self.nodeNames, s)
+        self.prop[self.size] = GraphStore.intern(
+            self.propIds, self.propNames, p)
+        self.dst[self.size] = GraphStore.intern(
+            self.nodeIds, self.nodeNames, o)
+        self.size += 1
+
+    def update(self, edges):
+        for e in edges:
+            self.add(e)
+
+    def __len__(self):
+        self.buildCSR()
+        return self.size
+
+    def __iter__(self):
+        self.buildCSR()
+        for i in range(self.size):
+            yield (self.nodeNames[self.src[i]], self.propNames[self.prop[i]], self.nodeNames[self.dst[i]])
+
+    def __contains__(self, edge):
+        s, p, o = edge
+        if s not in self.nodeIds or p not in self.propIds or o not in self.nodeIds:
+            return False
+        idx = self.edgeIndexes(self.nodeIds[s])
+        return bool(np.any((self.prop[idx] == self.propIds[p]) & (self.dst[idx] == self.nodeIds[o])))
+
+    def dedupe(self):
+        """
+            removes duplicate edges (keeps first occurrence order), done by every rebuild
+        """
+        if self.built == self.size:
+            return
+        rows = np.stack([self.src[:self.size], self.prop[:self.size],
+                         self.dst[:self.size]], axis=1)
+        _, first = np.unique(rows, axis=0, return_index=True)
+        keep = np.sort(first)
+        self.size = len(keep)
+        self.src[:self.size] = rows[keep, 0]
+        self.prop[:self.size] = rows[keep, 1]
+        self.dst[:self.size] = rows[keep, 2]
+
+    # queries
+
+    def edgeIndexes(self, node: int):
+        """
+            indexes of outgoing edges of node: indexed ones plus matching pending ones
+        """
+        if self.csr is None:
+            self.buildCSR()
+        pending = self.pendingIndexes()
+        indptr, order = self.csr
+        idx = order[indptr[node]:indptr[node + 1]] if node + 1 < len(indptr) else order[:0]
+        if len(pending):
+            idx = np.concatenate([idx, pending[self.src[pending] == node]])
+        return idx
+
+    def neighbours(self, node: str):
+        """
+            (PID, QID) pairs of outgoing edges of node
+        """
+        if node not in self.nodeIds:
+            return []
+        idx = self.edgeIndexes(self.nodeIds[node])
+        return list(dict.fromkeys((self.propNames[p], self.nodeNames[d]) for p, d in zip(self.prop[idx], self.dst[idx])))
+
+    def outDegree(self, node: str = None):
+        """
+            out degree of node, or array of out degrees of all nodes (indexed by interned id)
+        """
+        self.buildCSR()
+        deg = np.bincount(self.src[:self.size], minlength=len(self.nodeNames))
+        if node is None:
+            return deg
+        return int(deg[self.nodeIds[node]]) if node in self.nodeIds else 0
+
+    def inDegree(self, node: str = None):
+        """
+            in degree of node, or array of in degrees of all nodes (indexed by interned id)
+        """
+        self.buildCSR()
+        deg = np.bincount(self.dst[:self.size], minlength=len(self.nodeNames))
+        if node is None:
+            return deg
+        return int(deg[self.nodeIds[node]]) if node in self.nodeIds else 0
+
+    # export
+
+    def toNetworkx(self):
+        """
+            networkx DiGraph with property ids as edge 'label'
+        """
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodeNames)
+        G.add_edges_from((s, o, {"label": p}) for s, p, o in self)
+        return G
+
+    def toScipy(self):
+        """
+            scipy.sparse CSR adjacency matrix (nodes indexed by interned id, requires scipy)
+        """
+        from scipy.sparse import csr_matrix
+
+        self.buildCSR()
+        n = len(self.nodeNames)
+        data = np.ones(self.size, dtype=np.int8)
+        return csr_matrix((data, (self.src[:self.size], self.dst[:self.size])), shape=(n, n))
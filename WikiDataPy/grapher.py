@@ -3,13 +3,17 @@ import networkx as nx
 import matplotlib.pyplot as plt
 from .reader import WikiReader
 from .BASE import WikiBase
+from .graphStore import GraphStore
 
 from matplotlib import pyplot as plt
 
 
 class WikiGraph:
 
-    def __init__(self, src_id=None, src_name=None):
+    # wbgetclaims filters applied to fetched claims
+    CLAIMS = {"rank": "normal"}
+
+    def __init__(self, src_id=None, src_name=None, compact=False):
         """
         Initialises WikiGraph object 
         from either its name OR id
@@ -18,6 +22,7 @@ class WikiGraph:
 
         :param src_id: QID of entity whose knowledge graph has to be visualised
         :param src_name: QID of entity whose knowledge graph has to be visualised
+        :param compact: when set edges are kept in an integer array backed GraphStore instead of a set of tuples (for large graphs)
         """
         if not (src_id or src_name):
             src_id = "Q42"
@@ -28,20 +33,27 @@ class WikiGraph:
 
         self.src_name = src_name
         self.src_id = src_id
-        self.edges = set()
+        self.edges = GraphStore() if compact else set()
         self.nodes = set()
         self.names = {}
         self.r = self.out_degree = 0
 
-    def buildGraph(self, current=None, r=3, out_degree=3):
+    def buildGraph(self, current=None, r=3, out_degree=3, max_nodes=None, workers=None):
         """
         Builds graph from 2 parameters
 
         r and out_degree
         both control density of graph
 
+        graph is expanded breadth first, one level at a time: claims of every
+        unvisited node of a level are fetched in bulk (wbgetentities props=claims,
+        chunked and in parallel) and already visited nodes are never fetched again\n
+        only normal rank claims are followed, as getClaims does by default
+
         :param r: radius / depth of the graph from source node (diameter/2)
         :param out_degree: maximum outdegreeof a node 
+        :param max_nodes: when set , no more than max_nodes nodes are expanded
+        :param workers: max parallel requests per level (default WikiReader.WORKERS)
         """
         if not r:
             return
@@ -52,14 +64,33 @@ class WikiGraph:
             self.r = r
             self.out_degree = out_degree
 
-        self.nodes.add(current)
-        ents = WikiReader.getRelatedEntitiesProps(
-            current,  isTest=False, limit=out_degree)
-
-        # recurse
-        for x, y in ents:
-            self.edges.add((current, x, y))
-            self.buildGraph(current=y, r=r-1, out_degree=out_degree)
+        frontier = [current]
+        for _ in range(r):
+            frontier = [x for x in frontier if x not in self.nodes]
+            if max_nodes:
+                frontier = frontier[:max(max_nodes - len(self.nodes), 0)]
+            if not frontier:
+                break
+
+            self.nodes.update(frontier)
+            ents = WikiReader.getEntitiesByIds(
+                frontier, options={"props": ["claims"]}, isTest=False, workers=workers)
+
+            nxt = []
+            for node in frontier:
+                ent = ents.get(node)
+                if type(ent) != dict:
+                    continue
+
+                # wbgetentities returns every rank, keep getClaims' rank=normal
+                claims = WikiReader.filterClaims(
+                    ent.get("claims") or {}, WikiGraph.CLAIMS)
+                for x, y in WikiReader.relatedPairs(claims, out_degree):
+                    self.edges.add((node, x, y))
+                    if y not in self.nodes:
+                        nxt.append(y)
+
+            frontier = list(dict.fromkeys(nxt))
 
     def plotGraph(self, outputFile=None):
         """
@@ -69,10 +100,7 @@ class WikiGraph:
         :param outputFile: if specified saves the plotted image to this file
 
         """
-        G = nx.DiGraph()
-
-        for start, label, end in self.edges:
-            G.add_edge(start, end, label=label)
+        G = self.toNetworkx()
 
         plt.figure(figsize=(20, 15))
 
@@ -104,6 +132,18 @@ class WikiGraph:
         else:
             plt.show()
 
+    def toNetworkx(self):
+        """
+            networkx DiGraph of built graph with property ids as edge 'label'
+        """
+        if isinstance(self.edges, GraphStore):
+            return self.edges.toNetworkx()
+
+        G = nx.DiGraph()
+        for start, label, end in self.edges:
+            G.add_edge(start, end, label=label)
+        return G
+
     def fetchNames(self):
         """
             Fetches names of entities by QIDs
@@ -117,18 +157,19 @@ class WikiGraph:
 
         ids = list(ids)
 
-        batch = 30
-        batched_result = [ids[i:i + batch]
-                          for i in range(0, len(ids), batch)]
+        x = WikiReader.getEntitiesByIds(
+            ids, options={"languages": ['en'], "props": ["labels"]}, isTest=False)
 
-        for batchIDs in batched_result:
-            x = WikiReader.getEntitiesByIds(
-                batchIDs, options={"languages": ['en'], "props": ["labels"]}, isTest=False)
-            for k, v in x.items():
+        # ids of failed chunks fall back to their QIDs
+        for k in ids:
+            self.names.setdefault(k, k)
 
-                self.names[k] = k
-                if 'labels' in v and 'en' in v['labels']:
-                    self.names[k] = v['labels']['en']['value']
+        for k, v in x.items():
+            if type(v) != dict:
+                continue
+            self.names[k] = k
+            if 'labels' in v and 'en' in v['labels']:
+                self.names[k] = v['labels']['en']['value']
 
     def plotNamedGraph(self, outputFile=None):
         """
@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class JobJournal:
+
+    def __init__(self, path: str):
+        """
+        Append only log of bulk job row outcomes (SQLite file)\n
+        every row result is committed as soon as it completes, so a job that
+        dies halfway can be re-run and skip rows already applied
+
+        :param path: SQLite file of the journal (created if missing)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (job TEXT, row INTEGER, status TEXT, result TEXT, PRIMARY KEY (job, row))")
+        self.db.commit()
+
+    @staticmethod
+    def jobKey(method: str, fileSource: str):
+        """
+            job name of method run on fileSource
+        """
+        return f"{method}:{os.path.abspath(fileSource)}"
+
+    def done(self, job: str):
+        """
+            row number / key -> result of rows of job applied successfully
+        """
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT row, result FROM rows WHERE job = ? AND status = 'ok'", (job,))
+            return {row: json.loads(result) for row, result in cur}
+
+    def get(self, job: str, row):
+        """
+            result of row (row number or key) if it was applied successfully else None
+        """
+        with self.lock:
+            x = self.db.execute(
+                "SELECT result FROM rows WHERE job = ? AND row = ? AND status = 'ok'", (job, row)).fetchone()
+        return json.loads(x[0]) if x else None
+
+    def record(self, job: str, row, result, ok: bool = True):
+        """
+        Stores outcome of row (overwrites earlier failed attempt)
+
+        :param row: row number, or text key for rows without a stable position
+
+        :param result: JSON serialisable result of the row (e.g. API response)
+        :param ok: False if row failed and should be retried on next run
+        """
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)",
+                            (job, row, "ok" if ok else "error", json.dumps(result)))
+            self.db.commit()
+
+    def summary(self, job: str):
+        """
+            count of rows per status of job
+        """
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT status, COUNT(*) FROM rows WHERE job = ? GROUP BY status", (job,))
+            return dict(cur.fetchall())
+
+    def clear(self, job: str = None):
+        """
+            forget rows of job (all jobs if None)
+        """
+        with self.lock:
+            if job is None:
+                self.db.execute("DELETE FROM rows")
+            else:
+                self.db.execute("DELETE FROM rows WHERE job = ?", (job,))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,279 @@
+import bisect
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class Metrics:
+
+    # callables receiving every event dict, see addHook
+    HOOKS = []
+    _LOCK = threading.Lock()
+
+    @staticmethod
+    def addHook(hook):
+        """
+        Registers hook called with every instrumentation event\n
+        events are dicts, kind "request" (one per HTTP call) or "cache" (cache lookups)
+
+            request : action, method, url, status, latency (s), bytesIn, bytesOut, retries, error\n
+            (retries = retries spent on this call, error = exception text or http-<status>)
+            cache   : action, hit (bool), count
+
+        :param hook: callable(event), e.g. MetricsCollector() or OpenTelemetryHook()
+
+        usage:
+            m = MetricsCollector()
+            Metrics.addHook(m)
+            ... run job ...
+            print(m.prometheus())
+        """
+        with Metrics._LOCK:
+            Metrics.HOOKS = Metrics.HOOKS + [hook]
+        return hook
+
+    @staticmethod
+    def removeHook(hook):
+        with Metrics._LOCK:
+            Metrics.HOOKS = [h for h in Metrics.HOOKS if h is not hook]
+
+    @staticmethod
+    def emit(event: dict):
+        # a failing hook must never break the request it reports
+        for h in Metrics.HOOKS:
+            try:
+                h(event)
+            except Exception as e:
+                print("Error in metrics hook", e)
+
+    @staticmethod
+    def actionOf(url: str, params=None):
+        """
+            API action of call (e.g. wbgetentities), 'sparql' for query service calls
+        """
+        if type(params) == dict:
+            if params.get("action"):
+                return params["action"]
+            if "query" in params:
+                return "sparql"
+        return urlparse(url).path or url
+
+    @staticmethod
+    def request(action: str, method: str, url: str, status: int = None, latency: float = 0.0, bytesIn: int = 0, bytesOut: int = 0, retries: int = 0, error: str = None):
+        """
+            reports one HTTP call (no-op without hooks)
+        """
+        if not Metrics.HOOKS:
+            return
+        Metrics.emit({"kind": "request", "action": action, "method": method, "url": url, "status": status,
+                      "latency": latency, "bytesIn": bytesIn, "bytesOut": bytesOut, "retries": retries, "error": error})
+
+    @staticmethod
+    def response(action: str, r, latency: float, retries: int = None, stream: bool = False):
+        """
+            reports call from requests.Response r (bytes of streamed bodies taken from Content-Length)
+        """
+        if not Metrics.HOOKS:
+            return
+        req = r.request
+        body = req.body or b""
+        if stream:
+            bytesIn = int(r.headers.get("Content-Length") or 0)
+        else:
+            bytesIn = len(r.content)
+
+        if retries is None:
+            # retries done inside urllib3 (WikiClient adapter)
+            retries = len(getattr(getattr(r.raw, "retries", None), "history", None) or ())
+
+        Metrics.request(action, req.method, r.url, r.status_code, latency, bytesIn,
+                        len(req.url) + len(body), retries, None if r.ok else f"http-{r.status_code}")
+
+    @staticmethod
+    def cache(action: str, hit: bool, count: int = 1):
+        """
+            reports count cache lookups of action that hit / missed (no-op without hooks)
+        """
+        if not Metrics.HOOKS or not count:
+            return
+        Metrics.emit({"kind": "cache", "action": action, "hit": hit, "count": count})
+
+
+class MetricsCollector:
+
+    # latency histogram bucket upper bounds (seconds)
+    BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+    def __init__(self, buckets: list[float] = None):
+        """
+        In-process aggregator of Metrics events (use as hook)\n
+        keeps per action counters and a latency histogram, exportable as
+        Prometheus text or a summary table
+
+        :param buckets: latency histogram bucket bounds in seconds (default MetricsCollector.BUCKETS)
+        """
+        self.buckets = sorted(buckets) if buckets else MetricsCollector.BUCKETS
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}     # (action, status) -> count
+            self.errors = {}       # action -> count
+            self.retries = {}      # action -> count
+            self.bytesIn = {}      # action -> bytes
+            self.bytesOut = {}     # action -> bytes
+            self.latency = {}      # action -> [bucket counts..., +Inf]
+            self.latencySum = {}   # action -> seconds
+            self.cacheHits = {}    # action -> count
+            self.cacheMisses = {}  # action -> count
+
+    @staticmethod
+    def inc(d: dict, k, v=1):
+        d[k] = d.get(k, 0) + v
+
+    def __call__(self, event: dict):
+        a = event["action"]
+        with self.lock:
+            if event["kind"] == "cache":
+                MetricsCollector.inc(
+                    self.cacheHits if event["hit"] else self.cacheMisses, a, event["count"])
+                return
+
+            MetricsCollector.inc(self.requests, (a, event["status"] or 0))
+            MetricsCollector.inc(self.bytesIn, a, event["bytesIn"] or 0)
+            MetricsCollector.inc(self.bytesOut, a, event["bytesOut"] or 0)
+            if event["retries"]:
+                MetricsCollector.inc(self.retries, a, event["retries"])
+            if event["error"]:
+                MetricsCollector.inc(self.errors, a)
+
+            h = self.latency.setdefault(a, [0] * (len(self.buckets) + 1))
+            h[bisect.bisect_left(self.buckets, event["latency"])] += 1
+            MetricsCollector.inc(self.latencySum, a, event["latency"])
+
+    def quantile(self, action: str, q: float):
+        """
+            latency quantile of action (seconds) estimated from histogram buckets
+        """
+        with self.lock:
+            h = list(self.latency.get(action, []))
+        n = sum(h)
+        if not n:
+            return 0.0
+
+        rank = q * n
+        seen = 0
+        for i, c in enumerate(h):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def summary(self):
+        """
+            action -> {requests, errors, retries, bytesIn, bytesOut, mean, p50, p99, cacheHits, cacheMisses}
+        """
+        with self.lock:
+            actions = {a for a, _ in self.requests} | set(self.cacheHits) | set(self.cacheMisses)
+            res = {}
+            for a in sorted(actions):
+                n = sum(c for (x, _), c in self.requests.items() if x == a)
+                res[a] = {"requests": n, "errors": self.errors.get(a, 0), "retries": self.retries.get(a, 0),
+                          "bytesIn": self.bytesIn.get(a, 0), "bytesOut": self.bytesOut.get(a, 0),
+                          "mean": self.latencySum.get(a, 0.0) / n if n else 0.0,
+                          "cacheHits": self.cacheHits.get(a, 0), "cacheMisses": self.cacheMisses.get(a, 0)}
+
+        for a, x in res.items():
+            x["p50"] = self.quantile(a, 0.5)
+            x["p99"] = self.quantile(a, 0.99)
+        return res
+
+    def printSummary(self):
+        """
+            prints summary as table (latencies in ms)
+        """
+        from tabulate import tabulate
+
+        rows = [[a, x["requests"], x["errors"], x["retries"], f"{x['mean'] * 1000:.1f}", f"{x['p50'] * 1000:.1f}",
+                 f"{x['p99'] * 1000:.1f}", x["bytesIn"], x["bytesOut"], f"{x['cacheHits']}/{x['cacheMisses']}"]
+                for a, x in self.summary().items()]
+        print(tabulate(rows, headers=["action", "requests", "errors", "retries", "mean ms", "p50 ms", "p99 ms",
+                                      "bytes in", "bytes out", "cache hit/miss"], tablefmt="grid"))
+
+    def prometheus(self, prefix: str = "wikidatapy"):
+        """
+            metrics in Prometheus text exposition format (serve it or write it for node_exporter textfile collector)
+        """
+        out = []
+
+        def family(name, kind, help_):
+            out.append(f"# HELP {prefix}_{name} {help_}")
+            out.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def counter(name, help_, d: dict):
+            family(name, "counter", help_)
+            for a, v in sorted(d.items()):
+                out.append(f'{prefix}_{name}{{action="{a}"}} {v}')
+
+        with self.lock:
+            family("requests_total", "counter", "HTTP requests sent")
+            for (a, s), v in sorted(self.requests.items()):
+                out.append(f'{prefix}_requests_total{{action="{a}",status="{s}"}} {v}')
+
+            counter("errors_total", "HTTP requests that failed", self.errors)
+            counter("retries_total", "HTTP requests retried", self.retries)
+            counter("bytes_received_total", "response bytes received", self.bytesIn)
+            counter("bytes_sent_total", "request bytes sent", self.bytesOut)
+            counter("cache_hits_total", "cache lookups answered from cache", self.cacheHits)
+            counter("cache_misses_total", "cache lookups that missed", self.cacheMisses)
+
+            family("request_duration_seconds", "histogram", "HTTP request latency")
+            for a, h in sorted(self.latency.items()):
+                acc = 0
+                for b, c in zip(self.buckets + ["+Inf"], h):
+                    acc += c
+                    out.append(f'{prefix}_request_duration_seconds_bucket{{action="{a}",le="{b}"}} {acc}')
+                out.append(f'{prefix}_request_duration_seconds_sum{{action="{a}"}} {self.latencySum[a]}')
+                out.append(f'{prefix}_request_duration_seconds_count{{action="{a}"}} {acc}')
+
+        return "\n".join(out) + "\n"
+
+
+class OpenTelemetryHook:
+
+    def __init__(self, tracer=None):
+        """
+        Metrics hook exporting each HTTP call as an OpenTelemetry span (requires opentelemetry-api)
+
+        :param tracer: tracer to create spans with (default trace.get_tracer("WikiDataPy"))
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetryHook requires opentelemetry, install it with pip install opentelemetry-api opentelemetry-sdk")
+
+        self.trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("WikiDataPy")
+
+    def __call__(self, event: dict):
+        if event["kind"] != "request":
+            return
+
+        end = time.time_ns()
+        span = self.tracer.start_span(f"wikidata {event['action']}",
+                                      start_time=end - int(event["latency"] * 1e9))
+        span.set_attribute("http.request.method", event["method"] or "")
+        span.set_attribute("url.full", event["url"] or "")
+        span.set_attribute("wikidata.action", event["action"])
+        span.set_attribute("http.request.body.size", event["bytesOut"] or 0)
+        span.set_attribute("http.response.body.size", event["bytesIn"] or 0)
+        span.set_attribute("http.request.resend_count", event["retries"] or 0)
+        if event["status"]:
+            span.set_attribute("http.response.status_code", event["status"])
+        if event["error"]:
+            span.set_status(self.trace.Status(self.trace.StatusCode.ERROR, event["error"]))
+        span.end(end_time=end)
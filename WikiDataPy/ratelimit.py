@@ -0,0 +1,115 @@
+import threading
+import time
+
+
+class RateLimiter:
+
+    def __init__(self, rate: float = None, burst: int = 1, concurrency: int = None):
+        """
+        Thread safe token bucket with optional cap on requests in flight
+
+        :param rate: requests per second allowed (None = unlimited)
+        :param burst: max requests that can be sent back to back
+        :param concurrency: max requests in flight at once (None = unlimited)
+
+        usage:
+            with limiter:
+                send request
+        """
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(
+            concurrency) if concurrency else None
+
+    def wait(self):
+        """
+            blocks until a token is available
+        """
+        while True:
+            with self.lock:
+                if not self.rate:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens +
+                                  (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def acquire(self):
+        if self.slots:
+            self.slots.acquire()
+        self.wait()
+
+    def release(self):
+        if self.slots:
+            self.slots.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class AdaptiveRateLimiter(RateLimiter):
+
+    def __init__(self, rate: float = 0.5, minRate: float = 0.05, maxRate: float = 5.0, increase: float = 0.1, decrease: float = 0.5, burst: int = 1, concurrency: int = None):
+        """
+        Token bucket whose rate adapts to server health (AIMD)\n
+        every success adds increase to the rate, every throttle response
+        multiplies it by decrease and pauses all callers for the Retry-After time
+
+        :param rate: starting requests per second
+        :param minRate: rate never drops below this
+        :param maxRate: rate never grows above this
+        :param increase: rate added per successful request
+        :param decrease: factor rate is multiplied by when throttled
+        """
+        super().__init__(rate=rate, burst=burst, concurrency=concurrency)
+        self.minRate = minRate
+        self.maxRate = maxRate
+        self.increase = increase
+        self.decrease = decrease
+        self.pauseUntil = 0.0
+        self.successes = self.throttles = 0
+
+    def wait(self):
+        while True:
+            with self.lock:
+                pause = self.pauseUntil - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+        super().wait()
+
+    def success(self):
+        """
+            report healthy response, ramps rate up
+        """
+        with self.lock:
+            self.successes += 1
+            self.rate = min(self.maxRate, self.rate + self.increase)
+
+    def backoff(self, retryAfter: float = None):
+        """
+        report throttled response (maxlag / ratelimited / 429 / 503)
+
+        :param retryAfter: seconds to pause all callers for (Retry-After header)
+        """
+        with self.lock:
+            self.throttles += 1
+            self.rate = max(self.minRate, self.rate * self.decrease)
+            self.tokens = 0
+            if retryAfter:
+                self.pauseUntil = max(
+                    self.pauseUntil, time.monotonic() + retryAfter)
@@ -1,7 +1,14 @@
 
-import requests
+import json
 import pprint
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .BASE import WikiBase
+from .cache import EntityCache
+from .client import WikiClient
+from .coalesce import EntityBatcher, SingleFlight
+from .metrics import Metrics
+from .sink import ResultSink
 from tabulate import tabulate
 from pprint import pprint
 
@@ -11,6 +18,29 @@ class WikiReader(WikiBase):
     API_ENDPOINT = "https://test.wikidata.org/w/api.php"
     API_ENDPOINT_PROD = "https://www.wikidata.org/w/api.php"
 
+    # wbgetentities accepts at most 50 ids per request
+    MAX_IDS = 50
+    WORKERS = 8
+
+    # wbsearchentities returns at most 50 results per request
+    SEARCH_PAGE = 50
+    # search pages requested ahead of the one being read
+    SEARCH_PREFETCH = 2
+
+    # optional EntityCache shared by all lookups (see setCache)
+    CACHE = None
+
+    # optional local dump (DumpIndex / DumpReader) serving entities and claims (see setBackend)
+    BACKEND = None
+
+    # name resolutions of resolveMany kept between calls
+    RESOLVED = EntityCache(maxsize=100000)
+
+    # concurrent identical wbgetentities / wbgetclaims calls share one request
+    FLIGHT = SingleFlight()
+    # ids asked for concurrently (while a request is in flight) are sent as one wbgetentities call (None disables)
+    BATCHER = EntityBatcher(window=0.002, maxIds=MAX_IDS)
+
     # helper
     @staticmethod
     def getClaimValue(vtype: str, c: dict):
@@ -30,69 +60,169 @@ class WikiReader(WikiBase):
             return c["value"]
         return ""
 
-    # functionalities
+    @staticmethod
+    def pickFields(res: list[dict], fields: list[str]):
+        """
+            keeps only requested fields of each search result
+        """
+        ans = []
+        for i in res:
+            l = {}
+            for k in fields:
+                if k in i:
+                    l[k] = i[k]
+            ans.append(l)
+        return ans
 
     @staticmethod
-    def searchEntities(query, fields: list[str] = ["id", "description"], n: int = None, lang: str = "en", reslang: str = "en", outputFile: str = "1_searchResults.csv", propertyFind=False, isTest=False):
+    def entityParams(options: dict):
         """
-        given a query searches knowledgebase for the relevant items (by description , labels, aliases)
+            wbgetentities params from options (lists are pipe joined, options not mutated)
+        """
+        params = dict(options)
+        for k in ["sitelinks", "languages", "props"]:
+            if k in params and type(params[k]) != str:
+                params[k] = "|".join(params[k])
 
-        return  field values specified by fields argument
+        # musrt have options
+        params.update({"format": "json", "action": "wbgetentities"})
+        return params
 
-        :param fields: list of fields fields to return (id,title,url, label,description) (default id,description)
-        :param lang: can be provided to perform search by but if results are empty English (en) is used as fallback
-        :param reslang: get results in this language but if results are empty English (en) is used as fallback
-        :param n: specifies number of results to be returned, by default all will be returned
+    @staticmethod
+    def chunkIds(id_, batch: int = None):
+        """
+            dedupes ids (keeping order) and splits them in chunks of batch (default MAX_IDS)
+        """
+        if type(id_) == str:
+            id_ = id_.split("|")
 
-        :param outputFile: store output at this file (CSV/JSON)
-        :param propertyFind: when set to true will search for properties (PIDs) instead of entities (QIDs)(default False)
-        :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        ids = list(dict.fromkeys(id_))
+        batch = batch if batch else WikiReader.MAX_IDS
+        return [ids[i:i + batch] for i in range(0, len(ids), batch)]
+
+    @staticmethod
+    def setCache(cache):
         """
+        Sets cache used by getEntitiesByIds and getClaims\n
+        an on-disk EntityCache commits its writes on its own (every EntityCache.COMMIT_EVERY seconds and at exit), closing it is optional
 
-        api = WikiReader.API_ENDPOINT_PROD
-        if isTest:
-            api = WikiReader.API_ENDPOINT
+        :param cache: EntityCache (e.g. EntityCache(path="wiki.sqlite", ttl=86400)) or None to disable
+        """
+        WikiReader.CACHE = cache
 
-        params = {
-            "action": "wbsearchentities",
-            "format": "json",
-            "language": lang,
-            "search": query,
-            "uselang": reslang
-        }
+    @staticmethod
+    def setBackend(backend):
+        """
+        Serves getEntitiesByIds and getClaims (and so WikiGraph) from a local dump instead of the API\n
+        isTest, workers and CACHE do not apply while a backend is set (errors is forwarded)
 
-        if propertyFind:
-            params["type"] = "property"
+        :param backend: DumpIndex (random access, e.g. DumpIndex("latest-all.json")) or DumpReader, None to use the API again\n
+        *a DumpReader is not random access: every getEntitiesByIds / getClaims call scans the dump, use it for one off lookups only*
+        """
+        WikiReader.BACKEND = backend
 
-        if n:
-            params["limit"] = n
+    @staticmethod
+    def requestJSON(api: str, params: dict):
+        """
+            GET api with params, concurrent calls with identical params share one request,
+            each caller decodes its own copy of the body (results are safe to modify)
+        """
+        key = api + "?" + repr(sorted(params.items()))
+        return json.loads(WikiReader.FLIGHT.do(key, WikiReader.requestBody, api, params))
 
-        res = requests.get(api, params=params).json()
-        res = [] if "search" not in res else res["search"]
-        # pprint(res)
+    @staticmethod
+    def requestBody(api: str, params: dict):
+        # raw bytes are immutable, so sharing them between coalesced callers is safe
+        return WikiClient.getDefault().get(api, params).content
 
-        ans = []
-        for i in res:
-            l = {}
-            for k in fields:
-                if k in i:
-                    l[k] = i[k]
-            ans.append(l)
+    @staticmethod
+    def entityCacheKey(api: str, id_: str, params: dict):
+        # every option (languagefallback, sitefilter, normalize, ...) changes the answer
+        return WikiReader.CACHE.makeKey(api, id_, *sorted((k, v) for k, v in params.items() if k != "ids"))
 
-        # fallback to english language if no result
-        if not ans:
-            return WikiReader.searchEntities(query, fields, n=n, lang=lang, reslang=reslang, outputFile=outputFile, propertyFind=propertyFind, isTest=isTest)
+    @staticmethod
+    def cachedEntities(api: str, ids: list[str], params: dict):
+        """
+            splits ids into (cached entities dict, ids still to fetch)
+        """
+        if WikiReader.CACHE is None:
+            return {}, ids
+        if type(ids) == str:
+            ids = ids.split("|")
+
+        found = {}
+        missing = []
+        for i in ids:
+            x = WikiReader.CACHE.get(WikiReader.entityCacheKey(api, i, params))
+            if x is None:
+                missing.append(i)
+            else:
+                found[i] = x
 
-        # try to output
+        Metrics.cache("wbgetentities", True, len(found))
+        Metrics.cache("wbgetentities", False, len(missing))
+        return found, missing
+
+    @staticmethod
+    def cacheEntities(api: str, entities: dict, params: dict):
+        if WikiReader.CACHE is None:
+            return
+        for k, v in entities.items():
+            WikiReader.CACHE.set(WikiReader.entityCacheKey(api, k, params), v)
+
+    @staticmethod
+    def filterClaims(claims: dict, options: dict):
+        """
+            claims of property options["property"] / rank options["rank"] (wbgetclaims filters)
+        """
+        prop = options.get("property")
+        rank = options.get("rank")
+        res = {}
+        for k, v in claims.items():
+            if prop and k != prop:
+                continue
+            v = [c for c in v if not rank or c.get("rank") == rank]
+            if v:
+                res[k] = v
+        return res
+
+    @staticmethod
+    def relatedPairs(claims: dict, limit=None):
+        """
+            (PID,Q2_ID) pairs from claims dict whose first value is an entity
+        """
+        ans = set()
+        if not claims or type(claims) != dict:
+            return []
+
+        for k, v in claims.items():
+            dv = v[0]["mainsnak"].get("datavalue") if v else None
+            if dv and dv["type"] == "wikibase-entityid":
+                ans.add((k, dv["value"]["id"]))
+
+            if limit and limit == len(ans):
+                return list(ans)
+
+        return list(ans)
+
+    @staticmethod
+    def dumpSearchResults(ans: list[dict], outputFile):
+        """
+            writes search results to outputFile (CSV/JSON/Parquet/Arrow) if it is a file name
+        """
+        if ResultSink.isColumnar(outputFile):
+            fields = list(dict.fromkeys(k for x in ans for k in x))
+            WikiBase.dumpRows(outputFile, fields, ans)
+            return
 
         if type(outputFile) != str:
-            return ans
+            return
 
         isCSV = outputFile.endswith(".csv")
         isJSON = outputFile.endswith(".json")
         if not isCSV and not isJSON:
             print("Invalid output file")
-            return ans
+            return
 
         if ans:
             fields = list(ans[0].keys())
@@ -101,17 +231,214 @@ class WikiReader(WikiBase):
             if isJSON:
                 WikiBase.dumpResult(ans, outputFile)
 
+    @staticmethod
+    def dumpEntities(res: dict, outputFile, lang: list[str] = ["en"]):
+        """
+            writes entities dict to outputFile (CSV/JSON/Parquet/Arrow) if given\n
+            CSV and columnar files get one row per entity with label / description columns per language
+        """
+        if not outputFile:
+            return
+
+        errors = []
+        if ResultSink.isColumnar(outputFile):
+            WikiBase.dumpRows(outputFile, WikiBase.entityHead(lang),
+                              WikiBase.entityRows(res, lang, errors=errors))
+        elif outputFile.endswith(".csv"):
+            WikiBase.dumpEntityCSV(outputFile, res, lang, errors=errors)
+        elif outputFile.endswith(".json"):
+            WikiBase.dumpResult(res, outputFile)
+        else:
+            print("Invalid output file format")
+
+        if errors:
+            print(f"Skipped {len(errors)} malformed entities while writing {outputFile}")
+
+    @staticmethod
+    def claimRows(res: dict):
+        """
+            one row (id, property_id, type, value) per claim with a value
+        """
+        for k, v in res.items():
+            for c in v:
+                if "mainsnak" in c and "datavalue" in c["mainsnak"]:
+                    vType = c["mainsnak"]["datavalue"]["type"]
+                    yield {"id": c["id"], "property_id": k, "type": vType,
+                           "value": WikiReader.getClaimValue(vType, c["mainsnak"]["datavalue"])}
+
+    @staticmethod
+    def dumpClaims(res: dict, outputFile):
+        """
+            writes claims dict to outputFile (CSV/JSON/Parquet/Arrow) if it is a file name
+        """
+        fields = list(['id', 'property_id', 'type', 'value'])
+        if ResultSink.isColumnar(outputFile):
+            WikiBase.dumpRows(outputFile, fields, WikiReader.claimRows(res))
+            return
+
+        if type(outputFile) != str:
+            return
+
+        isCSV = outputFile.endswith(".csv")
+        isJSON = outputFile.endswith(".json")
+
+        if not isCSV and not isJSON:
+            print("Invalid output file")
+            return
+
+        if isJSON:
+            WikiBase.dumpResult(res, outputFile)
+
+        if isCSV:
+            WikiBase.dumpCSV(outputFile, fields, list(WikiReader.claimRows(res)))
+
+    # functionalities
+
+    @staticmethod
+    def searchPage(api: str, params: dict, offset: int = 0, limit: int = None):
+        """
+            one wbsearchentities request from offset, returns (results, search-continue offset or None)
+        """
+        params = dict(params)
+        if limit:
+            params["limit"] = limit
+        if offset:
+            params["continue"] = offset
+
+        res = WikiClient.getDefault().getJSON(api, params=params)
+        return res.get("search", []), res.get("search-continue")
+
+    @staticmethod
+    def iterSearch(query, fields: list[str] = ["id", "description"], n: int = None, lang: str = "en", reslang: str = "en", propertyFind=False, isTest=False, prefetch: int = None, pageSize: int = None, pages: int = None):
+        """
+        Generator over search results of query, following search-continue offsets page by page\n
+        next pages are requested concurrently while the current one is consumed, and
+        nothing past n results is requested
+
+        :param fields: list of fields fields to return (id,title,url, label,description) (default id,description)
+        :param n: stop after n results (default all results)
+        :param lang: language to search by, if it has no results search is retried once in English (en)
+        :param reslang: get results in this language
+        :param prefetch: pages requested ahead of the one being read (default WikiReader.SEARCH_PREFETCH, 0 fetches one page at a time)
+        :param pageSize: results per request (default WikiReader.SEARCH_PAGE, 0 leaves the API default)
+        :param pages: fetch no more than this many pages (default all)
+        :param propertyFind: when set to true will search for properties (PIDs) instead of entities (QIDs)(default False)
+        :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        """
+        api = WikiReader.API_ENDPOINT_PROD
+        if isTest:
+            api = WikiReader.API_ENDPOINT
+
+        params = {
+            "action": "wbsearchentities",
+            "format": "json",
+            "language": lang,
+            "search": query,
+            "uselang": reslang
+        }
+
+        if propertyFind:
+            params["type"] = "property"
+
+        size = WikiReader.SEARCH_PAGE if pageSize is None else pageSize
+        prefetch = WikiReader.SEARCH_PREFETCH if prefetch is None else prefetch
+        window = 1 + (prefetch if size and pages != 1 else 0)
+
+        ex = ThreadPoolExecutor(max_workers=window) if window > 1 else None
+        pending = deque()
+        offset, fetched, count, depth = 0, 0, 0, 1
+        try:
+            while True:
+                # offsets of next pages are known ahead (search-continue = offset + limit),
+                # pages are only requested ahead once the first one says there are more
+                while offset is not None and len(pending) < depth and (not n or offset < n) and (not pages or fetched < pages):
+                    limit = min(size, n - offset) if n and size else size
+                    if ex is None:
+                        pending.append((offset, WikiReader.searchPage(api, params, offset, limit)))
+                    else:
+                        pending.append((offset, ex.submit(
+                            WikiReader.searchPage, api, params, offset, limit)))
+                    offset = offset + limit if limit else None
+                    fetched += 1
+
+                if not pending:
+                    return
+                _, page = pending.popleft()
+                res, cont = page if ex is None else page.result()
+
+                # fallback to english language if no result
+                if not res and not count and lang != "en":
+                    yield from WikiReader.iterSearch(query, fields, n=n, lang="en", reslang="en", propertyFind=propertyFind, isTest=isTest, prefetch=prefetch, pageSize=pageSize, pages=pages)
+                    return
+
+                for x in WikiReader.pickFields(res, fields):
+                    yield x
+                    count += 1
+                    if n and count >= n:
+                        return
+
+                if cont is None or not res:
+                    return
+                depth = window
+                # pages ahead assumed search-continue = offset + limit, else continue from the server's offset
+                if not pending or pending[0][0] != cont:
+                    for _, p in pending:
+                        if ex is not None:
+                            p.cancel()
+                    pending.clear()
+                    offset = cont
+        finally:
+            if ex is not None:
+                for _, p in pending:
+                    p.cancel()
+                ex.shutdown(wait=False)
+
+    @staticmethod
+    def searchEntities(query, fields: list[str] = ["id", "description"], n: int = None, lang: str = "en", reslang: str = "en", outputFile: str = "1_searchResults.csv", propertyFind=False, isTest=False, prefetch: int = None):
+        """
+        given a query searches knowledgebase for the relevant items (by description , labels, aliases)
+
+        return  field values specified by fields argument
+
+        :param fields: list of fields fields to return (id,title,url, label,description) (default id,description)
+        :param lang: can be provided to perform search by but if results are empty English (en) is used as fallback
+        :param reslang: get results in this language but if results are empty English (en) is used as fallback
+        :param n: specifies number of results to be returned, pages are followed until n are found (by default one page of the API default size)
+        :param prefetch: pages requested concurrently ahead when n spans many pages (default WikiReader.SEARCH_PREFETCH)
+
+        :param outputFile: store output at this file (CSV/JSON)
+        :param propertyFind: when set to true will search for properties (PIDs) instead of entities (QIDs)(default False)
+        :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+
+        for large result sets use WikiReader.iterSearch to consume results while they stream in
+        """
+        if n:
+            it = WikiReader.iterSearch(query, fields, n=n, lang=lang, reslang=reslang,
+                                       propertyFind=propertyFind, isTest=isTest, prefetch=prefetch)
+        else:
+            it = WikiReader.iterSearch(query, fields, lang=lang, reslang=reslang,
+                                       propertyFind=propertyFind, isTest=isTest, pageSize=0, pages=1)
+        ans = list(it)
+
+        WikiReader.dumpSearchResults(ans, outputFile)
         return ans
 
     @staticmethod
-    def getEntitiesByIds(id_: list[str] = ["Q42"], options: dict = {"languages": ["en"], "sitelinks": ["enwiki"], "props": ["descriptions"]}, outputFile: str = None, isTest: bool = False):
+    def getEntitiesByIds(id_: list[str] = ["Q42"], options: dict = {"languages": ["en"], "sitelinks": ["enwiki"], "props": ["descriptions"]}, outputFile: str = None, isTest: bool = False, workers: int = None, errors: list = None):
         """
         Fetch get entities from ids 
 
-        :param id_: list of ids of entities to fetch
+        ids are split into chunks of WikiReader.MAX_IDS (API limit) that are fetched
+        concurrently and merged into one entities dict
+
+        :param id_: list of ids of entities to fetch (any size)
         :param options: set options like languages sitelinks and properties to fetch
         :param outputFile: specifies number of descriptors to be returned, by default all will be returned
         :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param workers: max chunks fetched in parallel (default WikiReader.WORKERS)
+        :param errors: if a list is passed, failed chunks are appended to it as {"ids": [...], "error": {...}}
+
+        with a backend set (setBackend) entities come from the local dump, isTest / workers / CACHE are not used
 
         default options\n
             - languages : "en"
@@ -120,45 +447,59 @@ class WikiReader(WikiBase):
 
         """
 
+        if WikiReader.BACKEND is not None:
+            return WikiReader.BACKEND.getEntitiesByIds(id_, options=options, outputFile=outputFile, errors=errors)
+
         api = WikiReader.API_ENDPOINT_PROD
         if isTest:
             api = WikiReader.API_ENDPOINT
 
-        id_ = "|".join(id_)
-        if "sitelinks" in options:
-            options["sitelinks"] = "|".join(options["sitelinks"])
-        if "languages" in options:
-            options["languages"] = "|".join(options["languages"])
-        if "props" in options:
-            options["props"] = "|".join(options["props"])
-
-        # musrt have options
-        options.update(
-            {"format": "json", "action": "wbgetentities", "ids": id_})
-
-        res = requests.get(api,
-                           params=options).json()
+        params = WikiReader.entityParams(options)
+        cached, id_ = WikiReader.cachedEntities(api, id_, params)
+        chunks = WikiReader.chunkIds(id_)
+
+        def request(ids):
+            p = dict(params)
+            p["ids"] = "|".join(ids)
+            return WikiReader.requestJSON(api, p)
+
+        batchKey = api + "?" + repr(sorted(params.items()))
+
+        def fetch(chunk):
+            try:
+                # partial chunks are merged with ids other threads ask for at the same time
+                if WikiReader.BATCHER is not None and len(chunk) < WikiReader.MAX_IDS:
+                    return chunk, WikiReader.BATCHER.get(batchKey, chunk, request)
+                return chunk, request(chunk)
+            except Exception as e:
+                return chunk, {"error": {"code": "request-failed", "info": str(e)}}
+
+        workers = workers if workers else WikiReader.WORKERS
+        if len(chunks) <= 1 or workers <= 1:
+            results = map(fetch, chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as ex:
+                results = list(ex.map(fetch, chunks))
+
+        res = cached
+        failed = []
+        for chunk, x in results:
+            if "error" in x:
+                failed.append({"ids": chunk, "error": x["error"]})
+            elif "entities" in x:
+                res.update(x["entities"])
+                WikiReader.cacheEntities(api, x["entities"], params)
 
         # error handling
-        if "error" in res:
-            print("Error in getEntitiesByIDs")
-            return res['error']
-        if "entities" in res:
-            res = res["entities"]
-
-        if outputFile:
-            if outputFile.endswith(".csv"):
-                x = WikiReader.convertToCSVForm(
-                    res, options["languages"].split("|"))
-                if not x["success"]:
-                    print("Can't write to csv")
-                else:
-                    WikiBase.dumpCSV(outputFile, x["head"], x["data"])
-            elif outputFile.endswith(".json"):
-                WikiBase.dumpResult(res, outputFile)
-            else:
-                print("Invalid output file format")
-
+        if failed:
+            print(f"Error in getEntitiesByIDs ({len(failed)} of {len(chunks)} chunks failed)")
+            if errors is not None:
+                errors.extend(failed)
+            if not res:
+                return failed[0]["error"]
+
+        WikiReader.dumpEntities(
+            res, outputFile, params.get("languages", "en").split("|"))
         return res
 
     @staticmethod
@@ -175,51 +516,37 @@ class WikiReader(WikiBase):
             - rank: normal default (One of the following values: deprecated, normal, preferred)
         """
 
+        if WikiReader.BACKEND is not None:
+            return WikiReader.BACKEND.getClaims(id_, options=options, outputFile=outputFile)
+
         api = WikiReader.API_ENDPOINT_PROD
         if isTest:
             api = WikiReader.API_ENDPOINT
 
-        options.update(
+        params = dict(options)
+        params.update(
             {"format": "json", "action": "wbgetclaims", "entity": id_})
 
-        res = requests.get(api,
-                           params=options).json()
-
-        if "error" in res:
-            print("Error in get claims")
-            return
-
-        if "claims" in res:
-            res = res["claims"]
+        key = None
+        res = None
+        if WikiReader.CACHE is not None:
+            key = WikiReader.CACHE.makeKey(api, *sorted(params.items()))
+            res = WikiReader.CACHE.get(key)
+            Metrics.cache("wbgetclaims", res is not None)
 
-            if type(outputFile) != str:
-                return res
+        if res is None:
+            res = WikiReader.requestJSON(api, params)
 
-            isCSV = outputFile.endswith(".csv")
-            isJSON = outputFile.endswith(".json")
+            if "error" in res:
+                print("Error in get claims")
+                return
 
-            if not isCSV and not isJSON:
-                print("Invalid output file")
-                return res
+            if key:
+                WikiReader.CACHE.set(key, res)
 
-            if isJSON:
-                WikiBase.dumpResult(res, outputFile)
-
-            if isCSV:
-                fields = list(['id', 'property_id', 'type', 'value'])
-                dt = []
-
-                for k, v in res.items():
-                    for c in v:
-                        if "mainsnak" in c:
-                            vType = c["mainsnak"]["datavalue"]["type"]
-                            rec = {
-                                "id": c["id"], "property_id": k, "type": vType
-                            }
-                            rec["value"] = WikiReader.getClaimValue(
-                                vType, c["mainsnak"]["datavalue"])
-                            dt.append(rec)
-                WikiBase.dumpCSV(outputFile, fields, dt)
+        if "claims" in res:
+            res = res["claims"]
+            WikiReader.dumpClaims(res, outputFile)
 
         return res
 
@@ -234,15 +561,7 @@ class WikiReader(WikiBase):
         :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
         """
         claims = WikiReader.getClaims(id_, outputFile=None, isTest=isTest)
-        ans = set()
-        for k, v in claims.items():
-            if v[0]["mainsnak"]["datavalue"]["type"] == "wikibase-entityid":
-                ans.add((k, v[0]["mainsnak"]["datavalue"]["value"]["id"]))
-
-            if limit and limit == len(ans):
-                return list(ans)
-
-        return list(ans)
+        return WikiReader.relatedPairs(claims, limit)
 
     @staticmethod
     def reverseLookup(label, lang='en', limit=None, propertyFind=False, isTest=False):
@@ -263,6 +582,149 @@ class WikiReader(WikiBase):
             return x[:limit]
         return x
 
+    @staticmethod
+    def reverseLookupMany(labels, lang='en', limit=None, propertyFind=False, isTest=False, workers: int = None, cache=None, errors: list = None):
+        """
+        Lookup entities of many labels at once\n
+        labels are deduped and searched concurrently, results are memoised in cache
+
+        :param labels: iterable of labels / queries
+        :param limit: if set returns no more than limit no. of results per label
+        :param lang:  language to search by (default 'en')
+        :param propertyFind: when set to true will search for properties (PIDs) instead of entities (QIDs)(default False)
+        :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param workers: max searches in parallel (default WikiReader.WORKERS)
+        :param cache: EntityCache to memoise results in (e.g. EntityCache(path="names.sqlite") to keep them across runs)
+        :param errors: if a list is passed, labels whose search failed are appended to it as {"label": ..., "error": ...}
+
+        returns dict label -> list of matches (same shape as reverseLookup)
+        """
+        api = WikiReader.API_ENDPOINT if isTest else WikiReader.API_ENDPOINT_PROD
+        labels = list(dict.fromkeys(labels))
+
+        def key(label):
+            return cache.makeKey("reverseLookup", api, lang, propertyFind, label)
+
+        ans = {}
+        missing = []
+        for label in labels:
+            x = cache.get(key(label)) if cache is not None else None
+            if x is None:
+                missing.append(label)
+            else:
+                ans[label] = x
+
+        if cache is not None:
+            Metrics.cache("wbsearchentities", True, len(ans))
+            Metrics.cache("wbsearchentities", False, len(missing))
+
+        def lookup(label):
+            try:
+                return label, WikiReader.reverseLookup(label, lang=lang, propertyFind=propertyFind, isTest=isTest)
+            except Exception as e:
+                print(f"Error looking up '{label}'", e)
+                if errors is not None:
+                    errors.append({"label": label, "error": str(e)})
+                return label, None
+
+        workers = workers if workers else WikiReader.WORKERS
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing) or 1))) as ex:
+            for label, x in ex.map(lookup, missing):
+                ans[label] = x if x else []
+                # failed lookups are not memoised
+                if cache is not None and x is not None:
+                    cache.set(key(label), x)
+
+        if limit:
+            return {k: v[:limit] for k, v in ans.items()}
+        return ans
+
+    @staticmethod
+    def scoreCandidate(name: str, candidate: dict, rank: int):
+        """
+        Default scorer of resolveMany, confidence that search result candidate (at position rank) is name\n
+        exact label 1.0, label ignoring case 0.9, exact alias 0.8, alias ignoring case 0.7, other hits 0.5,
+        minus 0.01 per rank so earlier (more relevant) results win ties
+        """
+        key = name.strip().casefold()
+        label = candidate.get("label", "")
+        aliases = candidate.get("aliases", [])
+
+        if label == name:
+            score = 1.0
+        elif label.casefold() == key:
+            score = 0.9
+        elif name in aliases:
+            score = 0.8
+        elif any(a.casefold() == key for a in aliases):
+            score = 0.7
+        else:
+            score = 0.5
+        return max(score - 0.01 * rank, 0.0)
+
+    @staticmethod
+    def resolveMany(names, lang='en', scorer=None, minConfidence: float = 0.0, propertyFind=False, isTest=False, workers: int = None, cache=None, outputFile=None):
+        """
+        Resolves many names to ids without prompting (non interactive getEntitiesRelatedToGiven)\n
+        names are deduped, searched concurrently (reverseLookupMany) and the best scoring
+        candidate of each name is picked, resolutions are cached between calls
+
+        :param names: iterable of names / labels
+        :param lang:  language to search by (default 'en')
+        :param scorer: callable(name, candidate, rank) -> confidence in [0, 1] (default WikiReader.scoreCandidate)
+        :param minConfidence: names whose best candidate scores lower are left unresolved
+        :param propertyFind: when set to true will search for properties (PIDs) instead of entities (QIDs)(default False)
+        :param isTest: flag when set will use test.wikidata.org (for testing) instead of main site (www.wikidata.org)
+        :param workers: max searches in parallel (default WikiReader.WORKERS)
+        :param cache: EntityCache for resolutions and search results (default WikiReader.RESOLVED, in memory, use EntityCache(path="names.sqlite") to keep them across runs)
+        :param outputFile: store name, id, confidence rows at this file (CSV/JSON/Parquet/Arrow)
+
+        returns dict name -> (id, confidence), (None, 0.0) for names without candidates
+        """
+        scorer = scorer if scorer else WikiReader.scoreCandidate
+        cache = cache if cache is not None else WikiReader.RESOLVED
+        api = WikiReader.API_ENDPOINT if isTest else WikiReader.API_ENDPOINT_PROD
+        names = list(dict.fromkeys(names))
+
+        # resolutions depend on scorer, so it is part of the key (lambdas / closures by identity)
+        tag = getattr(scorer, "__qualname__", "<>")
+        tag = tag if "<" not in tag else id(scorer)
+
+        def key(name):
+            return cache.makeKey("resolve", api, lang, propertyFind, tag, name)
+
+        ans = {}
+        missing = []
+        for name in names:
+            x = cache.get(key(name))
+            if x is None:
+                missing.append(name)
+            else:
+                ans[name] = tuple(x)
+
+        errors = []
+        found = WikiReader.reverseLookupMany(
+            missing, lang=lang, propertyFind=propertyFind, isTest=isTest, workers=workers, cache=cache, errors=errors)
+        failed = set(e["label"] for e in errors)
+
+        for name in missing:
+            best, confidence = None, 0.0
+            for rank, c in enumerate(found.get(name, [])):
+                score = scorer(name, c, rank)
+                if best is None or score > confidence:
+                    best, confidence = c.get("id"), score
+            ans[name] = (best, round(confidence, 4))
+            # failed searches are retried on next call
+            if name not in failed:
+                cache.set(key(name), list(ans[name]))
+
+        ans = {k: ans[k] if ans[k][1] >= minConfidence else (None, ans[k][1]) for k in names}
+
+        if outputFile:
+            WikiBase.dumpRows(outputFile, ["name", "id", "confidence"],
+                              ({"name": k, "id": v[0], "confidence": v[1]} for k, v in ans.items()))
+        return ans
+
     @staticmethod
     def getEntitiesRelatedToGiven(name: str, lang='en', propertyFind=False, isTest: bool = False):
         """
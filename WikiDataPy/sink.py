@@ -0,0 +1,309 @@
+import csv
+import json
+import os
+import time
+
+
+class ColumnarOutput:
+
+    def __init__(self, path: str, columns: list[str] = None, compression: str = None, rowGroup: int = None):
+        """
+        Parquet / Arrow output file with options, accepted anywhere an outputFile is\n
+        a plain "x.parquet" / "x.arrow" file name uses ResultSink defaults
+
+        :param path: .parquet, .arrow or .feather file
+        :param columns: columns to keep (default all)
+        :param compression: codec e.g. "zstd", "snappy", "gzip" (parquet) or "lz4", "zstd" (arrow), "none" to disable
+        :param rowGroup: rows buffered per row group / record batch
+        """
+        self.path = path
+        self.columns = columns
+        self.compression = compression
+        self.rowGroup = rowGroup
+
+    def __str__(self):
+        return self.path
+
+
+class ResultSink:
+
+    # rows per parquet row group / arrow record batch, CSV / JSON files are flushed as often
+    ROW_GROUP = 50000
+    # seconds CSV / JSON rows may wait in the file buffer (so progress stays visible on disk)
+    FLUSH_EVERY = 1.0
+    COMPRESSION = {"parquet": "zstd", "arrow": "lz4"}
+
+    def __init__(self, outputFile, head: list = None, columns: list[str] = None, compression: str = None, rowGroup: int = None):
+        """
+        Writes results one by one to outputFile as they arrive\n
+        nothing is kept in memory, so output size does not grow memory use\n
+        CSV / JSON files are flushed every rowGroup rows or FLUSH_EVERY seconds and on close, not per row
+
+        supported files
+            - .csv : one row per write (dict rows are ordered by head)
+            - .json : JSON array, streamed item by item
+            - .jsonl : one JSON object per line
+            - .parquet / .arrow / .feather : columnar, rows buffered and written in row groups (requires pyarrow)
+
+        :param outputFile: path of output file or ColumnarOutput (None writes nothing)
+        :param head: CSV header, written first (column order of columnar files)
+        :param columns: columnar only, columns to keep (default head / keys of first row)
+        :param compression: columnar only, codec (default ResultSink.COMPRESSION)
+        :param rowGroup: rows per row group / between flushes of CSV / JSON files (default ResultSink.ROW_GROUP)
+        """
+        if isinstance(outputFile, ColumnarOutput):
+            columns = columns or outputFile.columns
+            compression = compression or outputFile.compression
+            rowGroup = rowGroup or outputFile.rowGroup
+            outputFile = outputFile.path
+
+        self.outputFile = outputFile
+        self.head = head
+        self.count = 0
+        self.rowGroup = rowGroup or ResultSink.ROW_GROUP
+        self.flushed = (0, time.monotonic())
+        self.f = self.writer = self.kind = None
+
+        if not outputFile or type(outputFile) != str:
+            return
+
+        self.kind = ResultSink.kindOf(outputFile)
+        if self.kind is None:
+            print("Invalid output file specified. Specify JSON/CSV/Parquet/Arrow")
+            return
+
+        if self.kind in ["parquet", "arrow"]:
+            self.columns = columns
+            self.compression = compression or ResultSink.COMPRESSION[self.kind]
+            self.buffer = []
+            self.schema = None
+            self.pa = ResultSink.arrow()
+            return
+
+        self.f = open(outputFile, "w", newline="")
+        if self.kind == "csv":
+            self.writer = csv.writer(self.f)
+            if head:
+                self.writer.writerow(head)
+        elif self.kind == "json":
+            self.f.write("[")
+
+    # helper
+    @staticmethod
+    def kindOf(outputFile):
+        """
+            csv / json / jsonl / parquet / arrow from file name (None if not supported)
+        """
+        if isinstance(outputFile, ColumnarOutput):
+            outputFile = outputFile.path
+        if not outputFile or type(outputFile) != str:
+            return None
+
+        name = outputFile.lower()
+        for ext, kind in [(".csv", "csv"), (".jsonl", "jsonl"), (".json", "json"),
+                          (".parquet", "parquet"), (".arrow", "arrow"), (".feather", "arrow")]:
+            if name.endswith(ext):
+                return kind
+        return None
+
+    @staticmethod
+    def isColumnar(outputFile):
+        return ResultSink.kindOf(outputFile) in ["parquet", "arrow"]
+
+    @staticmethod
+    def arrow():
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(
+                "Parquet / Arrow output requires pyarrow, install it with pip install WikiDataPy[columnar]")
+        return pyarrow
+
+    def write(self, row, raw=None):
+        """
+        Appends one result
+
+        :param row: dict / list written to CSV and columnar files (and to JSON when raw not given)
+        :param raw: object written to JSON / JSONL instead of row (e.g. full API response)
+        """
+        if self.kind in ["parquet", "arrow"]:
+            if type(row) != dict:
+                if not self.head:
+                    # no header given, columns are named by position from the first row
+                    self.head = [f"c{i}" for i in range(len(row))]
+                row = dict(zip(self.head, row))
+            self.buffer.append(row)
+            self.count += 1
+            if len(self.buffer) >= self.rowGroup:
+                self.flush()
+            return
+
+        if self.f is None:
+            return
+
+        if self.kind == "csv":
+            if type(row) == dict:
+                row = [row.get(h, "") for h in self.head]
+            self.writer.writerow(row)
+        else:
+            x = json.dumps(row if raw is None else raw)
+            if self.kind == "json":
+                self.f.write(("," if self.count else "") + x)
+            else:
+                self.f.write(x + "\n")
+
+        self.count += 1
+        rows, at = self.flushed
+        if self.count - rows >= self.rowGroup or time.monotonic() - at >= ResultSink.FLUSH_EVERY:
+            self.f.flush()
+            self.flushed = (self.count, time.monotonic())
+
+    # columnar
+
+    @staticmethod
+    def cell(v):
+        # nested values are kept as JSON text so the schema stays flat
+        return json.dumps(v) if type(v) in [dict, list] else v
+
+    @staticmethod
+    def text(values):
+        return [v if v is None or type(v) == str else str(v) for v in values]
+
+    def column(self, values):
+        """
+            arrow array of values with its inferred type, text when values mix types
+        """
+        pa = self.pa
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            # mixed types (e.g. -1 for failed rows next to ids) are kept as text
+            return pa.array(ResultSink.text(values), type=pa.string())
+
+    def widen(self, t, n):
+        """
+            type holding values of both column type t and new values' type n (int -> float -> string)
+        """
+        pa = self.pa
+        if pa.types.is_null(n) or n == t:
+            return t
+        if pa.types.is_null(t):
+            return n
+        numeric = [pa.types.is_integer(x) or pa.types.is_floating(x) for x in [t, n]]
+        if all(numeric) and not (pa.types.is_integer(t) and pa.types.is_integer(n)):
+            return pa.float64()
+        return pa.string()
+
+    def flush(self):
+        """
+            writes buffered rows as one row group / record batch\n
+            a column whose later values do not fit its type is widened (int -> float -> string)
+            and the row groups already written are rewritten with the wider type
+        """
+        if not self.buffer and self.schema is not None:
+            return
+        pa = self.pa
+
+        cols = [f.name for f in self.schema] if self.schema is not None else (
+            self.columns or self.head or list(dict.fromkeys(k for r in self.buffer for k in r)))
+        old = self.schema or pa.schema([pa.field(c, pa.null()) for c in cols])
+
+        arrays, fields = [], []
+        for field in old:
+            arr = self.column([ResultSink.cell(r.get(field.name)) for r in self.buffer])
+            t = self.widen(field.type, arr.type)
+            if self.schema is None and pa.types.is_null(t):
+                t = pa.string()
+            if arr.type != t:
+                arr = arr.cast(t)
+            arrays.append(arr)
+            fields.append(pa.field(field.name, t))
+        schema = pa.schema(fields)
+
+        if self.schema is None:
+            self.schema = schema
+            self.open()
+        elif schema != self.schema:
+            self.rewrite(schema)
+        if not self.buffer:
+            return
+
+        self.writeBatch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.buffer = []
+
+    def writeBatch(self, batch):
+        if self.kind == "parquet":
+            self.writer.write_batch(batch, row_group_size=len(batch))
+        else:
+            self.writer.write_batch(batch)
+
+    def rewrite(self, schema):
+        """
+            rewrites batches written so far with widened schema, streamed batch by batch
+        """
+        pa = self.pa
+        self.closeWriter()
+        old = self.outputFile + ".widen"
+        os.replace(self.outputFile, old)
+        self.schema = schema
+        self.open()
+
+        if self.kind == "parquet":
+            import pyarrow.parquet as pq
+            src = pq.ParquetFile(old)
+            batches = src.iter_batches()
+        else:
+            src = pa.memory_map(old)
+            reader = pa.ipc.open_file(src)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        try:
+            for b in batches:
+                for x in pa.Table.from_batches([b]).cast(schema).to_batches():
+                    self.writeBatch(x)
+        finally:
+            src.close()
+        os.remove(old)
+
+    def open(self):
+        compression = None if self.compression == "none" else self.compression
+        if self.kind == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(
+                self.outputFile, self.schema, compression=compression or "none")
+        else:
+            self.f = self.pa.OSFile(self.outputFile, "wb")
+            self.writer = self.pa.ipc.new_file(self.f, self.schema,
+                                               options=self.pa.ipc.IpcWriteOptions(compression=compression))
+
+    def closeWriter(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def close(self):
+        if self.kind in ["parquet", "arrow"]:
+            if self.buffer is None:
+                return
+            # schema is written even if no rows came
+            if self.buffer or self.schema is None:
+                self.flush()
+            self.buffer = None
+            self.closeWriter()
+            return
+
+        if self.f is None:
+            return
+        if self.kind == "json":
+            self.f.write("]")
+        self.f.close()
+        self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -1,11 +1,17 @@
-import requests
 from .BASE import WikiBase
+from .client import WikiClient
 from .reader import WikiReader
+from .ratelimit import RateLimiter
+from .sink import ResultSink
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from tabulate import tabulate
 import os
+import re
 import sys
+import time
+from collections import OrderedDict
 from pprint import pprint
-import re
 
 
 # humans
@@ -31,43 +37,203 @@ LIMIT 10
 class WikiSparql(WikiBase):
 
     API_ENDPOINT = "https://query.wikidata.org/sparql"
+    ENTITY_PREFIX = "http://www.wikidata.org/entity/"
+
+    # query service allows 5 parallel queries per client
+    LIMITER = RateLimiter(concurrency=5)
+
+    # distinct recent ids executeStream remembers to skip repeats (bounds its memory)
+    SEEN_WINDOW = 100000
+
+    # escapes of TSV literals (\uXXXX handled separately)
+    ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f",
+               '"': '"', "'": "'", "\\": "\\"}
+    ESCAPE_RE = re.compile(r'\\(u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|.)')
 
     # helper
     @staticmethod
-    def parseResultToIds(res: dict):
+    def parseResultToIds(res: dict, batch: int = 50):
         """
-            Parses results to ids
+            Parses results to deduped entity ids split in batches of batch ids\n
+            only bindings typed 'uri' under ENTITY_PREFIX are considered
         """
         if "results" not in res:
             return ""
 
         if "bindings" not in res["results"]:
             return ""
-        res = res["results"]["bindings"]
 
-        ids = []
-        for obj in res:
-            for k in obj:
-                if "value" not in obj[k]:
-                    continue
-                x = obj[k]["value"]
-                id_ = re.findall(r"(?<=/)[^/]+", x)
-                # id_ = x.split("/")
-                # http://www.wikidata.org/entity/Q848
-                # ['www.wikidata.org', 'entity', 'Q765']
-                if id_:
-                    id_ = id_[-1]
-                    ids.append(id_)
-
-        batch = 30
+        ids = WikiSparql.extractIds(res["results"]["bindings"])
         if ids:
-            batched_result = [ids[i:i + batch]
-                              for i in range(0, len(ids), batch)]
-            return batched_result
+            return [ids[i:i + batch] for i in range(0, len(ids), batch)]
         return []
 
+    @staticmethod
+    def extractIds(bindings: list[dict]):
+        """
+            entity ids of uri bindings in order of first appearance (no duplicates)
+        """
+        prefix = WikiSparql.ENTITY_PREFIX
+        n = len(prefix)
+
+        # http://www.wikidata.org/entity/Q848 -> Q848
+        return list(dict.fromkeys(
+            v["value"][n:] for obj in bindings for v in obj.values()
+            if v.get("type") == "uri" and v["value"].startswith(prefix)))
+
+    @staticmethod
+    def unescape(text: str):
+        """
+            resolves escapes of a TSV literal in one pass (so an escaped backslash followed by t stays \\t)
+        """
+        def sub(m):
+            e = m.group(1)
+            if len(e) > 1:
+                return chr(int(e[1:], 16))
+            return WikiSparql.ESCAPES.get(e, m.group(0))
+
+        return WikiSparql.ESCAPE_RE.sub(sub, text) if "\\" in text else text
+
+    @staticmethod
+    def parseTSVTerm(term: str):
+        """
+            Parses one TSV result cell to a SPARQL JSON style binding {"type": ..., "value": ...}
+        """
+        if term.startswith("<") and term.endswith(">"):
+            return {"type": "uri", "value": term[1:-1]}
+
+        if term.startswith("_:"):
+            return {"type": "bnode", "value": term[2:]}
+
+        if term.startswith('"'):
+            end = term.rfind('"')
+            x = {"type": "literal", "value": WikiSparql.unescape(term[1:end])}
+            rest = term[end + 1:]
+            if rest.startswith("@"):
+                x["xml:lang"] = rest[1:]
+            elif rest.startswith("^^"):
+                x["datatype"] = rest[3:-1]
+            return x
+
+        # bare numbers / booleans
+        return {"type": "literal", "value": term}
+
+    @staticmethod
+    def streamBindings(query: str):
+        """
+            Generator over result rows of query, parsed line by line from TSV response\n
+            each row is a dict of variable -> binding (same shape as JSON results)
+        """
+        headers = {
+            'User-Agent': 'Python/SPARQL',
+            'Accept': 'text/tab-separated-values'
+        }
+
+        # the stream holds one of the query service slots until it is exhausted or closed
+        WikiSparql.LIMITER.acquire()
+        try:
+            response = WikiClient.getDefault().getQuery(WikiSparql.API_ENDPOINT, headers=headers,
+                                                        params={'query': query}, stream=True)
+        except BaseException:
+            WikiSparql.LIMITER.release()
+            raise
+        try:
+            if response.status_code != 200:
+                print(f"Failed to retrieve data: {response.status_code}")
+                return
+
+            response.encoding = "utf-8"
+            lines = response.iter_lines(decode_unicode=True)
+            head = next(lines, None)
+            if not head:
+                return
+            head = [h[1:] if h.startswith("?") else h for h in head.split("\t")]
+
+            # an empty line is a row with every variable unbound
+            for line in lines:
+                row = {}
+                for k, v in zip(head, line.split("\t")):
+                    if v:
+                        row[k] = WikiSparql.parseTSVTerm(v)
+                yield row
+        finally:
+            response.close()
+            WikiSparql.LIMITER.release()
+
+    @staticmethod
+    def dumpColumnar(res, outputFile, lang: list[str] = ["en"]):
+        """
+            writes result of execute to Parquet / Arrow file (entities flattened per language, raw results one column per variable)
+        """
+        if not res:
+            return
+        if "results" in res:
+            head, rows = WikiSparql.bindingRows(res)
+            WikiSparql.dumpRows(outputFile, head, rows)
+            return
+
+        WikiSparql.dumpRows(outputFile, WikiSparql.entityHead(lang, gloss=True),
+                            WikiSparql.entityRows(res, lang, gloss=True))
+
+    @staticmethod
+    def enrichBatch(ids: list[str], options: dict):
+        """
+            yields entities of ids (failed chunks are skipped)
+        """
+        x = WikiReader.getEntitiesByIds(ids, options=options, isTest=False)
+        for v in x.values():
+            if type(v) == dict:
+                yield v
+
     # functionalities
 
+    @staticmethod
+    def executeStream(query: str, batch: int = 50, options: dict = {"props": ["descriptions", "labels"]}, enrich: bool = True, seenWindow: int = None):
+        """
+        Streaming version of execute for large results\n
+        bindings are parsed incrementally from the HTTP body and entity ids are
+        enriched batch by batch, so memory stays flat whatever the result size
+
+        :param query: str, SPARQL Query to be executed
+        :param batch: number of entity ids enriched per getEntitiesByIds call
+        :param options: options passed to getEntitiesByIds
+        :param enrich: when set yields entities (like values of execute result) else yields raw binding rows
+        :param seenWindow: ids repeated within this many recent distinct ids are enriched once (default WikiSparql.SEEN_WINDOW),
+            ids repeated further apart may be yielded again
+
+        example:
+            for ent in WikiSparql.executeStream(q):
+                print(ent["id"])
+        """
+        rows = WikiSparql.streamBindings(query)
+        if not enrich:
+            yield from rows
+            return
+
+        window = seenWindow if seenWindow else WikiSparql.SEEN_WINDOW
+        seen = OrderedDict()
+        ids = []
+        for row in rows:
+            for v in row.values():
+                if v["type"] != "uri" or not v["value"].startswith(WikiSparql.ENTITY_PREFIX):
+                    continue
+                id_ = v["value"][len(WikiSparql.ENTITY_PREFIX):]
+                if id_ in seen:
+                    seen.move_to_end(id_)
+                    continue
+                seen[id_] = None
+                if len(seen) > window:
+                    seen.popitem(last=False)
+                ids.append(id_)
+
+            if len(ids) >= batch:
+                yield from WikiSparql.enrichBatch(ids, options)
+                ids = []
+
+        if ids:
+            yield from WikiSparql.enrichBatch(ids, options)
+
+
     @staticmethod
     def execute(query: str):
         """
@@ -81,10 +247,9 @@ class WikiSparql(WikiBase):
             'Accept': 'application/sparql-results+json'
         }
 
-        # sys.stdout.flush()
-        response = requests.get(WikiSparql.API_ENDPOINT, headers=headers,
-                                params={'query': query})
-        # sys.stdout.flush()
+        with WikiSparql.LIMITER:
+            response = WikiClient.getDefault().getQuery(WikiSparql.API_ENDPOINT, headers=headers,
+                                                        params={'query': query})
 
         if response.status_code == 200:
             res = response.json()
@@ -93,13 +258,11 @@ class WikiSparql(WikiBase):
             if not batch_IDS:
                 return res
 
-            complete_data = {}
-            for batch in batch_IDS:
-                sys.stdout.flush()
-                x = WikiReader.getEntitiesByIds(
-                    batch, options={"props": ["descriptions", "labels"]}, isTest=False)
-                complete_data.update(x)
-                sys.stdout.flush()
+            # getEntitiesByIds chunks and fetches batches concurrently
+            ids = [id_ for batch in batch_IDS for id_ in batch]
+            complete_data = WikiReader.getEntitiesByIds(
+                ids, options={"props": ["descriptions", "labels"]}, isTest=False)
+            sys.stdout.flush()
             return complete_data
 
         else:
@@ -107,7 +270,7 @@ class WikiSparql(WikiBase):
             return None
 
     @staticmethod
-    def execute_many(fileSource: str, delimiter: str = "---", output_format: str = "json", output: str = "single", output_dir: str = "sparql_test", lang: list[str] = ["en"]):
+    def execute_many(fileSource: str, delimiter: str = "---", output_format: str = "json", output: str = "single", output_dir: str = "sparql_test", lang: list[str] = ["en"], workers: int = 1):
         """
         Executes and return responses of SPARQL queries and saves them to file(s)
 
@@ -115,23 +278,29 @@ class WikiSparql(WikiBase):
 
         :param fileSource: str, Path to txt file containing sparql queries to be executed
         :param delimiter: str, delimiter used to separate queries in text file by default its '---'
-        :param output_format: str, either 'json' or 'csv'\ndefault its json
+        :param output_format: str, one of 'json', 'csv', 'parquet' or 'arrow'\ndefault its json
         :param output: str, either 'single' or 'many' denoting output of queries should be in single json file or multiple json files \ndefault its single
 
-        *Note csv format will have one file per query*\n
+        *Note csv / parquet / arrow formats will have one file per query*\n
+        parquet / arrow files hold one row per entity (label / description / gloss columns per language)
+        or one column per variable for results without entities (requires pyarrow)\n
         :param output_dir: str,  directory name to save response files to
         :param lang: list[str], filter languages for CSV results
+        :param workers: int, number of queries executed concurrently (default 1)\n
+        *requests to the query service never exceed WikiSparql.LIMITER, whatever the workers*\n
+        with one file per query each result is written as soon as its query completes\n
+        a query that fails is returned as {"error": {"code": "query-failed", "info": ...}} and the others still run
         """
 
         # fallback
-        if output_format not in ["json", 'csv']:
+        if output_format not in ["json", 'csv', "parquet", "arrow"]:
             output_format = "json"
 
         # invalid output set to single
         if output not in ["single", "many"]:
             output = "single"
 
-        elif output == "single" and output_format == "csv":
+        elif output == "single" and output_format != "json":
             output = "many"
 
         try:
@@ -141,52 +310,71 @@ class WikiSparql(WikiBase):
                 content = f.read()
             queries = content.split(delimiter)
 
-            cnt = 1
-            result = []
-            for query in queries:
-                sys.stdout.flush()
-                x = WikiSparql.execute(query)
-                result.append(x)
-                print(f"Executed query {cnt}")
-                cnt += 1
-                # time.sleep(1)
-                sys.stdout.flush()
-
             t = datetime.now()
 
             # create directory if not exist
             if not os.path.isdir(output_dir):
                 os.mkdir(output_dir)
 
-            if output_format == "csv":
-                for i, qRes in enumerate(result):
-                    csvF = WikiSparql.convertToCSVForm(qRes, lang, gloss=True)
-                    sys.stdout.flush()
-                    if not csvF["success"]:
-                        # write to json
+            def run(i):
+                start = time.perf_counter()
+                try:
+                    return write(i, WikiSparql.execute(queries[i])), time.perf_counter() - start
+                except Exception as e:
+                    # one failing query does not stop the others
+                    return {"error": {"code": "query-failed", "info": str(e)}}, time.perf_counter() - start
+
+            def write(i, x):
+                if output_format == "csv":
+                    if type(x) != dict or "results" in x:
+                        # not entities, write to json
                         WikiSparql.dumpResult(
-                            qRes, f"{output_dir}/SparQL_Result_{t}_{i+1}.json")
+                            x, f"{output_dir}/SparQL_Result_{t}_{i+1}.json")
                     else:
-                        WikiSparql.dumpCSV(
-                            f"{output_dir}/SparQL_Result_{t}_{i+1}.csv", csvF["head"], csvF["data"])
-                    sys.stdout.flush()
+                        errors = []
+                        WikiSparql.dumpEntityCSV(
+                            f"{output_dir}/SparQL_Result_{t}_{i+1}.csv", x, lang, gloss=True, errors=errors)
+                        if errors:
+                            print(f"Query {i+1}: skipped {len(errors)} malformed entities")
 
-            # JSON form
-            else:
-                if output == 'single':
-                    WikiSparql.dumpResult(
-                        result, f"{output_dir}/SparQL_Result_{t}.json")
-                    print(f"Done Execution, stored results at {
-                        output_dir}/SparQL_Result_{t}.json")
-                    return result
+                elif output_format in ["parquet", "arrow"]:
+                    WikiSparql.dumpColumnar(
+                        x, f"{output_dir}/SparQL_Result_{t}_{i+1}.{output_format}", lang)
 
                 # one file per query
-                for i, x in enumerate(result):
-                    sys.stdout.flush()
+                elif output == "many":
                     WikiSparql.dumpResult(
                         x, f"{output_dir}/SparQL_Result_{t}_{i+1}.json")
+                return x
+
+            result = [None] * len(queries)
+            timings = [0.0] * len(queries)
+            start = time.perf_counter()
+            done = 0
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                futures = {ex.submit(run, i): i for i in range(len(queries))}
+                for fut in as_completed(futures):
+                    i = futures[fut]
+                    result[i], timings[i] = fut.result()
+                    done += 1
+                    print(f"Executed query {i+1} ({done}/{len(queries)}) in {timings[i]:.2f}s")
                     sys.stdout.flush()
 
+            total = time.perf_counter() - start
+            summary = [[i + 1, f"{x:.2f}", WikiSparql.queryStatus(result[i])]
+                       for i, x in enumerate(timings)]
+            print(tabulate(summary, headers=[
+                  "query", "seconds", "status"], tablefmt="simple"))
+            print(f"{len(queries)} queries in {total:.2f}s (sum of query times {sum(timings):.2f}s)")
+
+            if output_format == "json" and output == 'single':
+                WikiSparql.dumpResult(
+                    result, f"{output_dir}/SparQL_Result_{t}.json")
+                print(f"Done Execution, stored results at {
+                    output_dir}/SparQL_Result_{t}.json")
+                return result
+
             print(f"Done execution check {output_dir}")
             return result
 
@@ -194,6 +382,17 @@ class WikiSparql(WikiBase):
             print("Error while executing many")
             return e
 
+    @staticmethod
+    def queryStatus(x):
+        """
+            ok / failed / failed: <error info> of an execute_many result
+        """
+        if x is None:
+            return "failed"
+        if type(x) == dict and "error" in x:
+            return "failed: " + x["error"].get("info", "")
+        return "ok"
+
     # canned queries
     @staticmethod
     def find_entities_by_property(pname: str, ename: str, limit: int = 10, outputFile=None):
@@ -228,6 +427,11 @@ class WikiSparql(WikiBase):
         """.format(x=pid, y=eid, z=limit)
         x = WikiSparql.execute(query)
         if x:
+            if ResultSink.isColumnar(outputFile):
+                WikiSparql.dumpColumnar(x, outputFile)
+                print(f"Written to {outputFile}")
+                return x
+
             if not outputFile or type(outputFile) != str:
                 return x
 
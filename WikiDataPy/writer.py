@@ -1,8 +1,14 @@
 import requests
 import os
+import threading
+import time
 from .BASE import WikiBase
+from .ratelimit import AdaptiveRateLimiter
+from .metrics import Metrics
 import json
 import pprint
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 
 
 class WikiWriter(WikiBase):
@@ -10,19 +16,116 @@ class WikiWriter(WikiBase):
     API_ENDPOINT = "https://test.wikidata.org/w/api.php"
     API_ENDPOINT_PROD = "https://www.wikidata.org/w/api.php"
 
-    def __init__(self, username: str, password: str):
+    # seconds of replication lag after which the server refuses edits
+    MAXLAG = 5
+    MAX_RETRIES = 5
+
+    # shared by all writers, edit limits apply per account / IP
+    LIMITER = AdaptiveRateLimiter()
+
+    def __init__(self, username: str, password: str, limiter: AdaptiveRateLimiter = None):
         """
             Initialise writer object with login credentials\n 
             Recommended to use environment variables
 
             :param username: str, username of wikidata account
             :param password:  str, password of wikidata account
+            :param limiter: rate limiter for edits (default WikiWriter.LIMITER shared by all writers)
 
         """
         self.username = username
         self.password = password
         self.session = requests.Session()
         self.csrf_token = ""
+        self.limiter = limiter if limiter else WikiWriter.LIMITER
+        self.tokenLock = threading.Lock()
+
+    # helper
+    @staticmethod
+    def retryAfter(value, default: float):
+        """
+            seconds from Retry-After header (seconds or HTTP date)
+        """
+        if not value:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+            except (TypeError, ValueError):
+                return default
+
+    def send(self, method: str, api: str, params: dict, retry: bool = False):
+        """
+        Sends request over the writer's session (logged in cookies) and reports it to Metrics hooks
+
+        :param method: GET (params in query string) or POST (params as form data)
+        :param retry: request is a retry of an earlier attempt (counted as retry by hooks)
+        """
+        kw = {"params": params} if method == "GET" else {"data": params}
+        if not Metrics.HOOKS:
+            return self.session.request(method, api, **kw)
+
+        action = params.get("action", "")
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, api, **kw)
+        except Exception as e:
+            Metrics.request(action, method, api, latency=time.perf_counter() - start,
+                            retries=int(retry), error=str(e))
+            raise
+        Metrics.response(action, r, time.perf_counter() - start, retries=int(retry))
+        return r
+
+    def post(self, api: str, params: dict):
+        """
+        Sends mutating request through the rate limiter and returns decoded response
+
+        adds maxlag parameter and retries (up to MAX_RETRIES) on maxlag / ratelimited errors
+        and HTTP 429 / 503, waiting Retry-After seconds and slowing the limiter down\n
+        an expired CSRF token (badtoken) is refreshed and the request retried
+
+        :param api: endpoint
+        :param params: POST data
+        """
+        params = dict(params)
+        params.setdefault("maxlag", WikiWriter.MAXLAG)
+
+        for attempt in range(WikiWriter.MAX_RETRIES + 1):
+            with self.limiter:
+                r = self.send("POST", api, params, retry=attempt > 0)
+
+            try:
+                response = r.json()
+            except ValueError:
+                response = {"error": {"code": f"http-{r.status_code}", "info": r.text[:200]}}
+
+            err = response.get("error")
+            code = err.get("code") if type(err) == dict else None
+
+            # token expired mid job, fetch new one and retry
+            # (concurrent requests with the same stale token refresh it once)
+            if code == "badtoken" and "token" in params and attempt < WikiWriter.MAX_RETRIES:
+                with self.tokenLock:
+                    if self.csrf_token == params["token"]:
+                        self.getCSRFTtoken(isTest=api == WikiWriter.API_ENDPOINT)
+                params["token"] = self.csrf_token
+                continue
+
+            if r.status_code in [429, 503] or code in ["maxlag", "ratelimited"]:
+                wait = WikiWriter.retryAfter(
+                    r.headers.get("Retry-After"), 2 ** attempt)
+                self.limiter.backoff(wait)
+                print(f"Throttled ({code or r.status_code}), retrying in {wait:.0f}s")
+                continue
+
+            # only healthy answers ramp the rate up (not 5xx / API errors)
+            if r.status_code < 300 and err is None:
+                self.limiter.success()
+            return response
+
+        return response
 
     # auth
 
@@ -44,8 +147,7 @@ class WikiWriter(WikiBase):
             "type": "login",
             "format": "json"
         }
-        response = self.session.get(
-            api, params=params).json()
+        response = self.send("GET", api, params).json()
         login_token = response['query']['tokens']['logintoken']
 
         login_params = {
@@ -57,8 +159,8 @@ class WikiWriter(WikiBase):
             "format": "json"
         }
 
-        login_response = self.session.post(
-            WikiWriter.API_ENDPOINT, data=login_params).json()
+        login_response = self.send(
+            "POST", WikiWriter.API_ENDPOINT, login_params).json()
 
         if login_response['clientlogin']['status'] == 'PASS':
             print("Successfully logged in.")
@@ -82,8 +184,7 @@ class WikiWriter(WikiBase):
             "format": "json"
         }
 
-        response = self.session.get(
-            api, params=params).json()
+        response = self.send("GET", api, params).json()
 
         self.csrf_token = response['query']['tokens']['csrftoken']
 
@@ -101,7 +202,7 @@ class WikiWriter(WikiBase):
             "action": "logout",
             "format": "json"
         }
-        response = self.session.post(api, data=params)
+        response = self.send("POST", api, params)
 
         if response.status_code == 200:
             print("Successfully logged out.")
@@ -143,7 +244,7 @@ class WikiWriter(WikiBase):
         }
 
         # Send POST request to create the claim
-        response = self.session.post(api, data=params).json()
+        response = self.post(api, params)
 
         # Handle errors
         if "error" in response:
@@ -182,7 +283,7 @@ class WikiWriter(WikiBase):
         }
 
         # Send POST request to create the claim
-        response = self.session.post(api, data=params).json()
+        response = self.post(api, params)
 
         # Handle errors
         if "error" in response:
@@ -263,7 +364,7 @@ class WikiWriter(WikiBase):
 
         params["data"] = json.dumps(data)
         # sending post the request
-        response = self.session.post(api, data=params).json()
+        response = self.post(api, params)
 
         if "error" in response:
             print("Error in creating or editing entity:", response["error"])
@@ -294,7 +395,7 @@ class WikiWriter(WikiBase):
             "token": self.csrf_token
         }
 
-        response = self.session.post(api, data=params).json()
+        response = self.post(api, params)
 
         if "error" in response:
             print("Error in deleting entity:", response["error"])
@@ -339,7 +440,7 @@ class WikiWriter(WikiBase):
             "value": label
         }
 
-        resp = self.session.post(api, data=params).json()
+        resp = self.post(api, params)
 
         if "error" in resp:
             print("Error while setting label")
@@ -384,7 +485,7 @@ class WikiWriter(WikiBase):
             "value": description
         }
 
-        resp = self.session.post(api, data=params).json()
+        resp = self.post(api, params)
 
         if "error" in resp:
             print("Error while setting Description")
@@ -430,7 +531,7 @@ class WikiWriter(WikiBase):
             "set": aliases
         }
 
-        resp = self.session.post(api, data=params).json()
+        resp = self.post(api, params)
 
         if "error" in resp:
             print("Error while setting Aliases")
@@ -482,7 +583,7 @@ class WikiWriter(WikiBase):
         if remove:
             params["remove"] = remove
 
-        resp = self.session.post(api, data=params).json()
+        resp = self.post(api, params)
 
         if "error" in resp:
             print("Error while changing Aliases")
@@ -0,0 +1,51 @@
+"""
+Scan throughput of DumpReader on a synthetic dump
+
+    python -m benchmarks.bench_dump [entities] [workers]
+
+writes a .json.gz dump of synthetic items (benchmarks.mockserver) to a temp dir,
+then times a full filtered scan in process and with worker processes, an id
+lookup by scan (lines of other entities are skipped without decoding) and the
+same lookup through a DumpIndex over a block compressed copy
+"""
+import os
+import sys
+import tempfile
+import time
+
+from WikiDataPy.dumpIndex import DumpIndex
+from WikiDataPy.dumpReader import DumpReader
+
+from .mockserver import syntheticEntities
+
+
+def timed(fn):
+    start = time.perf_counter()
+    x = fn()
+    return time.perf_counter() - start, x
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else DumpReader.WORKERS
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "dump.json.gz")
+        DumpReader.writeDump(syntheticEntities(n), path)
+        print(f"dump: {n} entities, {os.path.getsize(path) / 1e6:.1f} MB gzip")
+
+        for w in sorted({1, workers}):
+            reader = DumpReader(path, workers=w)
+            took, count = timed(lambda: sum(1 for _ in reader.entities(props=["P31"], languages=["en"])))
+            print(f"scan  workers={w:<3}: {took:.2f}s  {n / took:,.0f} entities/s  ({count} with P31)")
+
+        ids = [f"Q{i}" for i in range(1, n + 1, max(1, n // 100))]
+        took, res = timed(lambda: DumpReader(path, workers=1).getEntitiesByIds(ids))
+        print(f"lookup {len(ids)} ids    : {took:.2f}s  {n / took:,.0f} lines/s")
+
+        blocked = os.path.join(d, "blocked.json.gz")
+        took, _ = timed(lambda: DumpIndex.compress(path, blocked))
+        print(f"index (block gzip)  : {took:.2f}s  {os.path.getsize(blocked) / 1e6:.1f} MB")
+        with DumpIndex(blocked) as idx:
+            took, res = timed(lambda: idx.getEntitiesByIds(ids))
+            print(f"indexed {len(ids)} ids   : {took * 1e3:.1f}ms  {len(ids) / took:,.0f} ids/s")
@@ -0,0 +1,166 @@
+"""
+End to end benchmark of reader, sparql, graph build and bulk writes against the local mock server
+
+    python -m benchmarks.bench_e2e [--latency 20] [--jitter 5] [--entities 5000] [--only reader,bulk]
+
+no request leaves the machine, every scenario runs against benchmarks.mockserver
+with the given latency (ms) so numbers are comparable between commits\n
+reports per scenario: calls, units (entities / rows / queries), throughput and
+p50 / p99 latency of single calls (claims for bulk writes)
+"""
+import argparse
+import csv
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tabulate import tabulate
+
+from WikiDataPy.bulkWriter import BulkWriter
+from WikiDataPy.grapher import WikiGraph
+from WikiDataPy.ratelimit import AdaptiveRateLimiter
+from WikiDataPy.reader import WikiReader
+from WikiDataPy.sparql import WikiSparql
+
+from .mockserver import WORDS, MockWikiServer, loadFixtures
+
+GROUPS = ["reader", "sparql", "graph", "bulk"]
+
+
+class TimedBulkWriter(BulkWriter):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def addClaim(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().addClaim(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(xs: list, q: float):
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+
+def timeCalls(fn, args: list, workers: int = 1):
+    """
+        runs fn over args (workers at a time), returns (total seconds, per call latencies)
+    """
+    def one(a):
+        start = time.perf_counter()
+        fn(a)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if workers <= 1:
+        lat = [one(a) for a in args]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            lat = list(ex.map(one, args))
+    return time.perf_counter() - start, lat
+
+
+# scenarios, each returns (units, total seconds, latencies)
+
+def readerScenarios(n: int):
+    queries = [f"{WORDS[i % len(WORDS)]} {WORDS[(i // 3) % len(WORDS)]}" for i in range(200)]
+    took, lat = timeCalls(lambda q: WikiReader.searchEntities(q, outputFile=None), queries, workers=8)
+    yield "searchEntities (8 threads)", len(queries), took, lat
+
+    took, lat = timeCalls(lambda q: WikiReader.reverseLookupMany(q, limit=3), [queries])
+    yield "reverseLookupMany", len(queries), took, lat
+
+    batches = [[f"Q{i}" for i in range(s, s + 500)] for s in range(1, min(n, 5000), 500)]
+    took, lat = timeCalls(lambda ids: WikiReader.getEntitiesByIds(ids, options={"props": ["labels", "descriptions"], "languages": ["en"]}), batches)
+    yield "getEntitiesByIds (500 ids/call)", sum(map(len, batches)), took, lat
+
+    ids = [f"Q{i}" for i in range(1, min(n, 300) + 1)]
+    took, lat = timeCalls(lambda id_: WikiReader.getClaims(id_, outputFile=None), ids, workers=8)
+    yield "getClaims (8 threads)", len(ids), took, lat
+
+
+def sparqlScenarios(n: int):
+    q = "SELECT ?item ?itemLabel WHERE { ?item wdt:P31 wd:Q5 . } LIMIT %d"
+
+    queries = [q % 200] * 20
+    took, lat = timeCalls(WikiSparql.execute, queries, workers=5)
+    yield "sparql execute (LIMIT 200, 5 threads)", len(queries), took, lat
+
+    big = q % min(n, 5000)
+    took, lat = timeCalls(lambda x: sum(1 for _ in WikiSparql.executeStream(x)), [big])
+    yield f"sparql executeStream (LIMIT {min(n, 5000)})", min(n, 5000), took, lat
+
+
+def graphScenarios(n: int):
+    def build(src):
+        g = WikiGraph(src_id=src)
+        g.buildGraph(r=3, out_degree=3)
+        return g
+
+    srcs = [f"Q{i}" for i in range(1, 11)]
+    took, lat = timeCalls(build, srcs)
+    yield "WikiGraph.buildGraph (r=3, out_degree=3)", len(srcs), took, lat
+
+
+def bulkScenarios(n: int, rows: int = 300):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["entity_id", "property_id", "value_id"])
+        for i in range(rows):
+            w.writerow([f"Q{i % 50 + 1}", "P31", f"Q{i % n + 1}"])
+
+    try:
+        for inflight in [1, 8]:
+            limiter = AdaptiveRateLimiter(rate=10000, maxRate=10000, minRate=10)
+            w = TimedBulkWriter("bench", "bench", limiter=limiter)
+            w.login()
+            w.getCSRFTtoken()
+            start = time.perf_counter()
+            w.addClaimsFromCSV(path, keepResults=False, inflight=inflight)
+            yield f"addClaimsFromCSV (inflight={inflight})", rows, time.perf_counter() - start, w.latencies
+    finally:
+        os.remove(path)
+
+
+SCENARIOS = {"reader": readerScenarios, "sparql": sparqlScenarios,
+             "graph": graphScenarios, "bulk": bulkScenarios}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="end to end benchmark against the mock server")
+    parser.add_argument("--latency", type=float, default=20, help="server latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=5, help="extra random latency up to (ms)")
+    parser.add_argument("--entities", type=int, default=5000, help="synthetic entities served")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests/s before HTTP 429")
+    parser.add_argument("--throttle-every", type=int, default=None, help="every n-th write is ratelimited")
+    parser.add_argument("--only", default=",".join(GROUPS), help="comma separated groups: " + ",".join(GROUPS))
+    args = parser.parse_args()
+
+    server = MockWikiServer(loadFixtures(pad=args.entities), latency=args.latency / 1000, jitter=args.jitter / 1000,
+                            rateLimit=args.rate_limit, throttleEvery=args.throttle_every)
+
+    cache = WikiReader.CACHE
+    WikiReader.setCache(None)
+    table = []
+    with server, server.use():
+        for group in args.only.split(","):
+            for name, units, took, lat in SCENARIOS[group.strip()](args.entities):
+                table.append([name, len(lat), units, f"{took:.2f}", f"{units / took:,.1f}",
+                              f"{statistics.median(lat) * 1000:.1f}", f"{percentile(lat, 0.99) * 1000:.1f}"])
+        stats = server.stats()
+    WikiReader.setCache(cache)
+
+    print()
+    print(f"mock server latency {args.latency:.0f}ms (+0-{args.jitter:.0f}ms), {args.entities} entities")
+    print(tabulate(table, headers=["scenario", "calls", "units", "seconds", "units/s", "p50 ms", "p99 ms"], tablefmt="github"))
+    print()
+    print("requests served: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
@@ -0,0 +1,53 @@
+"""
+Import time benchmark / regression guard
+
+    python -m benchmarks.bench_import [budget_ms]
+
+measures a cold `from WikiDataPy import WikiReader` in fresh interpreters and
+exits with status 1 if plotting dependencies get loaded or the median time
+exceeds budget_ms (default 300)
+"""
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+HEAVY = ["matplotlib", "networkx", "numpy", "aiohttp"]
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+from WikiDataPy import WikiReader
+took = (time.perf_counter() - start) * 1000
+print(took)
+print(",".join(m for m in {heavy} if m in sys.modules))
+"""
+
+
+def measure(stmt: str):
+    out = subprocess.run([sys.executable, "-c", stmt],
+                         capture_output=True, text=True, check=True).stdout.splitlines()
+    return float(out[0]), [m for m in out[1].split(",") if m]
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 300.0
+
+    times = []
+    loaded = []
+    for _ in range(RUNS):
+        took, loaded = measure(SNIPPET.format(heavy=HEAVY))
+        times.append(took)
+
+    median = statistics.median(times)
+    graph, _ = measure(SNIPPET.format(heavy=HEAVY).replace(
+        "import WikiReader", "import WikiReader, WikiGraph"))
+
+    print(f"from WikiDataPy import WikiReader : median {median:.1f}ms over {RUNS} runs (budget {budget:.0f}ms)")
+    print(f"  + WikiGraph                     : {graph:.1f}ms")
+    print(f"heavy modules loaded              : {', '.join(loaded) or 'none'}")
+
+    if loaded or median > budget:
+        print("FAIL: import time regression")
+        sys.exit(1)
+    print("OK")
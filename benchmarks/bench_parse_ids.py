@@ -0,0 +1,55 @@
+"""
+Micro-benchmark of WikiSparql.parseResultToIds on a synthetic result
+
+    python -m benchmarks.bench_parse_ids [bindings]
+
+default is 1,000,000 bindings (500k rows of an entity uri + a label literal)
+"""
+import re
+import sys
+import time
+
+from WikiDataPy.sparql import WikiSparql
+
+
+def synthetic_result(n: int, distinct: int = 100000):
+    rows = []
+    for i in range(n // 2):
+        rows.append({
+            "item": {"type": "uri", "value": f"http://www.wikidata.org/entity/Q{i % distinct}"},
+            "itemLabel": {"type": "literal", "xml:lang": "en", "value": f"label/{i}"}
+        })
+    return {"head": {"vars": ["item", "itemLabel"]}, "results": {"bindings": rows}}
+
+
+def regex_parse(res: dict):
+    # previous implementation, kept for comparison
+    ids = []
+    for obj in res["results"]["bindings"]:
+        for k in obj:
+            id_ = re.findall(r"(?<=/)[^/]+", obj[k]["value"])
+            if id_:
+                ids.append(id_[-1])
+    return [ids[i:i + 30] for i in range(0, len(ids), 30)]
+
+
+def bench(fn, res, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(res)
+        best = min(best, time.perf_counter() - start)
+    return best, sum(len(b) for b in out)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    res = synthetic_result(n)
+
+    old, oldIds = bench(regex_parse, res)
+    new, newIds = bench(WikiSparql.parseResultToIds, res)
+
+    print(f"bindings: {n}")
+    print(f"regex   : {old:.3f}s  {n / old:,.0f} bindings/s  {oldIds} ids")
+    print(f"current : {new:.3f}s  {n / new:,.0f} bindings/s  {newIds} ids")
+    print(f"speedup : {old / new:.1f}x")
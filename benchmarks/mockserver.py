@@ -0,0 +1,450 @@
+"""
+Local stand-in for the Wikidata action API and SPARQL endpoint
+
+    python -m benchmarks.mockserver [port] [latency_ms]
+
+serves wbsearchentities, wbgetentities, wbgetclaims, wbcreateclaim,
+wbeditentity, token / login / logout actions (/w/api.php) and a SPARQL
+endpoint (/sparql, JSON or TSV) from fixture entities kept in memory
+
+    with MockWikiServer(latency=0.02) as server:
+        with server.use():
+            WikiReader.getEntitiesByIds(["Q1", "Q2"])   # hits the mock
+
+latency / jitter delay every response, rateLimit (requests per second) answers
+HTTP 429 with Retry-After once exceeded and throttleEvery answers every n-th
+write with a ratelimited error, to exercise the client's backoff
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from WikiDataPy.BASE import WikiBase
+from WikiDataPy.client import WikiClient
+from WikiDataPy.reader import WikiReader
+from WikiDataPy.sparql import WikiSparql
+from WikiDataPy.writer import WikiWriter
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "entities.json")
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+         "india", "juliett", "kilo", "lima", "mike", "november", "oscar", "papa"]
+PROPS = ["P31", "P279", "P361", "P527", "P17", "P131", "P50", "P57"]
+
+
+def entityClaim(id_: str, prop: str, value: str):
+    return {
+        "mainsnak": {
+            "snaktype": "value", "property": prop, "datatype": "wikibase-item",
+            "datavalue": {"type": "wikibase-entityid",
+                          "value": {"entity-type": "item", "numeric-id": int(value[1:]), "id": value}}
+        },
+        "type": "statement", "id": f"{id_}${uuid.uuid4()}", "rank": "normal"
+    }
+
+
+def syntheticEntities(n: int, claims: int = 5, seed: int = 42):
+    """
+        n items Q1..Qn with english labels / descriptions and claims pointing to other items
+    """
+    rnd = random.Random(seed)
+    ents = {}
+    for i in range(1, n + 1):
+        id_ = f"Q{i}"
+        label = f"{WORDS[i % len(WORDS)]} {WORDS[(i // len(WORDS)) % len(WORDS)]} {i}"
+        ent = {
+            "type": "item", "id": id_,
+            "labels": {"en": {"language": "en", "value": label}},
+            "descriptions": {"en": {"language": "en", "value": f"synthetic item {i}"}},
+            "aliases": {"en": [{"language": "en", "value": f"item {i}"}]},
+            "sitelinks": {},
+            "claims": {}
+        }
+        for p in rnd.sample(PROPS, min(claims, len(PROPS))):
+            ent["claims"][p] = [entityClaim(id_, p, f"Q{rnd.randint(1, n)}")]
+        ents[id_] = ent
+    return ents
+
+
+def loadFixtures(path: str = FIXTURES, pad: int = 0):
+    """
+        entities of fixture file (wbgetentities "entities" shape), padded with synthetic items up to pad
+    """
+    ents = syntheticEntities(pad) if pad else {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            ents.update(json.load(f))
+    return ents
+
+
+class MockWikiServer:
+
+    def __init__(self, entities: dict = None, latency: float = 0.0, jitter: float = 0.0, rateLimit: float = None, throttleEvery: int = None, retryAfter: float = 0.1, port: int = 0):
+        """
+        Threaded HTTP server answering like www.wikidata.org and query.wikidata.org
+
+        :param entities: QID -> entity dict served and edited (default fixtures padded to 1000 synthetic items)
+        :param latency: seconds every response is delayed by
+        :param jitter: extra random delay in [0, jitter] seconds
+        :param rateLimit: requests per second allowed before answering HTTP 429 (None = unlimited)
+        :param throttleEvery: every n-th write answers a ratelimited error (None = never)
+        :param retryAfter: Retry-After seconds sent with throttled responses
+        :param port: port to listen on (0 picks a free one)
+        """
+        self.entities = entities if entities is not None else loadFixtures(pad=1000)
+        self.latency = latency
+        self.jitter = jitter
+        self.rateLimit = rateLimit
+        self.throttleEvery = throttleEvery
+        self.retryAfter = retryAfter
+
+        self.lock = threading.Lock()
+        self.counts = {}
+        # requests being answered now / most ever at once, per endpoint ("api" / "sparql")
+        self.active = {}
+        self.peaks = {}
+        self.writes = 0
+        self.tokens = rateLimit or 0
+        self.last = time.monotonic()
+        self.csrf = uuid.uuid4().hex + "+\\"
+        self.nextId = max([int(k[1:]) for k in self.entities if k[1:].isdigit()] or [0]) + 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def api(self):
+        return self.url + "/w/api.php"
+
+    @property
+    def sparql(self):
+        return self.url + "/sparql"
+
+    # lifecycle
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @contextmanager
+    def use(self):
+        """
+            points WikiReader / WikiWriter / WikiSparql (prod and test endpoints) and the default WikiClient at this server
+        """
+        saved = [(cls, k, getattr(cls, k)) for cls in [WikiBase, WikiReader, WikiWriter]
+                 for k in ["API_ENDPOINT", "API_ENDPOINT_PROD"] if k in vars(cls)]
+        saved.append((WikiSparql, "API_ENDPOINT", WikiSparql.API_ENDPOINT))
+        client = WikiClient.DEFAULT
+        try:
+            for cls, k, _ in saved:
+                setattr(cls, k, self.api)
+            WikiSparql.API_ENDPOINT = self.sparql
+            WikiClient.setDefault(WikiClient(pool_maxsize=64))
+            yield self
+        finally:
+            for cls, k, v in saved:
+                setattr(cls, k, v)
+            mock = WikiClient.setDefault(client)
+            if mock is not None:
+                mock.close()
+
+    def stats(self):
+        """
+            requests served per action (throttled ones counted under 'throttled')
+        """
+        with self.lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+            self.peaks = {}
+            self.writes = 0
+
+    # helpers
+
+    def count(self, action: str):
+        with self.lock:
+            self.counts[action] = self.counts.get(action, 0) + 1
+
+    def limited(self):
+        """
+            token bucket over all requests, True if this one is over rateLimit
+        """
+        if not self.rateLimit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rateLimit, self.tokens + (now - self.last) * self.rateLimit)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return False
+            return True
+
+    def enter(self, kind: str):
+        with self.lock:
+            self.active[kind] = self.active.get(kind, 0) + 1
+            self.peaks[kind] = max(self.peaks.get(kind, 0), self.active[kind])
+
+    def leave(self, kind: str):
+        with self.lock:
+            self.active[kind] -= 1
+
+    def peak(self, kind: str = "api"):
+        """
+            most requests of kind ("api" / "sparql") answered at once since start / reset
+        """
+        with self.lock:
+            return self.peaks.get(kind, 0)
+
+    def delay(self):
+        d = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if d > 0:
+            time.sleep(d)
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, body, kind: str = "application/json", headers: dict = None):
+                data = body if type(body) == bytes else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def dispatch(self, params: dict, write: bool):
+                kind = "sparql" if urlparse(self.path).path.endswith("/sparql") else "api"
+                server.enter(kind)
+                try:
+                    self.answer(params, write)
+                finally:
+                    server.leave(kind)
+
+            def answer(self, params: dict, write: bool):
+                server.delay()
+                if server.limited():
+                    server.count("throttled")
+                    return self.reply(429, {"error": {"code": "too-many-requests", "info": "rate limited"}},
+                                      headers={"Retry-After": str(server.retryAfter)})
+
+                path = urlparse(self.path).path
+                if path.endswith("/sparql"):
+                    server.count("sparql")
+                    return self.reply(200, *server.sparqlResult(params.get("query", ""), self.headers.get("Accept", "")))
+
+                action = params.get("action", "")
+                server.count(action)
+                fn = getattr(server, "do_" + action, None)
+                if fn is None:
+                    return self.reply(200, {"error": {"code": "badvalue", "info": f"Unrecognized value for parameter \"action\": {action}."}})
+                if write and action.startswith("wb") and server.throttle():
+                    return self.reply(200, {"error": {"code": "ratelimited", "info": "You've exceeded your rate limit."}},
+                                      headers={"Retry-After": str(server.retryAfter)})
+                return self.reply(200, fn(params))
+
+            def do_GET(self):
+                q = parse_qs(urlparse(self.path).query)
+                self.dispatch({k: v[-1] for k, v in q.items()}, write=False)
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                q = parse_qs(self.rfile.read(n).decode())
+                self.dispatch({k: v[-1] for k, v in q.items()}, write=True)
+
+        return Handler
+
+    def throttle(self):
+        if not self.throttleEvery:
+            return False
+        with self.lock:
+            self.writes += 1
+            if self.writes % self.throttleEvery == 0:
+                self.counts["throttled"] = self.counts.get("throttled", 0) + 1
+                return True
+        return False
+
+    def checkToken(self, params: dict):
+        if params.get("token") != self.csrf:
+            return {"error": {"code": "badtoken", "info": "Invalid CSRF token."}}
+
+    # actions
+
+    def do_query(self, params: dict):
+        if params.get("meta") != "tokens":
+            return {"batchcomplete": "", "query": {}}
+        if params.get("type") == "login":
+            return {"batchcomplete": "", "query": {"tokens": {"logintoken": uuid.uuid4().hex + "+\\"}}}
+        return {"batchcomplete": "", "query": {"tokens": {"csrftoken": self.csrf}}}
+
+    def do_clientlogin(self, params: dict):
+        return {"clientlogin": {"status": "PASS", "username": params.get("username", "")}}
+
+    def do_logout(self, params: dict):
+        return {}
+
+    def do_wbsearchentities(self, params: dict):
+        lang = params.get("language", "en")
+        query = params.get("search", "").lower()
+        limit = int(params.get("limit", 7))
+        offset = int(params.get("continue", 0))
+
+        hits = []
+        for id_, ent in self.entities.items():
+            label = ent.get("labels", {}).get(lang, {}).get("value", "")
+            aliases = [a["value"] for a in ent.get("aliases", {}).get(lang, [])]
+            if query and (label.lower().startswith(query) or any(a.lower().startswith(query) for a in aliases)):
+                x = {"id": id_, "title": id_, "pageid": int(id_[1:]) if id_[1:].isdigit() else 0,
+                     "url": f"//www.wikidata.org/wiki/{id_}", "label": label,
+                     "description": ent.get("descriptions", {}).get(lang, {}).get("value", ""),
+                     "match": {"type": "label", "language": lang, "text": label}}
+                if aliases:
+                    x["aliases"] = aliases
+                hits.append(x)
+
+        res = {"searchinfo": {"search": params.get("search", "")},
+               "search": hits[offset:offset + limit], "success": 1}
+        if offset + limit < len(hits):
+            res["search-continue"] = offset + limit
+        return res
+
+    def do_wbgetentities(self, params: dict):
+        props = params.get("props", "info|sitelinks|aliases|labels|descriptions|claims").split("|")
+        langs = params.get("languages")
+        langs = set(langs.split("|")) if langs else None
+
+        ids = params.get("ids", "").split("|")
+        # like the API, one malformed id fails the whole request
+        bad = [i for i in ids if not re.fullmatch(r"[QPL]\d+", i)]
+        if bad:
+            return {"error": {"code": "no-such-entity", "info": f'Could not find an entity with the ID "{bad[0]}".', "id": bad[0]}}
+
+        res = {}
+        with self.lock:
+            for id_ in ids:
+                ent = self.entities.get(id_)
+                if ent is None:
+                    res[id_] = {"id": id_, "missing": ""}
+                    continue
+                x = {"type": ent.get("type", "item"), "id": id_}
+                for p in props:
+                    if p not in ent:
+                        continue
+                    v = ent[p]
+                    if langs and p in ["labels", "descriptions", "aliases"]:
+                        v = {k: y for k, y in v.items() if k in langs}
+                    x[p] = v
+                res[id_] = x
+        return {"entities": res, "success": 1}
+
+    def do_wbgetclaims(self, params: dict):
+        ent = self.entities.get(params.get("entity", ""))
+        if ent is None:
+            return {"error": {"code": "no-such-entity", "info": "Could not find an entity."}}
+        return {"claims": ent.get("claims", {})}
+
+    def do_wbcreateclaim(self, params: dict):
+        err = self.checkToken(params)
+        if err:
+            return err
+        id_ = params.get("entity", "")
+        prop = params.get("property", "")
+        with self.lock:
+            ent = self.entities.get(id_)
+            if ent is None:
+                return {"error": {"code": "no-such-entity", "info": f"Could not find an entity with the ID \"{id_}\"."}}
+            value = "Q" + str(json.loads(params.get("value", "{}")).get("numeric-id", 0))
+            claim = entityClaim(id_, prop, value)
+            ent.setdefault("claims", {}).setdefault(prop, []).append(claim)
+        return {"pageinfo": {"lastrevid": 1}, "success": 1, "claim": claim}
+
+    def do_wbeditentity(self, params: dict):
+        err = self.checkToken(params)
+        if err:
+            return err
+        data = json.loads(params.get("data", "{}"))
+        with self.lock:
+            if params.get("new"):
+                id_ = f"Q{self.nextId}"
+                self.nextId += 1
+                ent = self.entities[id_] = {"type": "item", "id": id_, "labels": {},
+                                            "descriptions": {}, "aliases": {}, "sitelinks": {}, "claims": {}}
+            else:
+                id_ = params.get("id", "")
+                ent = self.entities.get(id_)
+                if ent is None:
+                    return {"error": {"code": "no-such-entity", "info": f"Could not find an entity with the ID \"{id_}\"."}}
+            for k in ["labels", "descriptions", "aliases"]:
+                if k in data:
+                    ent.setdefault(k, {}).update(data[k])
+            out = {k: ent[k] for k in ["type", "id", "labels", "descriptions", "aliases"] if k in ent}
+        return {"entity": out, "success": 1}
+
+    def sparqlResult(self, query: str, accept: str):
+        """
+            first LIMIT items (default 100) as ?item ?itemLabel bindings, TSV if asked for
+        """
+        m = re.search(r"LIMIT\s+(\d+)", query, re.IGNORECASE)
+        limit = int(m.group(1)) if m else 100
+        with self.lock:
+            ents = list(self.entities.values())[:limit]
+
+        rows = [(WikiSparql.ENTITY_PREFIX + e["id"], e.get("labels", {}).get("en", {}).get("value", ""))
+                for e in ents]
+
+        if "tab-separated" in accept:
+            lines = ["?item\t?itemLabel"] + [f'<{u}>\t"{l}"@en' for u, l in rows]
+            return "\n".join(lines).encode() + b"\n", "text/tab-separated-values; charset=utf-8"
+
+        return {
+            "head": {"vars": ["item", "itemLabel"]},
+            "results": {"bindings": [{"item": {"type": "uri", "value": u},
+                                      "itemLabel": {"type": "literal", "xml:lang": "en", "value": l}} for u, l in rows]}
+        }, "application/sparql-results+json"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+
+    server = MockWikiServer(latency=latency, port=port)
+    print(f"Mock Wikidata API on {server.api}, SPARQL on {server.sparql} (latency {latency * 1000:.0f}ms)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -18,5 +18,9 @@ setup(
         "numpy>=2.1.3",
         "tabulate>=0.9.0",
         "matplotlib-inline>=0.1.7"
-    ]
+    ],
+    extras_require={
+        "async": ["aiohttp>=3.9"],
+        "columnar": ["pyarrow>=14"]
+    }
 )
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+# plain `pytest` from the repo root imports WikiDataPy and benchmarks from the checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.mockserver import MockWikiServer, entityClaim, syntheticEntities  # noqa: E402
+from WikiDataPy.bulkWriter import BulkWriter  # noqa: E402
+from WikiDataPy.ratelimit import AdaptiveRateLimiter  # noqa: E402
+
+
+def makeItem(id_, label=None, aliases=(), claims=()):
+    """
+        entity served by the mock server, claims are (property, value, rank) triples
+    """
+    ent = {"type": "item", "id": id_, "labels": {}, "descriptions": {}, "aliases": {}, "claims": {}}
+    if label:
+        ent["labels"]["en"] = {"language": "en", "value": label}
+    if aliases:
+        ent["aliases"]["en"] = [{"language": "en", "value": a} for a in aliases]
+    for p, v, rank in claims:
+        c = entityClaim(id_, p, v)
+        c["rank"] = rank
+        ent["claims"].setdefault(p, []).append(c)
+    return ent
+
+
+@pytest.fixture
+def item():
+    return makeItem
+
+
+@pytest.fixture
+def entities():
+    """
+        entities the server fixture serves, override in a module to change them
+    """
+    return syntheticEntities(60)
+
+
+@pytest.fixture
+def latency():
+    return 0.0
+
+
+@pytest.fixture
+def server(entities, latency):
+    with MockWikiServer(entities, latency=latency) as srv, srv.use():
+        yield srv
+
+
+def loggedIn():
+    # mock server does not need edit pacing
+    w = BulkWriter("user", "password", limiter=AdaptiveRateLimiter(rate=1000, maxRate=1000, burst=100))
+    w.login()
+    w.getCSRFTtoken()
+    return w
+
+
+@pytest.fixture
+def writer(server):
+    return loggedIn()
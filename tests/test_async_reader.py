@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.mockserver import syntheticEntities
+from WikiDataPy.asyncReader import AsyncWikiReader, AsyncWikiSparql
+from WikiDataPy.reader import WikiReader
+from WikiDataPy.sparql import WikiSparql
+
+pytest.importorskip("aiohttp")
+
+
+@pytest.fixture
+def entities():
+    return syntheticEntities(200)
+
+
+@pytest.fixture
+def latency():
+    return 0.02
+
+
+@pytest.fixture(autouse=True)
+def loops():
+    yield
+    AsyncWikiReader.STATE.clear()
+
+
+async def fetchSession(ids=("Q1",)):
+    errors = []
+    res = await AsyncWikiReader.getEntitiesByIds(list(ids), errors=errors)
+    assert not errors
+    assert set(ids) <= set(res)
+    return await AsyncWikiReader.getSession()
+
+
+def test_concurrent_loops_keep_own_sessions(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "MAX_IDS", 5)
+    ids = [f"Q{i}" for i in range(1, 201)]
+
+    # each thread runs its own loop, none may close the other's session
+    with ThreadPoolExecutor(2) as ex:
+        sessions = list(ex.map(lambda _: asyncio.run(fetchSession(ids)), range(2)))
+
+    assert sessions[0] is not sessions[1]
+    assert server.stats()["wbgetentities"] == 80
+
+
+def test_session_of_closed_loop_is_closed(server):
+    first = asyncio.run(fetchSession())
+    assert not first.closed
+
+    second = asyncio.run(fetchSession())
+    assert second is not first
+    assert first.closed
+    assert len(AsyncWikiReader.STATE) == 1
+
+
+def test_sparql_concurrency_follows_limiter(server):
+    async def many():
+        return await asyncio.gather(*[AsyncWikiSparql.execute("SELECT ?item WHERE {} LIMIT 1") for _ in range(12)])
+
+    res = asyncio.run(many())
+    assert len(res) == 12 and all(res)
+    assert server.stats()["sparql"] == 12
+    assert server.peak("sparql") <= WikiSparql.LIMITER.concurrency
@@ -0,0 +1,68 @@
+import csv
+
+import pytest
+
+from WikiDataPy.BASE import WikiBase
+
+
+def ent(id_, label, description="", lang="en"):
+    x = {"id": id_, "labels": {lang: {"language": lang, "value": label}}, "descriptions": {}}
+    if description:
+        x["descriptions"][lang] = {"language": lang, "value": description}
+    return x
+
+
+@pytest.fixture
+def data():
+    return {
+        "Q1": ent("Q1", "one", "first"),
+        "Q2": {"labels": {}},                         # no id
+        "Q3": ent("Q3", "drei", lang="de"),
+        "Q4": {"id": "Q4", "labels": {"en": "four"}},  # label without value
+        "Q5": "not an entity",
+        "Q6": ent("Q6", "six"),
+    }
+
+
+def test_batches_follow_head_order():
+    rows = [r for b in WikiBase.entityBatches([ent("Q1", "one", "first"), ent("Q2", "zwei", lang="de")],
+                                               lang=["en", "de"]) for r in b]
+    assert WikiBase.entityHead(["en", "de"]) == ["id", "label-en", "description-en", "label-de", "description-de"]
+    assert rows == [("Q1", "one", "first", "", ""), ("Q2", "", "", "zwei", "")]
+
+
+def test_bad_rows_skipped_individually(data, monkeypatch):
+    # every bad entity lands in its own batch or shares one with good ones
+    for size in [1, 2, 4, 100]:
+        monkeypatch.setattr(WikiBase, "FLATTEN_BATCH", size)
+        errors = []
+        rows = list(WikiBase.entityRows(data, errors=errors))
+
+        assert rows == [("Q1", "one", "first"), ("Q3", "", ""), ("Q6", "six", "")]
+        assert [e["id"] for e in errors] == [None, "Q4", None]
+        assert errors[0]["error"].startswith("KeyError")
+
+
+def test_good_batches_kept_whole(data, monkeypatch):
+    monkeypatch.setattr(WikiBase, "FLATTEN_BATCH", 2)
+    good = [ent(f"Q{i}", str(i)) for i in range(10, 14)]
+    batches = list(WikiBase.entityBatches(good + list(data.values())))
+
+    assert [len(b) for b in batches] == [2, 2, 1, 1, 1]
+
+
+def test_csv_and_dict_forms_skip_bad_rows(data, tmp_path):
+    errors = []
+    path = tmp_path / "e.csv"
+    assert WikiBase.dumpEntityCSV(str(path), data, errors=errors) == 3
+    with open(path, newline="") as f:
+        assert [r[0] for r in csv.reader(f)] == ["id", "Q1", "Q3", "Q6"]
+    assert len(errors) == 3
+
+    res = WikiBase.convertToCSVForm(data)
+    assert res["success"] == 1
+    assert [r["id"] for r in res["data"]] == ["Q1", "Q3", "Q6"]
+    assert len(res["errors"]) == 3
+
+    res = WikiBase.convertToCSVForm({"Q5": "not an entity"})
+    assert res["success"] == 0 and res["errors"]
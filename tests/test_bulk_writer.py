@@ -0,0 +1,133 @@
+import pytest
+
+from benchmarks.mockserver import MockWikiServer
+from conftest import loggedIn
+
+
+@pytest.mark.parametrize("inflight", [1, 4])
+def test_malformed_rows_become_errors(writer, inflight):
+    rows = [("Q1", "P31", "Q2"), ("Q3",), (), ("Q2", "P31", "Q1")] * 30
+    res = writer.addClaimsFromRows(rows, inflight=inflight)
+
+    assert len(res) == len(rows)
+    assert [("claim" in x) for x in res] == [len(r) == 3 for r in rows]
+    assert res[1]["error"]["code"] == "bad-row"
+
+
+def test_lanes_keep_session_retry_policy(writer):
+    before = writer.session.get_adapter("https://x")
+    writer.addClaimsFromRows([("Q1", "P31", "Q2")] * 5, inflight=4)
+    assert writer.session.get_adapter("https://x") is before
+    assert writer.session.get_adapter("http://x").max_retries.total == before.max_retries.total
+
+
+def test_stale_token_refreshed_once(writer, server):
+    writer.csrf_token = "stale"
+    server.reset()
+    res = writer.addClaimsFromRows(
+        [(f"Q{i}", "P31", "Q1") for i in range(1, 41)], inflight=8)
+
+    assert all("claim" in x for x in res)
+    assert server.stats().get("query") == 1
+
+
+def test_names_journal_survives_changed_search_results(tmp_path, item):
+    src, journal = tmp_path / "names.csv", str(tmp_path / "job.sqlite")
+    src.write_text("entity,property,value\nNewcomer,P31,Kind\nExisting,P31,Kind\n")
+    ents = {e["id"]: e for e in [item("Q1", "Existing"), item("Q2", "Kind")]}
+
+    with MockWikiServer(ents) as srv, srv.use():
+        w = loggedIn()
+
+        # first run: "Newcomer" has no match yet, only row 2 expands to a claim
+        first = w.addClaimsFromNamesCSV(str(src), journal=journal)
+        assert [x["claim"]["mainsnak"]["property"] for x in first] == ["P31"]
+
+        # second run: row 1 now resolves and comes first in the expanded stream
+        srv.entities["Q3"] = item("Q3", "Newcomer")
+        srv.reset()
+        second = w.addClaimsFromNamesCSV(str(src), journal=journal)
+
+    assert len(second) == 2
+    assert srv.stats().get("wbcreateclaim") == 1
+    assert second[1] == first[0]
+    assert len(srv.entities["Q1"]["claims"]["P31"]) == 1
+    assert len(srv.entities["Q3"]["claims"]["P31"]) == 1
+
+
+def test_edit_results_per_row_in_row_order(writer, tmp_path):
+    src = tmp_path / "edit.csv"
+    src.write_text("entity_id,language_code,label,description,aliases\n"
+                   "Q1,en,one,first,\nQ2,en,two,second,\nQ1,fr,un,premier,\n")
+    res = writer.editEntitiesFromCSV(str(src))
+
+    assert len(res) == 3
+    assert [x["entity"]["id"] for x in res] == ["Q1", "Q2", "Q1"]
+    assert res[0] is res[2]
+
+
+def crashAfter(writer, monkeypatch, n):
+    """
+        createOrEditEntity dies (like a killed process) on call n + 1
+    """
+    real = writer.createOrEditEntity
+    calls = []
+
+    def edit(*args, **kwargs):
+        if len(calls) == n:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return real(*args, **kwargs)
+    monkeypatch.setattr(writer, "createOrEditEntity", edit)
+
+
+def test_create_resumes_after_crash(writer, server, tmp_path, monkeypatch):
+    src, journal = tmp_path / "create.csv", str(tmp_path / "job.sqlite")
+    src.write_text("lang,label,desc,alias\n" + "".join(f"en,new {i},item {i},\n" for i in range(5)))
+
+    crashAfter(writer, monkeypatch, 2)
+    with pytest.raises(KeyboardInterrupt):
+        writer.createEntitiesFromCSV(str(src), journal=journal)
+    monkeypatch.undo()
+    assert server.stats()["wbeditentity"] == 2
+
+    server.reset()
+    res = writer.createEntitiesFromCSV(str(src), journal=journal)
+
+    # rows 1-2 come from the journal, only rows 3-5 are created now
+    assert server.stats()["wbeditentity"] == 3
+    assert [x["entity"]["labels"]["en"]["value"] for x in res] == [f"new {i}" for i in range(5)]
+    assert len({x["entity"]["id"] for x in res}) == 5
+
+
+def test_edit_resumes_after_crash(writer, server, tmp_path, monkeypatch):
+    src, journal = tmp_path / "edit.csv", str(tmp_path / "job.sqlite")
+    src.write_text("entity_id,language_code,label,description,aliases\n"
+                   "Q1,en,one,first,\nQ2,en,two,second,\nQ1,fr,un,premier,\nQ3,en,three,third,\n")
+
+    crashAfter(writer, monkeypatch, 1)
+    with pytest.raises(KeyboardInterrupt):
+        writer.editEntitiesFromCSV(str(src), journal=journal)
+    monkeypatch.undo()
+
+    server.reset()
+    res = writer.editEntitiesFromCSV(str(src), journal=journal)
+
+    # Q1 (rows 1 and 3) was edited before the crash, Q2 and Q3 are edited now
+    assert server.stats()["wbeditentity"] == 2
+    assert [x["entity"]["id"] for x in res] == ["Q1", "Q2", "Q1", "Q3"]
+    assert server.entities["Q1"]["labels"]["fr"]["value"] == "un"
+    assert server.entities["Q3"]["labels"]["en"]["value"] == "three"
+
+
+@pytest.mark.parametrize("ext", ["csv", "jsonl"])
+def test_streaming_without_kept_results(writer, server, tmp_path, ext):
+    src, out = tmp_path / "claims.csv", str(tmp_path / f"out.{ext}")
+    rows = [(f"Q{i}", "P31", "Q1") for i in range(1, 31)] + [("Q999", "P31", "Q1")]
+    src.write_text("entity,property,value\n" + "".join(",".join(r) + "\n" for r in rows))
+
+    res = writer.addClaimsFromCSV(str(src), outputFile=out, keepResults=False, inflight=4)
+
+    assert {k: res[k] for k in ["rows", "failed", "outputFile"]} == {"rows": 31, "failed": 1, "outputFile": out}
+    lines = open(out).read().splitlines()
+    assert len(lines) == 31 + (ext == "csv")
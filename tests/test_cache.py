@@ -0,0 +1,92 @@
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from WikiDataPy.cache import EntityCache
+from WikiDataPy.reader import WikiReader
+
+
+@pytest.fixture(params=[False, True], ids=["memory", "sqlite"])
+def cache(request, tmp_path):
+    c = EntityCache(maxsize=10, path=str(tmp_path / "c.sqlite") if request.param else None)
+    yield c
+    c.close()
+
+
+def test_get_returns_copy(cache):
+    ent = {"id": "Q1", "labels": {"en": {"value": "one"}}}
+    cache.set("Q1", ent)
+    # caller keeps changing its own dict
+    ent["labels"]["en"]["value"] = "changed"
+
+    x = cache.get("Q1")
+    assert x == {"id": "Q1", "labels": {"en": {"value": "one"}}}
+    x["labels"].clear()
+    assert cache.get("Q1")["labels"] == {"en": {"value": "one"}}
+    assert cache.get("Q1") is not cache.get("Q1")
+
+
+def test_disk_hit_returns_copy(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    c = EntityCache(path=path)
+    c.set("k", ["Q1", "Q2"])
+    c.close()
+
+    c = EntityCache(path=path)
+    x = c.get("k")
+    x.append("Q3")
+    assert c.get("k") == ["Q1", "Q2"]
+    assert c.stats()["diskHits"] == 1
+    c.close()
+
+
+def test_lru_and_ttl(cache):
+    cache.maxsize = 2
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert list(cache.memory) == ["a", "c"]
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d", "gone") == "gone"
+
+
+def test_unclosed_cache_persists_across_processes(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    code = ("from WikiDataPy.cache import EntityCache\n"
+            "from WikiDataPy.reader import WikiReader\n"
+            f"WikiReader.setCache(EntityCache(path={path!r}))\n"
+            "for i in range(300):\n"
+            "    WikiReader.CACHE.set(f'Q{i}', {'id': f'Q{i}'})\n")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+
+    c = EntityCache(path=path)
+    assert c.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 300
+    assert c.get("Q299") == {"id": "Q299"}
+    c.close()
+
+
+def test_writes_committed_within_commit_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(EntityCache, "COMMIT_EVERY", 0)
+    path = str(tmp_path / "c.sqlite")
+    c = EntityCache(path=path)
+    c.set("k", 1)
+
+    # another connection sees the write while the cache is still open
+    other = sqlite3.connect(path)
+    assert other.execute("SELECT value FROM cache WHERE key = 'k'").fetchone() == ("1",)
+    other.close()
+    c.close()
+
+
+def test_entity_key_covers_every_option(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "CACHE", EntityCache())
+    base = {"props": ["labels"], "languages": ["en"]}
+    WikiReader.getEntitiesByIds(["Q1"], options=base)
+    WikiReader.getEntitiesByIds(["Q1"], options=dict(base, languagefallback=1))
+    WikiReader.getEntitiesByIds(["Q1"], options=dict(base, languagefallback=1))
+    assert server.stats()["wbgetentities"] == 2
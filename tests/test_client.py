@@ -0,0 +1,37 @@
+from WikiDataPy.client import WikiClient
+
+
+class Tracked(WikiClient):
+
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+def test_set_default_leaves_old_client_open(monkeypatch):
+    monkeypatch.setattr(WikiClient, "DEFAULT", None)
+    old, new = Tracked(), Tracked()
+    WikiClient.setDefault(old)
+
+    assert WikiClient.setDefault(new) is old
+    assert WikiClient.getDefault() is new
+    # calls still holding the old client are not cut off
+    assert not old.closed
+    old.close()
+
+
+def test_mock_server_restores_callers_client(monkeypatch):
+    from benchmarks.mockserver import MockWikiServer, syntheticEntities
+
+    mine = Tracked()
+    monkeypatch.setattr(WikiClient, "DEFAULT", mine)
+    with MockWikiServer(syntheticEntities(3)) as srv, srv.use():
+        inner = WikiClient.getDefault()
+        assert inner is not mine
+        assert not mine.closed
+    assert WikiClient.DEFAULT is mine
+    assert not mine.closed
@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from WikiDataPy.coalesce import EntityBatcher, SingleFlight
+
+
+def entities(ids, redirects=None):
+    """
+        fake wbgetentities response, redirects maps requested id -> target id
+    """
+    redirects = redirects or {}
+    ents = {}
+    for i in ids:
+        k = redirects.get(i, i)
+        ents[k] = {"id": k}
+        if k != i:
+            ents[k]["redirects"] = {"from": i, "to": k}
+    return {"entities": ents, "success": 1}
+
+
+def test_single_flight_shares_call():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        gate.wait(2)
+        return {"x": x}
+
+    with ThreadPoolExecutor(8) as ex:
+        futures = [ex.submit(flight.do, "k", slow, 1) for _ in range(8)]
+        time.sleep(0.1)
+        gate.set()
+        res = [f.result() for f in futures]
+
+    assert calls == [1]
+    assert all(r is res[0] for r in res)
+    assert flight.stats() == {"calls": 1, "shared": 7}
+    # nothing is kept once the call is done
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.inflight == {}
+
+
+def test_sequential_calls_do_not_wait():
+    batcher = EntityBatcher(window=1.0)
+    start = time.perf_counter()
+    for i in range(5):
+        assert batcher.get("k", [f"Q{i}"], entities)["entities"] == {f"Q{i}": {"id": f"Q{i}"}}
+    assert time.perf_counter() - start < 0.5
+    assert batcher.stats() == {"calls": 5, "requests": 5}
+
+
+def test_concurrent_calls_are_merged():
+    batcher = EntityBatcher(window=0.2)
+    sent = []
+
+    def fetch(ids):
+        sent.append(list(ids))
+        time.sleep(0.1)
+        return entities(ids)
+
+    asks = [["Q1"], ["Q2", "Q3"], ["Q3", "Q4"], ["Q1", "Q5"]]
+    with ThreadPoolExecutor(4) as ex:
+        first = ex.submit(batcher.get, "k", ["Q0"], fetch)
+        time.sleep(0.02)
+        res = list(ex.map(lambda ids: batcher.get("k", ids, fetch), asks))
+        first.result()
+
+    assert len(sent) == 2
+    assert sorted(sent[1]) == ["Q1", "Q2", "Q3", "Q4", "Q5"]
+    for ids, r in zip(asks, res):
+        assert sorted(r["entities"]) == sorted(ids)
+
+
+def test_merged_callers_get_own_copies():
+    batcher = EntityBatcher(window=0.2)
+
+    def fetch(ids):
+        time.sleep(0.1)
+        return entities(ids)
+
+    with ThreadPoolExecutor(4) as ex:
+        first = ex.submit(batcher.get, "k", ["Q0"], fetch)
+        time.sleep(0.02)
+        res = list(ex.map(lambda ids: batcher.get("k", ids, fetch), [["Q1"], ["Q1"], ["Q1", "Q2"]]))
+        first.result()
+
+    res[0]["entities"]["Q1"]["id"] = "changed"
+    assert res[1]["entities"]["Q1"] == {"id": "Q1"}
+    assert res[2]["entities"]["Q1"] == {"id": "Q1"}
+    # a caller alone in its batch gets the response as is
+    assert batcher.get("k", ["Q9"], lambda ids: {"entities": {"Q9": 1}}) == {"entities": {"Q9": 1}}
+
+
+def test_merged_response_is_filtered_through_redirects():
+    batcher = EntityBatcher(window=0.2)
+
+    def fetch(ids):
+        time.sleep(0.1)
+        return entities(ids, redirects={"Q5": "Q500"})
+
+    asks = [["Q1", "Q2"], ["Q5", "Q4"], ["Q3"]]
+    with ThreadPoolExecutor(4) as ex:
+        first = ex.submit(batcher.get, "k", ["Q0"], fetch)
+        time.sleep(0.02)
+        res = list(ex.map(lambda ids: batcher.get("k", ids, fetch), asks))
+        first.result()
+
+    assert sorted(res[0]["entities"]) == ["Q1", "Q2"]
+    assert sorted(res[1]["entities"]) == ["Q4", "Q500"]
+    assert sorted(res[2]["entities"]) == ["Q3"]
+
+
+def test_pick_follows_normalized_ids():
+    res = {"entities": {"Q42": {"id": "Q42"}, "Q1": {"id": "Q1"}},
+           "normalized": {"n": {"from": "q42", "to": "Q42"}}}
+    assert EntityBatcher.pick(res, ["q42"])["entities"] == {"Q42": {"id": "Q42"}}
+
+
+def test_failed_batch_retried_per_caller():
+    batcher = EntityBatcher(window=0.2)
+
+    def fetch(ids):
+        time.sleep(0.1)
+        if "Qbad" in ids:
+            return {"error": {"code": "no-such-entity"}}
+        return entities(ids)
+
+    with ThreadPoolExecutor(4) as ex:
+        first = ex.submit(batcher.get, "k", ["Q0"], fetch)
+        time.sleep(0.02)
+        good = ex.submit(batcher.get, "k", ["Q1"], fetch)
+        bad = ex.submit(batcher.get, "k", ["Qbad"], fetch)
+        first.result()
+
+    assert good.result()["entities"] == {"Q1": {"id": "Q1"}}
+    assert "error" in bad.result()
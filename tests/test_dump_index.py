@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from conftest import ROOT
+from WikiDataPy.dumpIndex import DumpIndex
+from WikiDataPy.dumpReader import DumpReader
+from WikiDataPy.reader import WikiReader
+
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "dump.json")
+
+
+def synthetic(n):
+    return [{"type": "item", "id": f"Q{i}", "labels": {"en": {"language": "en", "value": f"item {i}"}},
+             "claims": {}} for i in range(1, n + 1)]
+
+
+@pytest.fixture
+def plain(tmp_path):
+    path = str(tmp_path / "dump.json")
+    with open(FIXTURE, "rb") as src, open(path, "wb") as dst:
+        dst.write(src.read())
+    DumpIndex.build(path)
+    with DumpIndex(path) as idx:
+        yield idx
+
+
+@pytest.fixture
+def blocked(tmp_path):
+    src, dst = str(tmp_path / "src.json.gz"), str(tmp_path / "blocked.json.gz")
+    DumpReader.writeDump(synthetic(2000), src)
+    DumpIndex.compress(src, dst, blockSize=4096)
+    with DumpIndex(dst, cache=2) as idx:
+        yield idx
+
+
+def test_plain_lookup(plain):
+    assert "Q42" in plain and "Q999999" not in plain
+    assert plain.get("Q42")["labels"]["en"]["value"] == "Douglas Adams"
+    assert plain.get("Q999999") is None
+
+
+def test_blocked_dump_is_valid_gzip(blocked):
+    with gzip.open(blocked.path) as f:
+        ents = json.load(f)
+    assert [e["id"] for e in ents] == [f"Q{i}" for i in range(1, 2001)]
+    assert len(blocked.blocks) > 10
+
+
+def test_blocked_lookup(blocked):
+    for i in [1, 2, 777, 1999, 2000]:
+        assert blocked.get(f"Q{i}")["id"] == f"Q{i}"
+    assert len(blocked.cache) <= 2
+
+
+def test_get_many_reads_in_file_order(blocked):
+    read = []
+    get = blocked.get
+    blocked.get = lambda i: read.append(i) or get(i)
+    res = blocked.getMany(["Q1500", "Q3", "Q999999", "Q700", "Q3"])
+    assert sorted(res) == ["Q1500", "Q3", "Q700"]
+    assert read == ["Q3", "Q700", "Q1500"]
+
+
+def test_entities_and_errors(blocked):
+    errors = []
+    res = blocked.getEntitiesByIds(["Q5", "Q999999"], {"props": ["labels"], "languages": ["en"]}, errors=errors)
+    assert res["Q5"]["labels"]["en"]["value"] == "item 5"
+    assert res["Q999999"] == {"id": "Q999999", "missing": ""}
+    assert errors == []
+
+
+def test_reader_backend_forwards_errors(blocked):
+    errors = []
+    blocked.get = lambda i: json.loads(b"{broken")
+    try:
+        WikiReader.setBackend(blocked)
+        WikiReader.getEntitiesByIds(["Q1"], errors=errors)
+    finally:
+        WikiReader.setBackend(None)
+    assert errors and errors[0]["ids"] == ["Q1"]
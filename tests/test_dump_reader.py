@@ -0,0 +1,58 @@
+import pytest
+
+from benchmarks.mockserver import syntheticEntities
+from WikiDataPy.dumpReader import DumpReader
+
+
+def dumpEntities():
+    ents = list(syntheticEntities(50).values())
+    for e in ents[::3]:
+        e["labels"]["de"] = {"language": "de", "value": "de " + e["id"]}
+        e["aliases"]["fr"] = [{"language": "fr", "value": "fr " + e["id"]}]
+    ents.insert(10, {"type": "property", "id": "P31", "datatype": "wikibase-item",
+                     "labels": {"en": {"language": "en", "value": "instance of"}}, "claims": {}})
+    return ents
+
+
+@pytest.fixture(params=[".json", ".json.gz", ".json.bz2"])
+def dump(request, tmp_path):
+    path = str(tmp_path / ("dump" + request.param))
+    DumpReader.writeDump(dumpEntities(), path)
+    return path
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_entities_in_dump_order(dump, workers):
+    # chunks smaller than the dump, several are in flight at once
+    got = [e["id"] for e in DumpReader(dump, workers=workers, chunk=7).entities()]
+    assert got == [e["id"] for e in dumpEntities()]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_filters(dump, workers):
+    reader = DumpReader(dump, workers=workers, chunk=7)
+    ents = dumpEntities()
+
+    assert [e["id"] for e in reader.entities(types=["property"])] == ["P31"]
+    assert len(list(reader.entities(types=["item"]))) == 50
+
+    props = ["P31", "P279"]
+    want = [e["id"] for e in ents if all(p in e["claims"] for p in props)]
+    assert want
+    assert [e["id"] for e in reader.entities(props=props)] == want
+
+    assert [e["id"] for e in reader.entities(ids=["Q40", "P31", "Q2", "Q999"])] == ["Q2", "P31", "Q40"]
+    assert [e["id"] for e in reader.entities(types=["item"], ids=["Q2", "P31"])] == ["Q2"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_language_pruning(dump, workers):
+    got = {e["id"]: e for e in DumpReader(dump, workers=workers, chunk=7).entities(languages=["de", "fr"])}
+
+    assert len(got) == 51
+    assert got["Q4"]["labels"] == {"de": {"language": "de", "value": "de Q4"}}
+    assert got["Q4"]["aliases"] == {"fr": [{"language": "fr", "value": "fr Q4"}]}
+    assert got["Q4"]["descriptions"] == {}
+    assert got["Q2"]["labels"] == {} and got["P31"]["labels"] == {}
+    # claims are never pruned
+    assert len(got["Q2"]["claims"]) == 5
@@ -0,0 +1,41 @@
+from WikiDataPy.graphStore import GraphStore
+
+
+def test_duplicate_edges_dropped():
+    g = GraphStore(capacity=2)
+    edges = [("Q1", "P31", "Q2"), ("Q1", "P279", "Q3"), ("Q1", "P31", "Q2"), ("Q2", "P31", "Q3")]
+    g.update(edges)
+    g.add(("Q2", "P31", "Q3"))
+
+    assert len(g) == 3
+    assert list(g) == list(dict.fromkeys(edges))
+    assert g.outDegree("Q1") == 2
+    assert g.inDegree("Q3") == 2
+
+
+def test_queries_between_adds_see_pending_edges():
+    g = GraphStore()
+    g.add(("Q1", "P31", "Q2"))
+    assert ("Q1", "P31", "Q2") in g
+    built = g.csr
+
+    # small runs of adds are scanned, not re-indexed
+    g.add(("Q1", "P31", "Q2"))
+    g.add(("Q1", "P17", "Q9"))
+    g.add(("Q5", "P17", "Q1"))
+    assert ("Q1", "P17", "Q9") in g
+    assert ("Q5", "P17", "Q1") in g
+    assert ("Q5", "P17", "Q2") not in g
+    assert g.neighbours("Q1") == [("P31", "Q2"), ("P17", "Q9")]
+    assert g.csr is built
+
+    assert len(g) == 3
+    assert g.csr is not built
+
+
+def test_large_pending_batch_rebuilds(monkeypatch):
+    monkeypatch.setattr(GraphStore, "BATCH", 10)
+    g = GraphStore()
+    g.update((f"Q{i}", "P31", "Q0") for i in range(50))
+    assert ("Q49", "P31", "Q0") in g
+    assert g.built == g.size == 50
@@ -0,0 +1,21 @@
+import pytest
+
+from WikiDataPy.graphStore import GraphStore
+
+grapher = pytest.importorskip("WikiDataPy.grapher")
+
+
+@pytest.fixture
+def entities(item):
+    ents = [item("Q1", claims=[("P31", "Q2", "deprecated"), ("P279", "Q3", "normal"), ("P361", "Q4", "preferred")]),
+            item("Q2"), item("Q3", claims=[("P31", "Q4", "normal")]), item("Q4")]
+    return {e["id"]: e for e in ents}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_graph_follows_normal_rank_only(server, compact):
+    g = grapher.WikiGraph("Q1", compact=compact)
+    g.buildGraph(r=3, out_degree=5)
+
+    assert isinstance(g.edges, GraphStore) == compact
+    assert set(g.edges) == {("Q1", "P279", "Q3"), ("Q3", "P31", "Q4")}
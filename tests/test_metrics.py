@@ -0,0 +1,59 @@
+import pytest
+
+from WikiDataPy.cache import EntityCache
+from WikiDataPy.metrics import Metrics, MetricsCollector
+from WikiDataPy.reader import WikiReader
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    monkeypatch.setattr(Metrics, "HOOKS", [])
+    monkeypatch.setattr(WikiReader, "CACHE", None)
+    return Metrics.addHook(MetricsCollector())
+
+
+def ids(a, b):
+    return [f"Q{i}" for i in range(a, b)]
+
+
+def test_one_event_per_request(server, collector):
+    WikiReader.getEntitiesByIds(ids(1, 61), options={"props": ["labels"]})
+    WikiReader.getClaims("Q1", options={})
+    WikiReader.getClaims("Q2", options={})
+
+    x = collector.summary()
+    # 60 ids are 2 chunks of MAX_IDS
+    assert x["wbgetentities"]["requests"] == server.stats()["wbgetentities"] == 2
+    assert x["wbgetclaims"]["requests"] == server.stats()["wbgetclaims"] == 2
+    assert x["wbgetentities"]["errors"] == 0
+    assert x["wbgetentities"]["bytesIn"] > 0 and x["wbgetentities"]["bytesOut"] > 0
+    assert 'wikidatapy_requests_total{action="wbgetentities",status="200"} 2' in collector.prometheus()
+    assert 'wikidatapy_request_duration_seconds_count{action="wbgetclaims"} 2' in collector.prometheus()
+
+
+def test_cache_lookups_counted_per_id(server, collector, monkeypatch):
+    monkeypatch.setattr(WikiReader, "CACHE", EntityCache())
+    WikiReader.getEntitiesByIds(ids(1, 6))
+    WikiReader.getEntitiesByIds(ids(1, 9))
+
+    x = collector.summary()["wbgetentities"]
+    assert x["cacheMisses"] == 5 + 3
+    assert x["cacheHits"] == 5
+    # only the misses were asked for
+    assert x["requests"] == 2
+
+
+def test_failing_hook_does_not_break_request(server, collector):
+    def broken(event):
+        raise RuntimeError("hook down")
+
+    Metrics.addHook(broken)
+    res = WikiReader.getEntitiesByIds(["Q1"])
+    assert "Q1" in res
+    assert collector.summary()["wbgetentities"]["requests"] == 1
+
+
+def test_no_hooks_no_events(server, collector):
+    Metrics.removeHook(collector)
+    WikiReader.getEntitiesByIds(["Q1"])
+    assert collector.summary() == {}
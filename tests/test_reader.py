@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from WikiDataPy.reader import WikiReader
+
+
+@pytest.fixture
+def latency():
+    return 0.05
+
+
+@pytest.fixture(autouse=True)
+def uncached(monkeypatch):
+    monkeypatch.setattr(WikiReader, "CACHE", None)
+
+
+def ids(a, b):
+    return [f"Q{i}" for i in range(a, b)]
+
+
+def test_chunks_fetched_in_parallel_and_merged(server):
+    res = WikiReader.getEntitiesByIds(ids(1, 61) * 2, options={"props": ["labels"]}, workers=4)
+
+    assert sorted(res, key=lambda k: int(k[1:])) == ids(1, 61)
+    assert all("labels" in x for x in res.values())
+    # 60 distinct ids in chunks of MAX_IDS (50) sent at once
+    assert server.stats()["wbgetentities"] == 2
+    assert server.peak() == 2
+
+
+def test_small_chunks_with_many_workers(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "MAX_IDS", 7)
+    errors = []
+    res = WikiReader.getEntitiesByIds(ids(1, 61), options={"props": ["labels"]}, workers=8, errors=errors)
+
+    assert len(res) == 60 and not errors
+    assert server.stats()["wbgetentities"] == 9
+    assert server.peak() > 1
+
+
+def test_failed_chunk_reported_others_kept(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "MAX_IDS", 10)
+    errors = []
+    asked = ids(1, 11) + ids(11, 20) + ["Qbad"] + ids(21, 31)
+    res = WikiReader.getEntitiesByIds(asked, options={"props": ["labels"]}, errors=errors)
+
+    assert sorted(res, key=lambda k: int(k[1:])) == ids(1, 11) + ids(21, 31)
+    assert len(errors) == 1
+    assert errors[0]["ids"] == ids(11, 20) + ["Qbad"]
+    assert errors[0]["error"]["code"] == "no-such-entity"
+
+
+def test_request_exception_reported_per_chunk(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "MAX_IDS", 10)
+    request = WikiReader.requestJSON
+
+    def flaky(api, params):
+        if "Q15" in params["ids"].split("|"):
+            raise ConnectionError("reset by peer")
+        return request(api, params)
+    monkeypatch.setattr(WikiReader, "requestJSON", flaky)
+
+    errors = []
+    res = WikiReader.getEntitiesByIds(ids(1, 31), errors=errors)
+    assert len(res) == 20
+    assert errors == [{"ids": ids(11, 21), "error": {"code": "request-failed", "info": "reset by peer"}}]
+
+
+def test_every_chunk_failed_returns_error(server):
+    errors = []
+    res = WikiReader.getEntitiesByIds(["Qbad"], errors=errors)
+    assert res["code"] == "no-such-entity"
+    assert len(errors) == 1
+
+
+def test_coalesced_callers_get_own_copies(server):
+    with ThreadPoolExecutor(4) as ex:
+        ents = list(ex.map(lambda _: WikiReader.getEntitiesByIds(ids(1, 51), options={"props": ["labels"]}), range(4)))
+        claims = list(ex.map(lambda _: WikiReader.getClaims("Q1", options={}), range(4)))
+
+    # a full chunk skips the batcher, identical calls in flight share one request
+    assert server.stats()["wbgetentities"] < 4 and server.stats()["wbgetclaims"] < 4
+    ents[0]["Q1"]["labels"].clear()
+    claims[0].clear()
+    assert all(e["Q1"]["labels"] for e in ents[1:])
+    assert all(c for c in claims[1:])
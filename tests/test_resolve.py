@@ -0,0 +1,50 @@
+import pytest
+
+from WikiDataPy.cache import EntityCache
+from WikiDataPy.reader import WikiReader
+
+
+@pytest.mark.parametrize("name, candidate, rank, score", [
+    ("Paris", {"label": "Paris"}, 0, 1.0),
+    ("paris", {"label": "Paris"}, 0, 0.9),
+    ("City of Light", {"label": "Paris", "aliases": ["City of Light"]}, 0, 0.8),
+    ("city of light", {"label": "Paris", "aliases": ["City of Light"]}, 0, 0.7),
+    ("Par", {"label": "Paris"}, 0, 0.5),
+    ("Paris", {"label": "Paris"}, 3, 0.97),
+    ("Par", {}, 80, 0.0),
+])
+def test_score_candidate(name, candidate, rank, score):
+    assert WikiReader.scoreCandidate(name, candidate, rank) == pytest.approx(score)
+
+
+@pytest.fixture
+def entities(item):
+    ents = [item("Q1", "Paris Hilton"), item("Q2", "Paris", ["City of Light"]), item("Q3", "Berlin")]
+    return {e["id"]: e for e in ents}
+
+
+def test_resolve_many_picks_best_candidate(server):
+    res = WikiReader.resolveMany(["Paris", "berlin", "City of Light", "Atlantis", "Paris"], cache=EntityCache())
+
+    assert res == {"Paris": ("Q2", 0.99), "berlin": ("Q3", 0.9),
+                   "City of Light": ("Q2", 0.8), "Atlantis": (None, 0.0)}
+    # duplicate names are searched once
+    assert server.stats()["wbsearchentities"] == 4
+
+
+def test_resolve_many_min_confidence_and_cache(server):
+    cache = EntityCache()
+    res = WikiReader.resolveMany(["Paris H", "Berlin"], minConfidence=0.6, cache=cache)
+    assert res == {"Paris H": (None, 0.5), "Berlin": ("Q3", 1.0)}
+
+    server.reset()
+    assert WikiReader.resolveMany(["Paris H", "Berlin"], minConfidence=0.6, cache=cache) == res
+    assert server.stats() == {}
+
+
+def test_resolve_many_custom_scorer(server):
+    def shortest(name, candidate, rank):
+        return 1 / len(candidate["label"])
+
+    res = WikiReader.resolveMany(["Paris"], scorer=shortest, cache=EntityCache())
+    assert res["Paris"][0] == "Q2"
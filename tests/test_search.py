@@ -0,0 +1,43 @@
+import pytest
+
+from WikiDataPy.reader import WikiReader
+
+
+@pytest.mark.parametrize("prefetch", [0, 3])
+def test_pages_followed_until_n(server, prefetch):
+    res = list(WikiReader.iterSearch("item", ["id"], n=25, pageSize=10, prefetch=prefetch))
+
+    assert len(res) == 25
+    assert len({x["id"] for x in res}) == 25
+    # nothing past n is requested
+    assert server.stats()["wbsearchentities"] == 3
+
+
+@pytest.mark.parametrize("prefetch", [0, 3])
+def test_all_pages_without_n(server, prefetch):
+    res = list(WikiReader.iterSearch("item", ["id"], pageSize=7, prefetch=prefetch))
+    assert sorted(int(x["id"][1:]) for x in res) == list(range(1, 61))
+
+
+def test_pages_limit(server):
+    res = list(WikiReader.iterSearch("item", ["id"], pageSize=10, pages=2))
+    assert len(res) == 20
+    assert server.stats()["wbsearchentities"] == 2
+
+
+def test_language_fallback_happens_once(server):
+    # no french labels: one french request then english, no endless retry
+    res = list(WikiReader.iterSearch("item", ["id"], n=5, lang="fr", pageSize=5))
+    assert len(res) == 5
+    assert server.stats()["wbsearchentities"] == 2
+
+    server.reset()
+    assert list(WikiReader.iterSearch("nothing matches", ["id"], lang="fr")) == []
+    assert server.stats()["wbsearchentities"] == 2
+
+
+def test_search_entities_n_spans_pages(server, monkeypatch):
+    monkeypatch.setattr(WikiReader, "SEARCH_PAGE", 10)
+    res = WikiReader.searchEntities("item", ["id", "label"], n=15, outputFile=None)
+    assert len(res) == 15
+    assert set(res[0]) == {"id", "label"}
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from WikiDataPy.sink import ResultSink
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def read(path):
+    if path.endswith(".parquet"):
+        return pq.read_table(path)
+    with pa.OSFile(path, "rb") as f:
+        return pa.ipc.open_file(f).read_all()
+
+
+def test_mixed_column_written_as_text(tmp_path):
+    out = str(tmp_path / "created.parquet")
+    sink = ResultSink(out, ["id", "label"])
+    sink.write(["Q1", "x"])
+    sink.write([-1, "y"])
+    sink.close()
+
+    t = pq.read_table(out)
+    assert t.schema.field("id").type == pa.string()
+    assert t.column("id").to_pylist() == ["Q1", "-1"]
+
+
+def test_mixed_column_across_row_groups(tmp_path):
+    out = str(tmp_path / "created.arrow")
+    with ResultSink(out, ["id"], rowGroup=1) as sink:
+        sink.write(["Q1"])
+        sink.write([2.5])
+    with pa.OSFile(out, "rb") as f:
+        t = pa.ipc.open_file(f).read_all()
+    assert t.column("id").to_pylist() == ["Q1", "2.5"]
+
+
+def test_columnar_without_header(tmp_path):
+    out = str(tmp_path / "rows.parquet")
+    with ResultSink(out) as sink:
+        sink.write(["Q1", "label"])
+        sink.write(["Q2", "other"])
+    t = pq.read_table(out)
+    assert t.column_names == ["c0", "c1"]
+    assert t.column("c1").to_pylist() == ["label", "other"]
+
+
+def test_empty_columnar_file_has_schema(tmp_path):
+    out = str(tmp_path / "empty.parquet")
+    ResultSink(out, ["id"]).close()
+    assert pq.read_table(out).column_names == ["id"]
+
+
+def test_json_and_csv(tmp_path):
+    js, csv = str(tmp_path / "x.json"), str(tmp_path / "x.csv")
+    with ResultSink(js) as sink:
+        sink.write({"a": 1})
+        sink.write({"a": 2}, raw={"b": 3})
+    assert json.load(open(js)) == [{"a": 1}, {"b": 3}]
+
+    with ResultSink(csv, ["a", "b"]) as sink:
+        sink.write({"b": 2})
+    assert open(csv).read().splitlines() == ["a,b", ",2"]
+
+
+@pytest.mark.parametrize("ext", ["parquet", "arrow"])
+@pytest.mark.parametrize("later, kind, expected", [
+    (["Q5", "abc"], pa.string(), ["1", "2", "Q5", "abc"]),
+    ([3.7, 4], pa.float64(), [1.0, 2.0, 3.7, 4.0]),
+    ([True, None], pa.string(), ["1", "2", "true", None]),
+])
+def test_column_widened_after_first_group(tmp_path, ext, later, kind, expected):
+    out = str(tmp_path / f"ids.{ext}")
+    with ResultSink(out, ["id", "n"], rowGroup=2) as sink:
+        for i, v in enumerate([1, 2] + later):
+            sink.write([v, i])
+
+    t = read(out)
+    assert t.schema.field("id").type == kind
+    assert t.column("id").to_pylist() == expected
+    assert t.column("n").to_pylist() == [0, 1, 2, 3]
+    assert not os.path.exists(out + ".widen")
+
+
+def test_float_then_text_widens_twice(tmp_path):
+    out = str(tmp_path / "x.parquet")
+    with ResultSink(out, ["v"], rowGroup=1) as sink:
+        for v in [1, 2.5, "x", 7]:
+            sink.write([v])
+    assert read(out).column("v").to_pylist() == ["1", "2.5", "x", "7"]
+
+
+def test_text_rows_flushed_per_row_group(tmp_path, monkeypatch):
+    monkeypatch.setattr(ResultSink, "FLUSH_EVERY", 1e9)
+    out = tmp_path / "x.jsonl"
+    sink = ResultSink(str(out), rowGroup=4)
+    for i in range(10):
+        sink.write({"i": i})
+        # nothing reaches the file between row groups
+        assert len(out.read_text().splitlines()) == (i + 1) // 4 * 4
+    sink.close()
+    assert len(out.read_text().splitlines()) == 10
@@ -0,0 +1,130 @@
+import pytest
+
+from WikiDataPy.client import WikiClient
+from WikiDataPy.ratelimit import RateLimiter
+from WikiDataPy.sparql import WikiSparql
+
+E = WikiSparql.ENTITY_PREFIX
+
+
+class FakeResponse:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.status_code = 200
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.responses = []
+
+    def get(self, url, **kwargs):
+        self.responses.append(FakeResponse(self.lines))
+        return self.responses[-1]
+
+    getQuery = get
+
+
+@pytest.fixture
+def tsv(monkeypatch):
+    def serve(lines):
+        client = FakeClient(lines)
+        monkeypatch.setattr(WikiClient, "DEFAULT", client)
+        return client
+    monkeypatch.setattr(WikiSparql, "LIMITER", RateLimiter(concurrency=1))
+    return serve
+
+
+@pytest.mark.parametrize("term, value", [
+    (r'"a\tb"', "a\tb"),
+    (r'"C:\\temp"', "C:\\temp"),
+    (r'"back\\\\t"', "back\\\\t"),
+    (r'"say \"hi\""', 'say "hi"'),
+    (r'"caf\u00e9"', "café"),
+    (r'"plain"', "plain"),
+])
+def test_unescape_literals(term, value):
+    assert WikiSparql.parseTSVTerm(term)["value"] == value
+
+
+def test_term_kinds():
+    assert WikiSparql.parseTSVTerm(f"<{E}Q42>") == {"type": "uri", "value": E + "Q42"}
+    assert WikiSparql.parseTSVTerm('"chat"@fr') == {"type": "literal", "value": "chat", "xml:lang": "fr"}
+    assert WikiSparql.parseTSVTerm("_:b0") == {"type": "bnode", "value": "b0"}
+    assert WikiSparql.parseTSVTerm('"1"^^<http://www.w3.org/2001/XMLSchema#integer>')["datatype"] \
+        == "http://www.w3.org/2001/XMLSchema#integer"
+
+
+def test_empty_rows_are_kept(tsv):
+    tsv(["?item", f"<{E}Q1>", "", f"<{E}Q2>"])
+    rows = list(WikiSparql.streamBindings("q"))
+    assert rows == [{"item": {"type": "uri", "value": E + "Q1"}}, {},
+                    {"item": {"type": "uri", "value": E + "Q2"}}]
+
+
+def test_stream_takes_and_releases_limiter_slot(tsv):
+    client = tsv(["?item", f"<{E}Q1>", f"<{E}Q2>"])
+    it = WikiSparql.streamBindings("q")
+    next(it)
+    assert WikiSparql.LIMITER.slots.acquire(blocking=False) is False
+    it.close()
+    assert client.responses[0].closed
+    # slot is free again, a second stream can run
+    assert len(list(WikiSparql.streamBindings("q"))) == 2
+
+
+def test_seen_window_bounds_dedup(tsv, monkeypatch):
+    tsv(["?item"] + [f"<{E}Q{i}>" for i in [1, 2, 1, 3, 4, 1]])
+    monkeypatch.setattr(WikiSparql, "enrichBatch", lambda ids, options: iter({"id": i} for i in ids))
+
+    # Q1 repeats within the window
+    assert [x["id"] for x in WikiSparql.executeStream("q", batch=1, seenWindow=10)] == ["Q1", "Q2", "Q3", "Q4"]
+    # with a window of 2 Q1 is forgotten once Q3 and Q4 are seen
+    assert [x["id"] for x in WikiSparql.executeStream("q", batch=1, seenWindow=2)] == ["Q1", "Q2", "Q3", "Q4", "Q1"]
+
+
+def test_read_timeout_not_retried():
+    import time
+
+    import requests
+
+    from benchmarks.mockserver import MockWikiServer
+
+    with MockWikiServer({}, latency=0.5) as srv, srv.use():
+        WikiClient.setDefault(WikiClient(queryTimeout=(5, 0.2))).close()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            WikiSparql.execute("SELECT ?item WHERE {} LIMIT 1")
+        time.sleep(0.6)
+        assert srv.stats().get("sparql") == 1
+
+        # the API keeps its retrying adapter
+        client = WikiClient.getDefault()
+        assert client.session.get_adapter(srv.api) is not client.queryAdapter
+        assert client.session.get_adapter(srv.sparql) is client.queryAdapter
+
+
+def test_execute_many_keeps_going_after_failed_query(tmp_path, monkeypatch, capsys):
+    src = tmp_path / "queries.txt"
+    src.write_text("q1---bad---q3")
+
+    def execute(query):
+        if query == "bad":
+            raise ValueError("timed out")
+        return {"head": {"vars": []}, "results": {"bindings": [], "q": query}}
+    monkeypatch.setattr(WikiSparql, "execute", execute)
+
+    res = WikiSparql.execute_many(str(src), output_dir=str(tmp_path / "out"), workers=2)
+
+    assert [x["results"]["q"] for x in (res[0], res[2])] == ["q1", "q3"]
+    assert res[1] == {"error": {"code": "query-failed", "info": "timed out"}}
+    assert "failed: timed out" in capsys.readouterr().out
+    assert len(list((tmp_path / "out").iterdir())) == 1
@@ -0,0 +1,56 @@
+import pytest
+
+from WikiDataPy.bulkWriter import BulkWriter
+from WikiDataPy.writer import WikiWriter
+
+
+def test_only_healthy_responses_ramp_rate(writer):
+    limiter = writer.limiter
+    limiter.rate = 100
+    assert "claim" in writer.addClaim("Q1", "P31", "Q2")
+    assert limiter.successes == 1
+    rate = limiter.rate
+
+    # API error (unknown entity) is not a success
+    assert writer.addClaim("Q999", "P31", "Q2")["code"] == "no-such-entity"
+    assert limiter.successes == 1
+    assert limiter.rate == rate
+
+
+def test_deprecated_delta_caps_rate(writer, monkeypatch):
+    monkeypatch.setattr(BulkWriter, "DELTA", 0.5)
+    own = writer.limiter
+    seen = []
+    post = writer.post
+
+    def spy(*args, **kwargs):
+        seen.append(writer.limiter)
+        return post(*args, **kwargs)
+    monkeypatch.setattr(writer, "post", spy)
+
+    with pytest.warns(DeprecationWarning):
+        writer.addClaimsFromRows([("Q1", "P31", "Q2")])
+
+    # the job ran on a capped private limiter, the writer's own one is untouched
+    assert seen and all(x is not own and x.maxRate == 2 and x.rate <= 2 for x in seen)
+    assert writer.limiter is own
+    assert own.maxRate == 1000
+
+
+def test_deprecated_delta_leaves_shared_limiter(server, monkeypatch):
+    monkeypatch.setattr(BulkWriter, "DELTA", 1)
+    shared = WikiWriter.LIMITER
+    before = (shared.rate, shared.maxRate)
+    w = BulkWriter("user", "password")
+    w.login()
+    w.getCSRFTtoken()
+    with pytest.warns(DeprecationWarning):
+        w.addClaimsFromRows([("Q1", "P31", "Q2")])
+    assert w.limiter is shared
+    assert shared.maxRate == before[1]
+
+
+def test_retry_after_parsing():
+    assert WikiWriter.retryAfter("3", 1) == 3
+    assert WikiWriter.retryAfter(None, 1) == 1
+    assert WikiWriter.retryAfter("Wed, 21 Oct 2015 07:28:00 GMT", 1) == 0